@@ -1,50 +1,196 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
-from fastapi.responses import JSONResponse
-import uvicorn, tempfile, os
-from pathlib import Path
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn, os, asyncio, json
 from dotenv import load_dotenv
 
-from cli_manuscript_assistant import read_file, split_sections, rough_metrics, extract_time_markers, \
-    call_model, p_outline, p_rubric, p_short_rewrite, p_top_issues, p_plan, p_timeline_feedback
+from cli_manuscript_assistant import read_file, split_sections
+from job_queue import JOB_DB, JobQueue, JobWorkers
+from llm_clients import aclose_all
+from pipeline import arun_analysis, aresume_analysis, resume_analysis, run_analysis, runs_dir
+from run_store import RunNotFound, list_runs, new_run_id
 
 load_dotenv()
 
 API_KEY = os.getenv("ARC_API_KEY", "change-me")
 
-app = FastAPI(title="Manuscript Analyzer API")
+JOBS = JobQueue(JOB_DB)
+
+def _run_job(job, set_progress):
+    """Worker: voer een job uit als run met hetzelfde ID, zodat een herstart verder gaat waar hij was"""
+    progress = {"stages": [], "sections_done": 0, "sections_total": len(job["sections"]),
+                "calls_done": 0, "calls_total": 0}
+    done = set()
+
+    def on_event(event):
+        if event["type"] == "stage":
+            progress["stages"].append(event["stage"])
+            # Batch runs en hervatte runs leveren geen losse sectie events
+            if event["stage"] == "sections":
+                progress["sections_done"] = progress["sections_total"]
+        elif event["type"] == "section":
+            done.add(event["index"])
+            progress.update(sections_done=len(done), sections_total=event["total"])
+        elif event["type"] == "progress":
+            # Model calls (rubric, rewrite, chunks, ...), niet het aantal secties
+            progress.update(calls_done=event["done"], calls_total=event["total"], current=event["label"])
+        else:
+            return
+        set_progress(progress)
+
+    try:
+        return resume_analysis(job["id"], on_event)
+    except RunNotFound:
+        return run_analysis(job["sections"], job["provider"], job["model"], on_event, run_id=job["id"],
+                            **job["options"])
+
+@asynccontextmanager
+async def lifespan(app):
+    workers = JobWorkers(JOBS, _run_job).start()
+    yield
+    await asyncio.to_thread(workers.stop, 5)
+    # Gedeelde async clients netjes sluiten bij shutdown
+    await aclose_all()
+
+app = FastAPI(title="Manuscript Analyzer API", lifespan=lifespan)
+
+def _check_key(x_arc_key):
+    if x_arc_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+async def _run_report(run_id, analysis):
+    """Rapport als JSON; bij een fout het run ID zodat de client kan hervatten"""
+    try:
+        return JSONResponse(await analysis)
+    except RunNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": str(e), "run_id": run_id,
+                                                     "resume": f"/runs/{run_id}/resume"})
+
+# ====== LIVE VOORTGANG (SERVER-SENT EVENTS) ======
+# Stages die als eigen event naar de client gaan; "sections" komt per sectie binnen
+STREAM_STAGES = ("outline", "issues", "plan", "timeline_extract", "timeline_feedback")
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _analysis_events(sections, provider, model, **options):
+    """SSE berichten van een analyse terwijl die loopt
+
+    run (run_id), progress (done, total, label), section (index, total, result), outline /
+    issues / plan / timeline_extract / timeline_feedback (result) en tot slot done
+    (run_id, analysis_info) of error (error, run_id, resume).
+    """
+    run_id = new_run_id()
+    events = asyncio.Queue()
+    task = asyncio.ensure_future(arun_analysis(sections, provider, model, on_event=events.put_nowait,
+                                               run_id=run_id, **options))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        yield _sse("run", {"run_id": run_id, "total_sections": len(sections)})
+        while (event := await events.get()) is not None:
+            if event["type"] == "progress":
+                yield _sse("progress", {key: event[key] for key in ("done", "total", "label")})
+            elif event["type"] == "section":
+                yield _sse("section", {key: event[key] for key in ("index", "total", "result")})
+            elif event["type"] == "stage" and event["stage"] in STREAM_STAGES:
+                yield _sse(event["stage"], {"result": event["result"]})
+        try:
+            report = task.result()
+        except Exception as e:
+            yield _sse("error", {"error": str(e), "run_id": run_id, "resume": f"/runs/{run_id}/resume"})
+        else:
+            yield _sse("done", {"run_id": run_id, "analysis_info": report["analysis_info"]})
+    finally:
+        # Client weg: de run stoppen; hij blijft via /runs/{run_id}/resume te hervatten
+        if not task.done():
+            task.cancel()
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
 
 @app.post("/analyze")
 async def analyze(file: UploadFile = File(...),
                   provider: str = Form("ollama"),
                   model: str = Form("llama3.1"),
                   rewrites: str = Form("true"),
+                  combined: str = Form("false"),
                   x_arc_key: str = Header(None)):
-    if x_arc_key != API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API key")
+    _check_key(x_arc_key)
 
     data = await file.read()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-        tmp.write(data); tmp_path = tmp.name
-    text = read_file(Path(tmp_path))
-    os.unlink(tmp_path)
+    text = await asyncio.to_thread(read_file, data, file.filename)
 
     sections = split_sections(text)
-    outline = call_model(p_outline(text), provider, model, 0.2)
-    results, rubs = [], []
-    for s in sections:
-        rub = call_model(p_rubric(s["title"], s["text"]), provider, model, 0.3)
-        rubs.append(rub[:4000])
-        rewrite = call_model(p_short_rewrite(s["title"], s["text"]), provider, model, 0.5) if rewrites=="true" else ""
-        results.append({"title": s["title"], "metrics": rough_metrics(s["text"]), "rubric": rub, "rewrite": rewrite})
-
-    issues = call_model(p_top_issues([f"--- {r['title']} ---\n{r['rubric']}" for r in results]), provider, model, 0.2)
-    plan = call_model(p_plan(outline, issues), provider, model, 0.2)
-    timeline_rows = "\n".join([f"* {s['title']}: " + ("; ".join([f\"{k}:{v}\" for (k,v) in extract_time_markers(s['text'])]) or "(geen)") for s in sections])
-    timeline_feedback = call_model(p_timeline_feedback(timeline_rows), provider, model, 0.2)
-
-    return JSONResponse({"outline": outline, "issues": issues, "plan": plan,
-                         "timeline_extract": timeline_rows, "timeline_feedback": timeline_feedback,
-                         "sections": results})
+    # Outline, sectie-analyse en tijdlijn lopen tegelijk zonder de event loop te blokkeren
+    run_id = new_run_id()
+    return await _run_report(run_id, arun_analysis(sections, provider, model, run_id=run_id,
+                                                   rewrite=rewrites == "true", combined=combined == "true"))
+
+@app.post("/analyze/stream")
+async def analyze_stream(file: UploadFile = File(...),
+                         provider: str = Form("ollama"),
+                         model: str = Form("llama3.1"),
+                         rewrites: str = Form("true"),
+                         combined: str = Form("false"),
+                         x_arc_key: str = Header(None)):
+    """Zelfde analyse als /analyze, maar als text/event-stream: elk onderdeel zodra het klaar is"""
+    _check_key(x_arc_key)
+
+    data = await file.read()
+    text = await asyncio.to_thread(read_file, data, file.filename)
+    events = _analysis_events(split_sections(text), provider, model,
+                              rewrite=rewrites == "true", combined=combined == "true")
+    # X-Accel-Buffering: reverse proxies (nginx) niet laten bufferen
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...),
+                     provider: str = Form("ollama"),
+                     model: str = Form("llama3.1"),
+                     rewrites: str = Form("true"),
+                     combined: str = Form("false"),
+                     x_arc_key: str = Header(None)):
+    """Zet een analyse in de wachtrij; geeft direct het job ID terug (poll GET /jobs/{id})"""
+    _check_key(x_arc_key)
+
+    data = await file.read()
+    text = await asyncio.to_thread(read_file, data, file.filename)
+    options = {"rewrite": rewrites == "true", "combined": combined == "true"}
+    job_id = await asyncio.to_thread(JOBS.submit, split_sections(text), provider, model, options)
+    return {"id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, x_arc_key: str = Header(None)):
+    """Status (queued/running/completed/failed) en voortgang van een job"""
+    _check_key(x_arc_key)
+    job = await asyncio.to_thread(JOBS.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, x_arc_key: str = Header(None)):
+    """Het rapport van een afgeronde job; 409 zolang de job niet klaar (of mislukt) is"""
+    job = await job_status(job_id, x_arc_key)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail={"status": job["status"], "error": job["error"]})
+    return JSONResponse(await asyncio.to_thread(JOBS.result, job_id))
+
+@app.get("/runs")
+async def runs(status: str = None, x_arc_key: str = Header(None)):
+    """Gecheckpointe runs (nieuwste eerst), bijv. ?status=failed"""
+    _check_key(x_arc_key)
+    return await asyncio.to_thread(list_runs, runs_dir(), status)
+
+@app.post("/runs/{run_id}/resume")
+async def resume(run_id: str, x_arc_key: str = Header(None)):
+    """Maak een afgebroken run af; afgeronde stages en model calls worden overgeslagen"""
+    _check_key(x_arc_key)
+    return await _run_report(run_id, aresume_analysis(run_id))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
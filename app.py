@@ -7,17 +7,15 @@ import streamlit as st
 import os
 import json
 import time
-from pathlib import Path
 import zipfile
 import io
 from datetime import datetime
 
 # Import onze bestaande functies
-from cli_manuscript_assistant import (
-    call_model, read_file, split_sections, rough_metrics,
-    p_outline, p_rubric, p_short_rewrite, p_top_issues, p_plan,
-    p_timeline_feedback, extract_time_markers, OUTPUT_DIR
-)
+from cli_manuscript_assistant import read_file, split_sections, OUTPUT_DIR, section_metrics
+from pipeline import run_analysis, resume_analysis, runs_dir
+from run_store import RunNotFound, RunStore, list_runs
+from results_view import page_of, run_key, search_sections, section_rows, section_search_text
 
 # Page config
 st.set_page_config(
@@ -111,6 +109,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ====== RESULTATEN OVER RERUNS ======
+# Elke widget (ook een download knop) draait het script opnieuw. Het rapport moet dat overleven
+# zonder nieuwe analyse: session state bewaart alleen het run ID, het rapport zelf staat in de
+# run store (outputs/runs/<run_id>/report.json).
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_run_report(run_id):
+    """Rapport van een afgeronde run (None als die ontbreekt)"""
+    try:
+        return RunStore.open(runs_dir(), run_id).report()
+    except RunNotFound:
+        return None
+
+def remember_report(report_data):
+    """Maak report_data de analyse die bij elke rerun getoond wordt"""
+    run_id = report_data["analysis_info"].get("run_id")
+    if run_id and load_run_report(run_id) is not None:
+        st.session_state["active_run"] = {"run_id": run_id}
+    else:
+        # Checkpoints uit (ARC_CHECKPOINTS=0): het rapport zelf bewaren
+        st.session_state["active_run"] = {"report": report_data}
+
+def active_report():
+    active = st.session_state.get("active_run")
+    if not active:
+        return None
+    return active.get("report") or load_run_report(active["run_id"])
+
+def recent_analyses_picker(limit=20):
+    """Open een afgeronde analyse opnieuw zonder hem opnieuw te draaien"""
+    completed = list_runs(runs_dir(), status="completed")[:limit]
+    if not completed:
+        return
+    with st.expander(f"🕘 Recente analyses ({len(completed)})"):
+        runs = {f"{r['run_id']} – {r['provider']}/{r['model']}, {r['total_sections']} secties": r["run_id"]
+                for r in completed}
+        choice = st.selectbox("Analyse", list(runs))
+        if st.button("📂 Analyse openen"):
+            st.session_state["active_run"] = {"run_id": runs[choice]}
+
+# ====== GECACHET INLEZEN ======
+# Elke widget wijziging draait het hele script opnieuw; st.cache_data hasht de upload bytes,
+# dus alleen nieuwe inhoud wordt opnieuw geparsed en gemeten. Begrensd in aantal en leeftijd.
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def parse_upload(data, name):
+    """Secties van één geüpload bestand"""
+    return split_sections(read_file(data, name))
+
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def upload_stats(data, name):
+    """Aantal secties en woorden voor het statistieken paneel"""
+    metrics = section_metrics(parse_upload(data, name))
+    return {"sections": len(metrics), "words": sum(m["words"] for m in metrics)}
+
 def main():
     # Header met welkomstbericht
     st.markdown('<h1 class="main-header">📚 Arc Crusade Manuscript Assistant</h1>', unsafe_allow_html=True)
@@ -169,6 +220,8 @@ def main():
         # Geavanceerde opties
         st.subheader("⚙️ Geavanceerde opties")
         no_rewrite = st.checkbox("Geen herschrijfsuggesties", help="Sla herschrijfsuggesties over voor snellere verwerking")
+        combined_analysis = st.checkbox("⚡ Gecombineerde analyse (1 call per sectie)",
+                                        help="Rubric en herschrijving in één gestructureerd antwoord per sectie")
         
         # Model informatie
         st.subheader("ℹ️ Model Info")
@@ -204,7 +257,7 @@ def main():
             # Toon bestandsinfo
             with st.expander("📋 Bestandsinformatie", expanded=True):
                 for file in uploaded_files:
-                    file_size = len(file.getvalue()) / 1024  # KB
+                    file_size = file.size / 1024  # KB
                     st.markdown(f"""
                     <div class="metric-card">
                         <strong>📄 {file.name}</strong><br>
@@ -218,18 +271,43 @@ def main():
             if not openai_key and provider == "openai":
                 st.error("❌ OpenAI API sleutel vereist voor analyse")
             else:
-                process_manuscript(uploaded_files, provider, model, no_rewrite)
+                process_manuscript(uploaded_files, provider, model, no_rewrite, combined_analysis)
+        
+        # Afgebroken analyse hervatten: afgeronde stappen en model calls staan in outputs/runs
+        unfinished = list_runs(runs_dir(), status=("failed", "running"))
+        if unfinished:
+            with st.expander(f"♻️ Afgebroken analyse hervatten ({len(unfinished)})"):
+                runs = {f"{r['run_id']} – {r['provider']}/{r['model']}, {r['total_sections']} secties ({r['status']})": r
+                        for r in unfinished}
+                choice = st.selectbox("Run", list(runs))
+                if runs[choice].get("error"):
+                    st.caption(f"Gestopt met: {runs[choice]['error']}")
+                if st.button("▶️ Analyse hervatten"):
+                    process_manuscript(None, provider, model, no_rewrite, resume_run_id=runs[choice]["run_id"])
+
+        recent_analyses_picker()
+
+        # De actieve analyse (net klaar, heropend of van voor deze rerun)
+        report_data = active_report()
+        if report_data:
+            display_results(report_data, report_data["sections"], report_data["analysis_info"]["timestamp"])
     
     with col2:
         st.subheader("📊 Statistieken")
         if uploaded_files:
-            total_size = sum(len(f.getvalue()) for f in uploaded_files) / 1024
+            total_size = sum(f.size for f in uploaded_files) / 1024
+            stats = [upload_stats(f.getvalue(), f.name) for f in uploaded_files]
             
             col_stat1, col_stat2 = st.columns(2)
             with col_stat1:
                 st.metric("Totale grootte", f"{total_size:.1f} KB")
             with col_stat2:
                 st.metric("Bestanden", len(uploaded_files))
+            col_stat3, col_stat4 = st.columns(2)
+            with col_stat3:
+                st.metric("Secties", sum(s["sections"] for s in stats))
+            with col_stat4:
+                st.metric("Woorden", f"{sum(s['words'] for s in stats):,}")
                 
             # File type breakdown
             file_types = {}
@@ -268,8 +346,8 @@ def main():
             - **API Kosten**: gpt-4o-mini is goedkoopste optie
             """)
 
-def process_manuscript(uploaded_files, provider, model, no_rewrite):
-    """Process the uploaded manuscript files with enhanced UI"""
+def process_manuscript(uploaded_files, provider, model, no_rewrite, combined_analysis=False, resume_run_id=None):
+    """Process the uploaded manuscript files with enhanced UI (of maak run resume_run_id af)"""
     
     # Progress tracking met mooiere UI
     st.markdown("### 🔄 Manuscript wordt geanalyseerd...")
@@ -280,9 +358,33 @@ def process_manuscript(uploaded_files, provider, model, no_rewrite):
         status_text = st.empty()
         
         # Estimated time display
-        estimated_time = len(uploaded_files) * 30  # Rough estimate
+        estimated_time = len(uploaded_files or [None]) * 30  # Rough estimate
         time_display = st.empty()
         start_time = time.time()
+        
+        # Live weergave van tekst die het model nog aan het genereren is
+        live_preview = st.empty()
+    
+    headings = {"outline": "🗂️ Outline", "issues": "🎯 Verbeterpunten", "plan": "📈 Verbeterplan",
+                "timeline_feedback": "🕒 Tijdlijn consistentie"}
+    
+    def on_event(event):
+        """Pipeline events (altijd in deze script thread)"""
+        if event["type"] == "progress":
+            progress_bar.progress(int(20 + (event["done"] / event["total"]) * 50))
+            status_text.text(f"🔍 Analyseren: {event['label']} ({event['done']}/{event['total']} calls)")
+            
+            elapsed = time.time() - start_time
+            remaining = max(0, estimated_time - elapsed)
+            time_display.text(f"⏱️ Resterende tijd: ~{remaining:.0f} seconden")
+        elif event["type"] == "text":
+            live_preview.markdown(f"**{headings[event['stage']]}**\n\n{event['text']} ▌")
+        elif event["type"] == "stage" and event["stage"] == "sections":
+            status_text.text("🎯 Belangrijkste verbeterpunten identificeren...")
+            progress_bar.progress(75)
+        elif event["type"] == "stage" and event["stage"] == "issues":
+            status_text.text("📈 Verbeterplan opstellen...")
+            progress_bar.progress(85)
     
     try:
         # Step 1: Lees bestanden
@@ -290,129 +392,60 @@ def process_manuscript(uploaded_files, provider, model, no_rewrite):
         time_display.text(f"⏱️ Geschatte tijd: {estimated_time} seconden")
         progress_bar.progress(10)
         
-        full_text = ""
         sections = []
         
-        for file in uploaded_files:
-            # Simuleer bestand schrijven en lezen
-            temp_path = Path("temp_" + file.name)
-            temp_path.write_bytes(file.getvalue())
-            
-            try:
-                txt = read_file(temp_path)
-                full_text += f"\n\n=== FILE: {file.name} ===\n\n{txt}"
-                sections += split_sections(txt)
-            finally:
-                if temp_path.exists():
-                    temp_path.unlink()
-        
-        if not sections:
+        for file in uploaded_files or []:
+            # Direct uit het geheugen (en gecachet per inhoud): geen tijdelijk bestand per upload
+            sections += parse_upload(file.getvalue(), file.name)
+        
+        if not sections and not resume_run_id:
             st.error("❌ Geen secties gevonden. Zorg ervoor dat je hoofdstukken duidelijk gemarkeerd zijn met 'Hoofdstuk X' of 'Chapter X'.")
             return
         
-        st.info(f"📚 {len(sections)} secties gevonden voor analyse")
+        if sections:
+            st.info(f"📚 {len(sections)} secties gevonden voor analyse")
         
-        # Step 2: Genereer outline
-        status_text.text("🗂️ Manuscript outline genereren...")
+        # Step 2: Outline, sectie-analyses en tijdlijn lopen tegelijk (zie pipeline.py)
+        status_text.text(f"♻️ Run {resume_run_id} hervatten..." if resume_run_id else f"🔍 {len(sections)} secties analyseren...")
         progress_bar.progress(20)
         elapsed = time.time() - start_time
         remaining = max(0, estimated_time - elapsed)
         time_display.text(f"⏱️ Resterende tijd: ~{remaining:.0f} seconden")
         
-        outline = call_model(p_outline(full_text), provider, model, 0.2)
-        
-        # Step 3: Analyseer secties
-        results = []
-        rubric_blobs = []
+        if resume_run_id:
+            report_data = resume_analysis(resume_run_id, on_event=on_event, stream=True)
+        else:
+            report_data = run_analysis(sections, provider, model, on_event=on_event, rewrite=not no_rewrite,
+                                       combined=combined_analysis, stream=True)
+        results = report_data["sections"]
+        ts = report_data["analysis_info"]["timestamp"]
         
-        total_sections = len(sections)
-        for i, sec in enumerate(sections):
-            progress = 20 + (i / total_sections) * 50
-            progress_bar.progress(int(progress))
-            status_text.text(f"🔍 Analyseren: {sec['title']} ({i+1}/{total_sections})")
-            
-            elapsed = time.time() - start_time
-            remaining = max(0, estimated_time - elapsed)
-            time_display.text(f"⏱️ Resterende tijd: ~{remaining:.0f} seconden")
-            
-            m = rough_metrics(sec["text"])
-            rub = call_model(p_rubric(sec["title"], sec["text"]), provider, model, 0.3)
-            rubric_blobs.append(f"--- {sec['title']} ---\n{rub[:4000]}")
-            
-            rewrite = ""
-            if not no_rewrite:
-                rewrite = call_model(p_short_rewrite(sec["title"], sec["text"]), provider, model, 0.5)
-            
-            results.append({
-                "title": sec["title"], 
-                "metrics": m, 
-                "rubric": rub, 
-                "rewrite": rewrite
-            })
-        
-        # Step 4: Top issues en plan
-        status_text.text("🎯 Belangrijkste verbeterpunten identificeren...")
-        progress_bar.progress(75)
-        
-        top_issues = call_model(p_top_issues(rubric_blobs), provider, model, 0.2)
-        plan = call_model(p_plan(outline, top_issues), provider, model, 0.2)
-        
-        # Step 5: Timeline analyse
-        status_text.text("🕒 Tijdlijn en consistentie analyseren...")
-        progress_bar.progress(85)
-        
-        timeline_rows = []
-        for sec in sections:
-            marks = extract_time_markers(sec["text"])
-            pretty = "; ".join([f"{k}:{v}" for (k,v) in marks]) if marks else "(geen)"
-            timeline_rows.append(f"* {sec['title']}: {pretty}")
-        
-        timeline_text = "\n".join(timeline_rows)
-        timeline_feedback = call_model(p_timeline_feedback(timeline_text), provider, model, 0.2)
-        
-        # Step 6: Resultaten opslaan en tonen
+        # Step 3: Resultaten opslaan en tonen
         status_text.text("💾 Resultaten opslaan en rapport genereren...")
         progress_bar.progress(95)
         
-        ts = time.strftime("%Y%m%d-%H%M%S")
-        
-        # Save files
-        report_data = {
-            "outline": outline,
-            "issues": top_issues,
-            "plan": plan,
-            "timeline_extract": timeline_text,
-            "timeline_feedback": timeline_feedback,
-            "sections": results,
-            "analysis_info": {
-                "provider": provider,
-                "model": model,
-                "timestamp": ts,
-                "total_sections": len(results),
-                "processing_time": time.time() - start_time
-            }
-        }
-        
         # Maak output bestanden
         create_output_files(report_data, results, ts)
         
-        # Step 7: Klaar!
+        # Step 4: Klaar!
         progress_bar.progress(100)
         final_time = time.time() - start_time
         status_text.text("✅ Analyse succesvol voltooid!")
         time_display.text(f"🎉 Voltooid in {final_time:.1f} seconden")
         
         # Clear progress container en toon resultaten
+        live_preview.empty()
         progress_container.empty()
         
         # Success animation
         st.balloons()
         
-        # Toon resultaten
-        display_results(report_data, results, ts)
+        # Resultaten toont main() vanuit session state, nu en bij elke volgende rerun
+        remember_report(report_data)
         
     except Exception as e:
         st.error(f"❌ Fout tijdens verwerking: {str(e)}")
+        st.info("♻️ Afgerond werk is bewaard – hervat het via \"Afgebroken analyse hervatten\"")
         progress_bar.progress(0)
         status_text.text("❌ Verwerking mislukt - probeer opnieuw")
         time_display.text("")
@@ -433,7 +466,8 @@ def create_output_files(report_data, results, ts):
         f"**Gegenereerd op:** {datetime.now().strftime('%d-%m-%Y om %H:%M')}",
         f"**Model gebruikt:** {report_data['analysis_info']['provider']} - {report_data['analysis_info']['model']}",
         f"**Verwerkingstijd:** {report_data['analysis_info']['processing_time']:.1f} seconden",
-        f"**Aantal secties:** {report_data['analysis_info']['total_sections']}",
+        f"**Aantal secties:** {report_data['analysis_info']['total_sections']}"
+        f" ({report_data['analysis_info'].get('reused_sections', 0)} ongewijzigd hergebruikt)",
         "",
         "---",
         "",
@@ -457,7 +491,7 @@ def create_output_files(report_data, results, ts):
     
     for r in results:
         report_md += [
-            f"### 📝 {r['title']}",
+            f"### 📝 {r['title']}" + (" (ongewijzigd – hergebruikt)" if r.get("reused") else ""),
             f"**Statistieken:** {json.dumps(r['metrics'], ensure_ascii=False)}",
             "",
             "#### 🔍 Analyse & Feedback",
@@ -482,8 +516,61 @@ def create_output_files(report_data, results, ts):
         encoding="utf-8"
     )
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def results_view(run_key, _report_data):
+    """JSON download, grafiek data en zoekteksten: één keer per run in plaats van bij elke rerun"""
+    import pandas as pd
+    results = _report_data["sections"]
+    chart = pd.DataFrame([{"Sectie": row["title"], "Woorden": row["words"], "Zinnen": row["sentences"],
+                           "Dialoog %": row["dialogue_pct"]} for row in section_rows(results)])
+    return {
+        "json": json.dumps(_report_data, ensure_ascii=False, indent=2),
+        "chart": chart,
+        "search": [section_search_text(r) for r in results],
+    }
+
+def render_section(result, i, ts):
+    """Statistieken, analyse en herschrijving van één sectie (alleen voor geopende secties)"""
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        # Metrics in mooie cards
+        metrics = result['metrics']
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>📊 Tekst Statistieken</h4>
+            <p><strong>Woorden:</strong> {metrics.get('words', 0):,}</p>
+            <p><strong>Zinnen:</strong> {metrics.get('sentences', 0):,}</p>
+            <p><strong>Dialoog:</strong> {metrics.get('dialog_word_share', 0) * 100:.1f}%</p>
+            <p><strong>Gem. woorden/zin:</strong> {metrics.get('words', 0) / max(1, metrics.get('sentences', 1)):.1f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("**🔍 Analyse & Feedback:**")
+        with st.container():
+            st.markdown(result['rubric'])
+
+    with col2:
+        if result['rewrite']:
+            st.markdown("**✍️ Herschrijfvoorstel:**")
+            with st.container():
+                st.markdown(result['rewrite'])
+
+            # Download button voor individuele herschrijving
+            st.download_button(
+                f"💾 Download herschrijving",
+                result['rewrite'],
+                f"herschrijving-{result['title'][:30]}-{ts}.md",
+                "text/markdown",
+                key=f"download_{i}"
+            )
+        else:
+            st.info("💡 Geen herschrijfvoorstel gegenereerd (uitgeschakeld in instellingen)")
+
 def display_results(report_data, results, ts):
     """Display the analysis results in Streamlit with enhanced UI"""
+    key = run_key(report_data)
+    view = results_view(key, report_data)
     
     # Success header
     st.markdown("""
@@ -515,10 +602,9 @@ def display_results(report_data, results, ts):
     
     with col1:
         # JSON download
-        json_data = json.dumps(report_data, ensure_ascii=False, indent=2)
         st.download_button(
             "📊 JSON Data",
-            json_data,
+            view["json"],
             f"manuscript-analyse-{ts}.json",
             "application/json",
             help="Gestructureerde data voor verdere verwerking"
@@ -579,50 +665,26 @@ def display_results(report_data, results, ts):
     with tab2:
         st.subheader("📖 Gedetailleerde Sectie Analyses")
         
-        # Search/filter functionality
-        search_term = st.text_input("🔍 Zoek in secties:", placeholder="Type om te filteren...")
-        
-        for i, result in enumerate(results):
-            # Filter op zoekterm
-            if search_term and search_term.lower() not in result['title'].lower():
-                continue
-                
-            with st.expander(f"📝 {result['title']}", expanded=i==0):
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    # Metrics in mooie cards
-                    metrics = result['metrics']
-                    st.markdown(f"""
-                    <div class="metric-card">
-                        <h4>📊 Tekst Statistieken</h4>
-                        <p><strong>Woorden:</strong> {metrics.get('words', 0):,}</p>
-                        <p><strong>Zinnen:</strong> {metrics.get('sentences', 0):,}</p>
-                        <p><strong>Dialoog:</strong> {metrics.get('dialogue_pct', 0):.1f}%</p>
-                        <p><strong>Gem. woorden/zin:</strong> {metrics.get('words', 0) / max(1, metrics.get('sentences', 1)):.1f}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown("**🔍 Analyse & Feedback:**")
-                    with st.container():
-                        st.markdown(result['rubric'])
-                
-                with col2:
-                    if result['rewrite']:
-                        st.markdown("**✍️ Herschrijfvoorstel:**")
-                        with st.container():
-                            st.markdown(result['rewrite'])
-                            
-                        # Download button voor individuele herschrijving
-                        st.download_button(
-                            f"💾 Download herschrijving",
-                            result['rewrite'],
-                            f"herschrijving-{result['title'][:30]}-{ts}.md",
-                            "text/markdown",
-                            key=f"download_{i}"
-                        )
-                    else:
-                        st.info("💡 Geen herschrijfvoorstel gegenereerd (uitgeschakeld in instellingen)")
+        # Zoeken in titels én analyses; alleen de huidige pagina wordt getoond en alleen
+        # geopende secties worden volledig gerenderd
+        search_term = st.text_input("🔍 Zoek in secties:", placeholder="Type om te filteren...",
+                                    key=f"section_search_{key}")
+        matches = search_sections(view["search"], search_term)
+        shown, page, pages = page_of(matches, 1)
+        if pages > 1:
+            # Een nieuwe zoekopdracht begint weer op pagina 1 (de zoekterm zit in de widget key)
+            page = st.number_input(f"Pagina (van {pages})", min_value=1, max_value=pages, value=1,
+                                   key=f"section_page_{key}_{search_term}")
+            shown, page, pages = page_of(matches, page)
+        st.caption(f"{len(matches)} van {len(results)} secties" + (f" – pagina {page} van {pages}" if pages > 1 else ""))
+        for i in shown:
+            result = results[i]
+            label = f"📝 {result['title']} ({result['metrics'].get('words', 0):,} woorden)"
+            # De eerste sectie staat standaard open, net als voorheen
+            if st.toggle(label + (" ♻️ ongewijzigd" if result.get("reused") else ""), value=i == 0,
+                         key=f"section_open_{key}_{i}"):
+                with st.container(border=True):
+                    render_section(result, i, ts)
     
     with tab3:
         st.subheader("🕒 Tijdlijn & Consistentie Analyse")
@@ -642,7 +704,7 @@ def display_results(report_data, results, ts):
         # Overall stats cards
         total_words = sum(r['metrics'].get('words', 0) for r in results)
         total_sentences = sum(r['metrics'].get('sentences', 0) for r in results)
-        avg_dialogue = sum(r['metrics'].get('dialogue_pct', 0) for r in results) / len(results) if results else 0
+        avg_dialogue = view["chart"]["Dialoog %"].mean() if results else 0
         avg_words_per_sentence = total_words / max(1, total_sentences)
         
         col1, col2, col3, col4 = st.columns(4)
@@ -653,18 +715,8 @@ def display_results(report_data, results, ts):
         
         # Interactive charts
         if results:
-            import pandas as pd
-            
-            # Data voorbereiding
-            chart_data = pd.DataFrame([
-                {
-                    'Sectie': r['title'][:25] + "..." if len(r['title']) > 25 else r['title'],
-                    'Woorden': r['metrics'].get('words', 0),
-                    'Zinnen': r['metrics'].get('sentences', 0),
-                    'Dialoog %': r['metrics'].get('dialogue_pct', 0)
-                }
-                for r in results
-            ])
+            # Eén keer per run opgebouwd (results_view)
+            chart_data = view["chart"]
             
             st.subheader("📈 Woorden per sectie")
             st.bar_chart(chart_data.set_index('Sectie')['Woorden'])
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+OpenAI Batch API runner voor offline bulk analyses
+Schrijft chat-completion requests naar een JSONL bestand, dient het in als batch,
+pollt tot de batch klaar is en leest de antwoorden per custom_id terug
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+BATCH_POLL_INTERVAL = float(os.getenv("ARC_BATCH_POLL_INTERVAL", "60"))
+BATCH_COMPLETION_WINDOW = os.getenv("ARC_BATCH_WINDOW", "24h")
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+BATCH_PRICE_FACTOR = 0.5  # de Batch API kost de helft van een gewone call
+
+class BatchError(Exception):
+    """De batch is niet (volledig) uitgevoerd"""
+
+# ====== INPUT ======
+def batch_request(custom_id, model, prompt, temperature, system, response_format=None):
+    """Eén regel van het batch bestand (zelfde body als een gewone chat completion)"""
+    body = {"model": model, "temperature": temperature,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt}]}
+    if response_format:
+        body["response_format"] = response_format
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+def write_batch_file(path, requests):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+# ====== BATCH LEVENSCYCLUS ======
+def submit_batch(client, path, metadata=None):
+    """Upload het JSONL bestand en maak de batch aan"""
+    with open(path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    args = {"input_file_id": input_file.id, "endpoint": BATCH_ENDPOINT,
+            "completion_window": BATCH_COMPLETION_WINDOW}
+    if metadata:
+        args["metadata"] = metadata
+    return client.batches.create(**args)
+
+def wait_for_batch(client, batch_id, poll_interval=None, timeout=None, on_status=None):
+    """Poll tot de batch een eindstatus heeft; on_status(batch) na elke poll"""
+    interval = BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if on_status:
+            on_status(batch)
+        if batch.status in FINAL_STATUSES:
+            return batch
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise BatchError(f"Batch {batch_id} not finished after {timeout:.0f}s (status: {batch.status})")
+        time.sleep(interval)
+
+def _read_jsonl(client, file_id):
+    if not file_id:
+        return []
+    text = client.files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def read_batch_output(client, batch, usage=None):
+    """Antwoorden per custom_id; requests die mislukt zijn komen in errors terecht
+
+    Een meegegeven usage dict krijgt per geslaagde custom_id de "usage" van het antwoord.
+
+    Returns:
+        (results {custom_id: tekst}, errors {custom_id: foutmelding})
+    """
+    results, errors = {}, {}
+    for line in _read_jsonl(client, batch.output_file_id):
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            errors[line["custom_id"]] = str(line.get("error") or response.get("body"))
+            continue
+        body = response.get("body") or {}
+        choices = body.get("choices") or [{}]
+        results[line["custom_id"]] = ((choices[0].get("message") or {}).get("content") or "").strip()
+        if usage is not None and body.get("usage"):
+            usage[line["custom_id"]] = body["usage"]
+    for line in _read_jsonl(client, getattr(batch, "error_file_id", None)):
+        errors.setdefault(line["custom_id"], str(line.get("error") or line.get("response")))
+    return results, errors
+
+def run_batch(client, requests, path, poll_interval=None, timeout=None, on_status=None, metadata=None, usage=None):
+    """Schrijf, dien in, wacht en lees terug (usage: zie read_batch_output)
+
+    Returns:
+        (batch, results, errors) - zie read_batch_output
+    """
+    write_batch_file(path, requests)
+    batch = submit_batch(client, path, metadata)
+    batch = wait_for_batch(client, batch.id, poll_interval, timeout, on_status)
+    if batch.status != "completed" and not batch.output_file_id:
+        raise BatchError(f"Batch {batch.id} ended with status '{batch.status}'")
+    results, errors = read_batch_output(client, batch, usage)
+    return batch, results, errors
+
+def batch_duration(batch, measured):
+    """Doorlooptijd van de batch volgens OpenAI (created_at -> completed_at), anders de gemeten tijd"""
+    created, completed = getattr(batch, "created_at", None), getattr(batch, "completed_at", None)
+    return completed - created if created and completed else measured
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark van de lokale metrics op een synthetisch manuscript (standaard 100k woorden)
+Vergelijkt de oude regex implementaties (hieronder bewaard als referentie) met de huidige
+functies die één gedeelde TextContext gebruiken, en controleert dat de uitkomsten gelijk zijn
+(behalve de dialoog velden, die nu uit dialogue.py komen).
+
+    python benchmark_metrics.py [--words 100000] [--repeat 3] [--skip characters ...]
+    python benchmark_metrics.py --pool [--workers 8]
+"""
+import argparse
+import random
+import re
+import time
+
+from cli_manuscript_assistant import rough_metrics, enhanced_metrics, calculate_readability_score
+from enhanced_analysis import (
+    analyze_character_development, analyze_pacing, analyze_style_issues, analyze_show_vs_tell
+)
+from text_context import TextContext
+
+# ====== REFERENTIE (oude implementaties) ======
+def legacy_rough_metrics(text):
+    words = re.findall(r"\w+(?:'\w+)?", text); wc = len(words)
+    sents = [s for s in re.split(r"(?<=[\.\!\?])\s+", text) if s.strip()]
+    avg = (sum(len(s.split()) for s in sents)/len(sents)) if sents else 0
+    dialogs = re.findall(r"[\"""\''].+?[\"""\'']", text, flags=re.S)
+    dshare = (sum(len(d.split()) for d in dialogs)/wc) if wc else 0
+    adverbs = re.findall(r"\b\w+ly\b", text) + re.findall(r"\b\w+lijk\b", text, flags=re.I)
+    return {"words": wc, "sentences": len(sents), "avg_sentence_words": round(avg,2),
+            "dialog_word_share": round(dshare,3), "adverb_count": len(adverbs)}
+
+def legacy_readability_score(text):
+    words = text.split()
+    sentences = [s for s in re.split(r'[.!?]+', text) if s.strip()]
+    if not words or not sentences:
+        return 0.0
+    avg_words_per_sentence = len(words) / len(sentences)
+    long_words = len([w for w in words if len(w) > 6])
+    long_word_ratio = long_words / len(words)
+    score = 206.835 - (1.015 * avg_words_per_sentence) - (84.6 * long_word_ratio)
+    return max(0.0, min(100.0, round(score, 1)))
+
+def legacy_character_development(text):
+    names = re.findall(r'\b[A-Z][a-z]{2,}(?:\s+[A-Z][a-z]+)*\b', text)
+    name_counts = {}
+    stopwords = {
+        'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als',
+        'Dat', 'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog', 'Al', 'Zo', 'Zeer',
+        'Hoofdstuk', 'Chapter', 'Deel', 'Part', 'Sectie', 'Epiloog', 'Proloog'
+    }
+    for name in names:
+        if len(name) >= 3 and name not in stopwords and not name.lower() in ['het', 'een', 'die', 'deze']:
+            name_counts[name] = name_counts.get(name, 0) + 1
+    likely_characters = {}
+    for name, count in name_counts.items():
+        if count >= 2 or (count >= 1 and len(name) >= 5):
+            likely_characters[name] = count
+    emotions = r'\b(afraid|happy|sad|angry|frustrated|excited|nervous|calm|tense|joyful|unhappy|anxious|proud|ashamed|disappointed|scared|worried|confused|surprised|shocked)\b'
+    character_analysis = {}
+    for char in likely_characters:
+        char_sentences = re.findall(f'[^.!?]*\\b{char}\\b[^.!?]*[.!?]', text, re.IGNORECASE)
+        emotions_found = []
+        for sentence in char_sentences:
+            emotions_found.extend(re.findall(emotions, sentence, re.IGNORECASE))
+        character_analysis[char] = {
+            'mentions': likely_characters[char],
+            'emotions': emotions_found,
+            'sentences': len(char_sentences)
+        }
+    return character_analysis
+
+def legacy_pacing(text):
+    from enhanced_analysis import calculate_pacing_score
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    lengths = [len(s.split()) for s in sentences]
+    avg_length = sum(lengths) / len(lengths) if lengths else 0
+    action_words = r'\b(ran|jumped|grabbed|shouted|screamed|fought|hit|pushed|pulled|threw|rushed|leaped|struck|slammed|burst|charged)\b'
+    description_words = r'\b(was|had|seemed|stood|lay|sat|looked|felt|thought|knew|appeared|remained)\b'
+    action_count = len(re.findall(action_words, text, re.IGNORECASE))
+    description_count = len(re.findall(description_words, text, re.IGNORECASE))
+    dialog_text = re.findall(r'["\'"][^"\']*["\']', text)
+    dialog_words = sum(len(d.split()) for d in dialog_text)
+    total_words = len(text.split())
+    dialog_ratio = dialog_words / total_words if total_words > 0 else 0
+    return {
+        'avg_sentence_length': round(avg_length, 2),
+        'sentence_variety': round(max(lengths) - min(lengths), 2) if lengths else 0,
+        'action_description_ratio': round(action_count / max(description_count, 1), 2),
+        'dialog_ratio': round(dialog_ratio, 3),
+        'pacing_score': calculate_pacing_score(action_count, description_count, dialog_ratio)
+    }
+
+def legacy_style_issues(text):
+    issues = []
+    adverbs = re.findall(r'\b\w+ly\b', text, re.IGNORECASE)
+    if len(adverbs) > len(text.split()) * 0.05:
+        issues.append(f"Too many adverbs ({len(adverbs)} found). Replace with stronger verbs.")
+    words = re.findall(r'\b\w+\b', text.lower())
+    word_counts = {}
+    for word in words:
+        if len(word) > 3:
+            word_counts[word] = word_counts.get(word, 0) + 1
+    repeated = {w: c for w, c in word_counts.items() if c > 5}
+    if repeated:
+        issues.append(f"Repeated words: {', '.join([f'{w} ({c}x)' for w, c in list(repeated.items())[:5]])}")
+    weak_verbs = ['was', 'had', 'went', 'came', 'did', 'made', 'got', 'put', 'took']
+    weak_count = sum(text.lower().count(verb) for verb in weak_verbs)
+    total_verbs = len(re.findall(r'\b\w+(?:ed|ing|s)\b', text)) + weak_count
+    if weak_count > total_verbs * 0.3:
+        issues.append(f"Many weak verbs ({weak_count}). Use more specific actions.")
+    paragraphs = text.split('\n\n')
+    long_paras = [p for p in paragraphs if len(p.split()) > 100 and '"' not in p]
+    if long_paras:
+        issues.append(f"{len(long_paras)} possible info-dumps found. Break up with action/dialog.")
+    return issues
+
+def legacy_show_vs_tell(text):
+    from enhanced_analysis import calculate_show_tell_score
+    tell_words = r'\b(felt|thought|knew|understood|realized|was\s+\w+|seemed\s+\w+|appeared\s+\w+)\b'
+    tell_matches = len(re.findall(tell_words, text, re.IGNORECASE))
+    show_words = r'\b(looked|listened|smelled|tasted|felt|grabbed|whispered|shouted|trembled|sweated|glanced|stared|reached|touched|smiled|frowned)\b'
+    show_matches = len(re.findall(show_words, text, re.IGNORECASE))
+    sensory_words = r'\b(saw|heard|smelled|tasted|felt|warm|cold|soft|rough|sweet|sour|bright|dark|loud|quiet)\b'
+    sensory_count = len(re.findall(sensory_words, text, re.IGNORECASE))
+    total_words = len(text.split())
+    return {
+        'tell_ratio': round(tell_matches / max(total_words, 1) * 100, 2),
+        'show_ratio': round((show_matches + sensory_count) / max(total_words, 1) * 100, 2),
+        'show_vs_tell_score': calculate_show_tell_score(show_matches + sensory_count, tell_matches)
+    }
+
+# Velden die sinds de dialoog scanner (dialogue.py) bewust anders zijn dan in de oude regexes
+DIALOGUE_FIELDS = {"dialog_word_share", "dialog_ratio", "pacing_score", "engagement_score", "speakers"}
+
+def comparable(result):
+    """Resultaat zonder de dialoog velden (recursief), om oud en nieuw te vergelijken"""
+    if isinstance(result, dict):
+        return {key: comparable(value) for key, value in result.items() if key not in DIALOGUE_FIELDS}
+    if isinstance(result, (list, tuple)):
+        return [comparable(value) for value in result]
+    return result
+
+LEGACY = {
+    "rough_metrics": (legacy_rough_metrics, rough_metrics),
+    "readability_score": (legacy_readability_score, calculate_readability_score),
+    "characters": (legacy_character_development, analyze_character_development),
+    "pacing": (legacy_pacing, analyze_pacing),
+    "style_issues": (legacy_style_issues, analyze_style_issues),
+    "show_vs_tell": (legacy_show_vs_tell, analyze_show_vs_tell),
+}
+
+def legacy_enhanced_metrics(text):
+    from cli_manuscript_assistant import calculate_engagement_score
+    pacing_data = legacy_pacing(text)
+    show_tell = legacy_show_vs_tell(text)
+    style_issues = legacy_style_issues(text)
+    return {
+        **legacy_rough_metrics(text),
+        "characters": legacy_character_development(text),
+        "pacing": pacing_data,
+        "style_issues": style_issues,
+        "show_vs_tell": show_tell,
+        "readability_score": legacy_readability_score(text),
+        "engagement_score": calculate_engagement_score(pacing_data, show_tell, len(style_issues))
+    }
+
+# ====== SYNTHETISCH MANUSCRIPT ======
+_NAMES = ["Eldrin", "Mara", "Thorne", "Lady Sera", "Kael", "Ysolde", "Brannock", "Vex"]
+_VERBS = ["ran", "stood", "looked", "felt", "whispered", "grabbed", "was", "seemed", "knew",
+          "walked", "turned", "waited", "smiled", "appeared", "realized", "heard", "reached"]
+_WORDS = ["the", "dark", "tower", "quietly", "sword", "ancient", "river", "cold", "slowly",
+          "shadow", "warm", "door", "kingdom", "afraid", "happy", "nervous", "calm", "stone",
+          "suddenly", "bright", "forest", "don't", "it's", "werkelijk", "light", "carefully"]
+
+def make_manuscript(words=100_000, seed=42):
+    """Deterministisch nep-manuscript met hoofdstukken, alinea's, dialoog en namen"""
+    rng = random.Random(seed)
+    parts, count, chapter = [], 0, 0
+    while count < words:
+        if count % 4000 < 20:
+            chapter += 1
+            parts.append(f"\n\nChapter {chapter}\n\n")
+        sentence = [rng.choice(_NAMES), rng.choice(_VERBS)]
+        sentence += [rng.choice(_WORDS) for _ in range(rng.randint(3, 18))]
+        text = " ".join(sentence)
+        if rng.random() < 0.3:
+            quote = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 8)))
+            text += f', "{quote.capitalize()}{rng.choice(".!?")}"'
+        else:
+            text += rng.choice([".", ".", ".", "!", "?", "..."])
+        parts.append(text + ("\n\n" if rng.random() < 0.15 else " "))
+        count += len(text.split())
+    return "".join(parts)
+
+def local_metrics(text):
+    """Alle lokale metrics behalve characters op één gedeelde context"""
+    ctx = TextContext(text)
+    return [new(ctx) for name, (old, new) in LEGACY.items() if name != "characters"]
+
+def legacy_local_metrics(text):
+    return [old(text) for name, (old, new) in LEGACY.items() if name != "characters"]
+
+def _best(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def pool_benchmark(words, repeat, workers):
+    """Quick-scan (rough_metrics per sectie): sequentieel tegen de process pool"""
+    import pickle
+    from cli_manuscript_assistant import split_sections
+    from shared_text import SharedManuscript
+    import metrics_pool
+
+    texts = [s["content"] for s in split_sections(make_manuscript(words))]
+    print(f"Quick-scan: {len(texts)} secties, {words:,} woorden, {workers} workers\n")
+    # Per taak: de teksten zelf (pickle) tegen alleen de offsets in de gedeelde buffer
+    parts = metrics_pool.batches(texts, workers * metrics_pool.BATCHES_PER_WORKER)
+    as_text = max(len(pickle.dumps(part)) for part in parts)
+    with SharedManuscript(texts) as shared:
+        spans = metrics_pool.batches(shared.spans, workers * metrics_pool.BATCHES_PER_WORKER, lambda s: s[1] - s[0])
+        as_offsets = max(len(pickle.dumps((shared.name, part))) for part in spans)
+    print(f"{'taak payload':<24}{as_text / 1024:>8.1f}KB tekst -> {as_offsets}B offsets")
+    start = time.perf_counter()
+    metrics_pool.warm_up(workers, block=True)
+    print(f"{'pool starten':<24}{(time.perf_counter() - start) * 1000:>8.1f}ms (eenmalig)")
+    sequential, expected = _best(lambda _: metrics_pool.measure(texts), None, repeat)
+    parallel, result = _best(lambda _: metrics_pool.parallel_metrics(texts, workers=workers), None, repeat)
+    same = "" if result == expected else "  VERSCHIL!"
+    print(f"{'sequentieel':<24}{sequential * 1000:>8.1f}ms")
+    print(f"{'process pool':<24}{parallel * 1000:>8.1f}ms{sequential / parallel:>9.1f}x{same}")
+    metrics_pool.shutdown_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lokale manuscript metrics")
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip", nargs="*", default=[], choices=list(LEGACY) + ["local_metrics", "enhanced_metrics"],
+                        help="metrics overslaan (de oude characters analyse duurt minuten)")
+    parser.add_argument("--pool", action="store_true",
+                        help="quick-scan van secties sequentieel vs process pool (standaard 150k woorden)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.pool:
+        import metrics_pool
+        words = args.words if args.words != 100_000 else 150_000
+        pool_benchmark(words, args.repeat, args.workers or metrics_pool.METRICS_WORKERS)
+        return
+
+    text = make_manuscript(args.words)
+    print(f"Manuscript: {len(text.split()):,} woorden, {len(text):,} tekens (beste van {args.repeat})\n")
+    print(f"{'metric':<20}{'oud':>10}{'nieuw':>10}{'speedup':>10}")
+    rows = list(LEGACY.items()) + [("local_metrics", (legacy_local_metrics, local_metrics)),
+                                   ("enhanced_metrics", (legacy_enhanced_metrics, enhanced_metrics))]
+    for name, (old, new) in rows:
+        if name in args.skip:
+            continue
+        old_time, old_result = _best(old, text, args.repeat)
+        new_time, new_result = _best(new, text, args.repeat)
+        same = "" if comparable(old_result) == comparable(new_result) else "  VERSCHIL!"
+        print(f"{name:<20}{old_time * 1000:>8.1f}ms{new_time * 1000:>8.1f}ms{old_time / new_time:>9.1f}x{same}")
+
+if __name__ == "__main__":
+    main()
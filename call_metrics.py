@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Instrumentatie van model calls voor Arc Crusade Manuscript Assistant
+Elke call levert een record (soort prompt, provider, model, tokens, tijd, wachtrij, retries,
+cache hit, geschatte kosten) dat naar een JSONL log en naar in-memory aggregators gaat
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+METRICS_ENABLED = os.getenv("ARC_METRICS", "1").lower() not in ("0", "false", "no", "off")
+METRICS_LOG = os.getenv("ARC_METRICS_LOG", str(Path("outputs") / "metrics" / "calls.jsonl"))
+
+# USD per 1M tokens (input, output); langste prefix wint, onbekende modellen kosten 0
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """Geschatte kosten in USD (0 voor lokale/onbekende modellen)"""
+    matches = [name for name in MODEL_PRICES if (model or "").startswith(name)]
+    if not matches:
+        return 0.0
+    price_in, price_out = MODEL_PRICES[max(matches, key=len)]
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+# ====== AGGREGATIE ======
+_TOTAL_FIELDS = ("calls", "cache_hits", "errors", "input_tokens", "output_tokens",
+                 "wall_time", "queue_wait", "retries", "cost_usd")
+
+def _empty_totals():
+    return dict.fromkeys(_TOTAL_FIELDS, 0)
+
+class CallAggregator:
+    """Thread-safe totalen over records, ook per prompt-soort"""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._totals = _empty_totals()
+        self._by_kind = {}
+
+    def add(self, record):
+        with self._lock:
+            for totals in (self._totals, self._by_kind.setdefault(record["kind"], _empty_totals())):
+                totals["calls"] += 1
+                totals["cache_hits"] += bool(record["cache_hit"])
+                totals["errors"] += bool(record["error"])
+                for field in ("input_tokens", "output_tokens", "wall_time", "queue_wait", "retries", "cost_usd"):
+                    totals[field] += record[field]
+
+    def summary(self):
+        """Totalen plus uitsplitsing per soort (tijden in seconden, kosten in USD)"""
+        with self._lock:
+            summary = _rounded(self._totals)
+            summary["by_kind"] = {kind: _rounded(totals) for kind, totals in sorted(self._by_kind.items())}
+        if self.run_id:
+            summary["run_id"] = self.run_id
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._totals = _empty_totals()
+            self._by_kind = {}
+
+def _rounded(totals):
+    rounded = dict(totals)
+    for field in ("wall_time", "queue_wait"):
+        rounded[field] = round(rounded[field], 3)
+    rounded["cost_usd"] = round(rounded["cost_usd"], 6)
+    return rounded
+
+class JsonlSink:
+    """Append-only JSONL bestand; één regel per call"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+# Alle calls van dit proces; per run (Streamlit sessie, CLI run, API request) via track_run()
+PROCESS_METRICS = CallAggregator()
+SINK = JsonlSink(METRICS_LOG) if METRICS_ENABLED and METRICS_LOG else None
+_current_run = contextvars.ContextVar("arc_run_metrics", default=None)
+
+@contextmanager
+def track_run(run_id=None):
+    """Verzamel alle calls binnen dit blok (ook in worker threads via run_tasks en asyncio tasks)"""
+    aggregator = CallAggregator(run_id or uuid.uuid4().hex[:12])
+    token = _current_run.set(aggregator)
+    try:
+        yield aggregator
+    finally:
+        _current_run.reset(token)
+
+def current_run():
+    return _current_run.get()
+
+# ====== RECORDS ======
+def record_call(record):
+    """Stuur een record naar de aggregators en de JSONL sink"""
+    if not METRICS_ENABLED:
+        return
+    run = _current_run.get()
+    if run is not None:
+        record["run_id"] = run.run_id
+        run.add(record)
+    PROCESS_METRICS.add(record)
+    if SINK is not None:
+        try:
+            SINK.write(record)
+        except OSError:
+            pass
+
+def _call_record(kind, provider, model, info, started, error):
+    input_tokens = int(info.get("input_tokens") or 0)
+    output_tokens = int(info.get("output_tokens") or 0)
+    cache_hit = bool(info.get("cache_hit"))
+    cost = 0.0 if cache_hit or provider != "openai" else estimate_cost(model, input_tokens, output_tokens)
+    return {
+        "ts": round(time.time(), 3),
+        "kind": kind or "other",
+        "provider": provider,
+        "model": model,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "wall_time": round(info.get("wall_time", time.perf_counter() - started), 4),
+        "queue_wait": info.get("queue_wait", 0.0),
+        "retries": info.get("retries", 0),
+        "cache_hit": cache_hit,
+        "cost_usd": cost * info.get("price_factor", 1.0),
+        "error": error or info.get("error"),
+    }
+
+@contextmanager
+def measure_call(kind, provider, model):
+    """Meet één model call; de call vult de yielded info dict aan
+
+    Bekende keys: input_tokens, output_tokens (anders geschat door de caller), cache_hit,
+    queue_wait en retries (gevuld door rate_limiter). Voor calls die elders liepen (Batch API)
+    ook wall_time, error en price_factor (korting op de geschatte kosten).
+    """
+    info = {}
+    started = time.perf_counter()
+    error = None
+    try:
+        yield info
+    except GeneratorExit:
+        # Een stream die de consumer niet helemaal uitleest is geen fout
+        raise
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        record_call(_call_record(kind, provider, model, info, started, error))
+
+@asynccontextmanager
+async def ameasure_call(kind, provider, model):
+    """measure_call voor async calls; het record (JSONL schrijven) gaat buiten de event loop"""
+    info = {}
+    started = time.perf_counter()
+    error = None
+    try:
+        yield info
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        await asyncio.to_thread(record_call, _call_record(kind, provider, model, info, started, error))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Karakter index voor Arc Crusade Manuscript Assistant
+Eén lineaire pass over de woorden van een TextContext geeft per personage de vermeldingen, de
+zinnen (zin ID's) waarin het voorkomt en de emotiewoorden in die zinnen. Dit vervangt de regex
+per naam ([^.!?]*\\bnaam\\b[^.!?]*[.!?]), die bij veel namen en lange hoofdstukken kwadratisch werd;
+de uitkomst is gelijk aan die van de oude regex.
+"""
+import re
+
+from text_context import TextContext, WordSet, positions
+
+# Namen: woorden met hoofdletter, eventueel meerdere achter elkaar ("Lady Sera")
+_FULL_NAME = re.compile(r'\b[A-Z][a-z]{2,}(?:\s+[A-Z][a-z]+)*\b')
+_NAME_WORD = re.compile(r'[A-Z][a-z]{2,}')
+_NAME_PARTS = re.compile(r'(\s+)')
+
+STOPWORDS = {
+    'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als',
+    'Dat', 'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog', 'Al', 'Zo', 'Zeer',
+    'Hoofdstuk', 'Chapter', 'Deel', 'Part', 'Sectie', 'Epiloog', 'Proloog'
+}
+# De kortere lijst die p_rubric altijd gebruikt heeft
+RUBRIC_STOPWORDS = {'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als', 'Dat',
+                    'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog'}
+
+EMOTION_WORDS = WordSet('afraid', 'happy', 'sad', 'angry', 'frustrated', 'excited', 'nervous', 'calm', 'tense',
+                        'joyful', 'unhappy', 'anxious', 'proud', 'ashamed', 'disappointed', 'scared', 'worried',
+                        'confused', 'surprised', 'shocked')
+
+# ====== NAMEN ======
+def name_counts(text):
+    """Volledige namen (ook "Lady Sera") met hun aantal, in volgorde van eerste voorkomen"""
+    counts = {}
+    for name in _FULL_NAME.findall(TextContext.of(text).text):
+        if name not in STOPWORDS and name.lower() not in ('het', 'een', 'die', 'deze'):
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+def likely_characters(text):
+    """Waarschijnlijke personages: 2+ keer genoemd, of een langere naam zoals "Eldrin" """
+    return {name: count for name, count in name_counts(text).items() if count >= 2 or len(name) >= 5}
+
+def capitalized_names(text, min_count=2, stopwords=RUBRIC_STOPWORDS):
+    """Losse woorden met hoofdletter die min_count+ keer voorkomen (uit de token telling)"""
+    return [word for word, count in TextContext.of(text).token_counts.items()
+            if count >= min_count and word not in stopwords and _NAME_WORD.fullmatch(word)]
+
+# ====== INDEX ======
+def _same_word(token, word):
+    # \bword\b met re.IGNORECASE; niet-ASCII tokens via de regex (bijv. 'ı' telt als 'i')
+    if token.isascii():
+        return token.lower() == word.lower()
+    return re.fullmatch(word, token, re.IGNORECASE) is not None
+
+def character_index(text, names):
+    """Per naam de vermeldingen, zinnen en emotiewoorden, in één pass
+
+    Een vermelding is de naam als heel woord (hoofdletterongevoelig). Zinnen zijn de stukken
+    tussen losse . ! ?; een vermelding na het laatste leesteken telt niet als zin.
+
+    Returns:
+        {naam: {"positions": [token index per vermelding], "sentence_ids": [zin ID, oplopend],
+                "emotions": [emotiewoorden uit die zinnen, in tekstvolgorde]}}
+    """
+    ctx = TextContext.of(text)
+    tokens, gaps = ctx.tokens, ctx.gaps
+    closed = len(ctx.terminator_offsets)
+
+    # Naam -> woorden en de exacte witruimte ertussen, opgezocht via het eerste woord
+    by_first = {}
+    for name in names:
+        parts = _NAME_PARTS.split(name)
+        by_first.setdefault(parts[0].lower(), []).append((name, parts[2::2], parts[1::2]))
+    index = {name: {"positions": [], "sentence_ids": [], "emotions": []} for name in names}
+
+    # Per verschillend woord in de tekst welke namen ermee beginnen (hash lookup per token)
+    candidates = {}
+    if by_first:
+        first_words = WordSet(*by_first)
+        for token in ctx.token_counts:
+            if token in first_words:
+                candidates[token] = by_first.get(token.lower()) if token.isascii() else [
+                    c for first, group in by_first.items() if _same_word(token, first) for c in group]
+
+    hits = positions(tokens, candidates.__contains__)
+    for i, sentence in zip(hits, ctx.sentence_ids(hits)):
+        for name, rest, spaces in candidates[tokens[i]]:
+            if rest and not (i + len(rest) < len(tokens) and all(
+                    gaps[i + j] == space and _same_word(tokens[i + j], word)
+                    for j, (word, space) in enumerate(zip(rest, spaces), start=1))):
+                continue
+            entry = index[name]
+            entry["positions"].append(i)
+            if sentence < closed and (not entry["sentence_ids"] or entry["sentence_ids"][-1] != sentence):
+                entry["sentence_ids"].append(sentence)
+
+    # Emotiewoorden per zin, alleen als er personages zijn
+    if any(entry["sentence_ids"] for entry in index.values()):
+        emotion_hits = {t for t in ctx.token_counts if t in EMOTION_WORDS}
+        found = positions(tokens, emotion_hits.__contains__)
+        by_sentence = {}
+        for i, sentence in zip(found, ctx.sentence_ids(found)):
+            by_sentence.setdefault(sentence, []).append(tokens[i])
+        for entry in index.values():
+            entry["emotions"] = [word for sentence in entry["sentence_ids"] for word in by_sentence.get(sentence, ())]
+    return index
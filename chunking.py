@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Token-aware chunking voor Arc Crusade Manuscript Assistant
+Splitst te lange input op scène-, alinea- en zinsgrenzen in stukken die binnen het
+token budget van een prompt passen (map), zodat niets meer stilletjes wordt afgekapt
+"""
+import os
+import re
+
+# --- optioneel exacte token telling ---
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    HAS_TIKTOKEN = True
+except Exception:
+    _ENCODING = None
+    HAS_TIKTOKEN = False
+
+# Input budget (tokens) per prompt soort; gelijk aan de oude tekenlimieten (~4 tekens per token)
+TOKEN_BUDGETS = {
+    "outline": 3750,
+    "rubric": 3000,
+    "combined": 3000,
+    "scene_structure": 3000,
+    "character_analysis": 2500,
+    "emotional_depth": 2500,
+    "genre_analysis": 2500,
+    "rewrite": 2000,
+    "prose_quality": 2000,
+    "short_rewrite": 1500,
+    "summary": 3000,
+}
+# Eén budget voor alle prompts, bijv. voor modellen met een groot context window
+CHUNK_TOKENS = int(os.getenv("ARC_CHUNK_TOKENS", "0"))
+
+def token_budget(kind):
+    """Maximaal aantal input tokens voor een prompt soort"""
+    return CHUNK_TOKENS or TOKEN_BUDGETS[kind]
+
+def count_tokens(text):
+    """Aantal tokens (tiktoken indien geïnstalleerd, anders ~4 tekens per token)"""
+    if HAS_TIKTOKEN:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def truncate_tokens(text, max_tokens):
+    """Kap af op max_tokens; vangnet voor input die niet via split_into_chunks is gegaan"""
+    if HAS_TIKTOKEN:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _ENCODING.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+# ====== SPLITSEN ======
+# Van grof naar fijn: scène-overgangen (***, ---, ~~~, #), alinea's, zinnen, woorden.
+# Elke regex heeft één capture group zodat het scheidingsteken bewaard blijft.
+_SPLITTERS = [
+    re.compile(r"(\n[ \t]*(?:(?:\*[ \t]*){3,}|-{3,}|~{3,}|#{1,3})[ \t]*\n)"),
+    re.compile(r"(\n[ \t]*\n)"),
+    re.compile(r"((?<=[.!?…\"'”])\s+)"),
+    re.compile(r"(\s+)"),
+]
+
+def _units(text, max_tokens, level=0):
+    """Deel text op in stukken van hooguit max_tokens, zo grof mogelijk"""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    if level == len(_SPLITTERS):
+        size = max(1, max_tokens * 4)
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    parts = _SPLITTERS[level].split(text)
+    # [stuk, scheiding, stuk, ...]: scheiding blijft aan het voorgaande stuk hangen
+    pieces = [parts[k] + (parts[k + 1] if k + 1 < len(parts) else "") for k in range(0, len(parts), 2)]
+    if len(pieces) == 1:
+        return _units(text, max_tokens, level + 1)
+    units = []
+    for piece in pieces:
+        units.extend(_units(piece, max_tokens, level + 1))
+    return units
+
+def split_into_chunks(text, max_tokens):
+    """Splits text in opeenvolgende chunks van hooguit max_tokens
+
+    Grenzen vallen bij voorkeur tussen scènes, dan tussen alinea's, dan tussen zinnen.
+    "".join(chunks) is weer exact de oorspronkelijke tekst.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    chunks, current, size = [], [], 0
+    for unit in _units(text, max_tokens):
+        tokens = count_tokens(unit)
+        if current and size + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import os, re, json, time, argparse
+import os, io, re, json, copy, time, argparse, asyncio, hashlib, threading, unicodedata
+from collections import OrderedDict
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -26,12 +28,30 @@ try:
 except ImportError:
     HAS_ONEDRIVE = False
 
+# --- Shared LLM clients (connection pooling) ---
+from llm_clients import (
+    get_openai_client, get_ollama_session, ollama_url, request_timeout,
+    get_async_openai_client, get_async_ollama_client
+)
+from task_runner import acall_slot, call_slot, default_concurrency, run_tasks
+from response_cache import ResponseCache
+from rate_limiter import RateLimiter, estimate_tokens
+from batch_runner import BATCH_PRICE_FACTOR, batch_duration, batch_request, run_batch
+from call_metrics import ameasure_call, measure_call
+from run_store import current_run_store
+from chunking import split_into_chunks, count_tokens, token_budget, truncate_tokens
+from text_context import TextContext
+from character_index import capitalized_names
+from dialogue import speaker_stats
+from metrics_pool import parallel_metrics
+
 # --- Enhanced analysis import ---
 from enhanced_analysis import (
     analyze_character_development, analyze_pacing, analyze_style_issues, 
     analyze_show_vs_tell, p_advanced_rewrite, p_character_voice_analysis,
     p_scene_structure_analysis, p_emotional_depth_analysis, 
-    p_prose_quality_analysis, p_genre_specific_analysis
+    p_prose_quality_analysis, p_genre_specific_analysis,
+    REWRITE_FOCUS_INSTRUCTIONS, GENRE_GUIDELINES
 )
 
 OUTPUT_DIR = Path("outputs"); OUTPUT_DIR.mkdir(exist_ok=True)
@@ -43,25 +63,36 @@ CRITICAL INSTRUCTION: When analyzing character names, you MUST use the EXACT nam
 
 Always double-check character names before writing your analysis. Respond in English."""
 
+def _is_rough_adverb(word):
+    # \b\w+ly\b (hoofdlettergevoelig) of \b\w+lijk\b (re.I)
+    if len(word) > 2 and word.endswith("ly"):
+        return True
+    if word.isascii():
+        return len(word) > 4 and word[-4:].lower() == "lijk"
+    return re.fullmatch(r"\w+lijk", word, flags=re.I) is not None
+
 def rough_metrics(text):
-    words = re.findall(r"\w+(?:'\w+)?", text); wc = len(words)
-    sents = [s for s in re.split(r"(?<=[\.\!\?])\s+", text) if s.strip()]
-    avg = (sum(len(s.split()) for s in sents)/len(sents)) if sents else 0
-    dialogs = re.findall(r"[\"""\''].+?[\"""\'']", text, flags=re.S)
-    dshare = (sum(len(d.split()) for d in dialogs)/wc) if wc else 0
-    adverbs = re.findall(r"\b\w+ly\b", text) + re.findall(r"\b\w+lijk\b", text, flags=re.I)
+    ctx = TextContext.of(text)
+    wc = ctx.contraction_words
+    sents = ctx.sentence_chunks
+    # de stukken zijn op witruimte gesplitst, dus samen precies text.split()
+    avg = (len(ctx.split_words)/len(sents)) if sents else 0
+    dshare = (ctx.dialogue_words/wc) if wc else 0
+    adverbs = ctx.count_tokens(_is_rough_adverb)
     return {"words": wc, "sentences": len(sents), "avg_sentence_words": round(avg,2),
-            "dialog_word_share": round(dshare,3), "adverb_count": len(adverbs)}
+            "dialog_word_share": round(dshare,3), "adverb_count": adverbs}
 
 def enhanced_metrics(text):
     """Uitgebreide metrics inclusief stijl en karakteranalyse"""
-    basic = rough_metrics(text)
+    # Eén keer tokeniseren, alle analyses lezen uit dezelfde context
+    ctx = TextContext.of(text)
+    basic = rough_metrics(ctx)
     
     # Voeg geavanceerde analyses toe
-    character_data = analyze_character_development(text)
-    pacing_data = analyze_pacing(text)
-    style_issues = analyze_style_issues(text)
-    show_tell = analyze_show_vs_tell(text)
+    character_data = analyze_character_development(ctx)
+    pacing_data = analyze_pacing(ctx)
+    style_issues = analyze_style_issues(ctx)
+    show_tell = analyze_show_vs_tell(ctx)
     
     return {
         **basic,
@@ -69,14 +100,16 @@ def enhanced_metrics(text):
         "pacing": pacing_data,
         "style_issues": style_issues,
         "show_vs_tell": show_tell,
-        "readability_score": calculate_readability_score(text),
+        "speakers": speaker_stats(ctx.text, ctx.dialogue_spans),
+        "readability_score": calculate_readability_score(ctx),
         "engagement_score": calculate_engagement_score(pacing_data, show_tell, len(style_issues))
     }
 
 def calculate_readability_score(text):
     """Bereken leesbaarheidscore gebaseerd op zinslengte en woordcomplexiteit"""
-    words = text.split()
-    sentences = [s for s in re.split(r'[.!?]+', text) if s.strip()]
+    ctx = TextContext.of(text)
+    words = ctx.split_words
+    sentences = ctx.sentences
     
     if not words or not sentences:
         return 0.0
@@ -161,50 +194,290 @@ def save_analysis_with_onedrive(analysis_data, report_content, rewrite_files=Non
 
 # ====== MODEL ROUTER ======
 SYSTEM_ROLE = "You are a concise, senior fiction editor and story doctor."
-def call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=SYSTEM_ROLE):
+
+# Verhoog bij elke inhoudelijke wijziging aan de prompt templates: oude cache entries worden dan genegeerd
+PROMPT_TEMPLATE_VERSION = "1"
+
+RESPONSE_CACHE = ResponseCache(OUTPUT_DIR / "cache" / "responses.sqlite3")
+
+# Process-wide scheduler for OpenAI calls (shared by all threads, sessions and the API)
+RATE_LIMITER = RateLimiter()
+
+def _cache_key(prompt, provider, model, temperature, system, json_schema=None):
+    if not RESPONSE_CACHE.enabled:
+        return None
+    version = PROMPT_TEMPLATE_VERSION
+    if json_schema:
+        version += ":" + json.dumps(json_schema, sort_keys=True)
+    return RESPONSE_CACHE.make_key(provider, model, temperature, system, prompt, version)
+
+def _answer_keys(prompt, provider, model, temperature, system, json_schema=None, use_cache=True):
+    """(response cache key, checkpoint key van de huidige run); None als die laag niet actief is"""
+    store = current_run_store()
+    return (_cache_key(prompt, provider, model, temperature, system, json_schema) if use_cache else None,
+            store.key(provider, model, temperature, system, prompt, json_schema) if store else None)
+
+def _stored_answer(keys):
+    """Antwoord uit het run checkpoint (gaat voor, ook met use_cache=False) of de response cache"""
+    cache_key, checkpoint_key = keys
+    if checkpoint_key:
+        saved = current_run_store().get(checkpoint_key)
+        if saved is not None:
+            return saved
+    return RESPONSE_CACHE.get(cache_key) if cache_key else None
+
+def _store_answer(keys, result):
+    cache_key, checkpoint_key = keys
+    if cache_key:
+        RESPONSE_CACHE.put(cache_key, result)
+    if checkpoint_key:
+        current_run_store().put(checkpoint_key, result)
+
+def _response_format(json_schema):
+    """OpenAI structured output: het antwoord moet exact aan het JSON schema voldoen"""
+    return {"type": "json_schema",
+            "json_schema": {"name": json_schema.get("title", "response"), "schema": json_schema, "strict": True}}
+
+def _count_tokens(info, prompt_text, output, cache_hit=False):
+    """Vul token aantallen aan met een schatting als de provider ze niet meldde"""
+    info["cache_hit"] = cache_hit
+    info.setdefault("input_tokens", estimate_tokens(prompt_text))
+    info.setdefault("output_tokens", estimate_tokens(output or ""))
+
+def _ollama_usage(info, data):
+    if info is not None and data.get("prompt_eval_count") is not None:
+        info["input_tokens"] = data["prompt_eval_count"]
+        info["output_tokens"] = data.get("eval_count", 0)
+
+def _openai_usage(info, usage):
+    if info is not None and usage is not None:
+        info["input_tokens"] = usage.prompt_tokens
+        info["output_tokens"] = usage.completion_tokens
+
+def call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=SYSTEM_ROLE, use_cache=True,
+               json_schema=None, kind=None):
+    """Eén model call; met json_schema wordt het antwoord als JSON volgens dat schema afgedwongen
+
+    kind (outline, rubric, rewrite, ...) labelt de call in de metrics (call_metrics).
+    """
+    with measure_call(kind, provider, model) as info:
+        keys = _answer_keys(prompt, provider, model, temperature, system, json_schema, use_cache)
+        stored = _stored_answer(keys)
+        if stored is not None:
+            _count_tokens(info, system + prompt, stored, cache_hit=True)
+            return stored
+        with call_slot():
+            result = _call_provider(prompt, provider, model, temperature, system, json_schema, info=info)
+        _count_tokens(info, system + prompt, result)
+        _store_answer(keys, result)
+        return result
+
+def _call_provider(prompt, provider, model, temperature, system, json_schema=None, info=None):
+    if provider == "ollama":
+        session = get_ollama_session()
+        payload = {"model": model, "messages":[{"role":"system","content":system},{"role":"user","content":prompt}],
+                   "stream": False, "options":{"temperature": temperature}}
+        if json_schema:
+            payload["format"] = json_schema
+        r = session.post(ollama_url("/api/chat"), json=payload, timeout=request_timeout()); r.raise_for_status()
+        data = r.json()
+        _ollama_usage(info, data)
+        return (data.get("message") or {}).get("content","").strip()
+    elif provider == "openai":
+        try:
+            config = get_api_config()
+            
+            # Shared client per (api_key, org, base) - skip project to avoid 401 errors with project-scoped keys
+            client = get_openai_client(config['api_key'], config['org'], config['base'])
+            
+            extra = {"response_format": _response_format(json_schema)} if json_schema else {}
+            
+            def request():
+                raw = client.chat.completions.with_raw_response.create(
+                    model=model, 
+                    temperature=temperature,
+                    messages=[{"role":"system","content":system},{"role":"user","content":prompt}],
+                    **extra
+                )
+                RATE_LIMITER.observe(model, raw.headers)
+                response = raw.parse()
+                _openai_usage(info, response.usage)
+                return response.choices[0].message.content.strip()
+            
+            # Admission via per-model request/token buckets, retries with backoff on 429/5xx
+            return RATE_LIMITER.run(request, model, estimate_tokens(system + prompt), info)
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+    else:
+        raise SystemExit("Unknown provider (use 'ollama' or 'openai').")
+
+async def acall_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=SYSTEM_ROLE, use_cache=True,
+                      json_schema=None, kind=None):
+    """Awaitable variant van call_model (AsyncOpenAI / async httpx naar Ollama)
+
+    De response cache (SQLite), run checkpoints en het metrics log zijn blocking I/O en draaien
+    in een thread, zodat de event loop (FastAPI) niet stil staat.
+    """
+    async with ameasure_call(kind, provider, model) as info:
+        keys = _answer_keys(prompt, provider, model, temperature, system, json_schema, use_cache)
+        stored = await asyncio.to_thread(_stored_answer, keys)
+        if stored is not None:
+            _count_tokens(info, system + prompt, stored, cache_hit=True)
+            return stored
+        async with acall_slot():
+            result = await _acall_provider(prompt, provider, model, temperature, system, json_schema, info=info)
+        _count_tokens(info, system + prompt, result)
+        await asyncio.to_thread(_store_answer, keys, result)
+        return result
+
+async def _acall_provider(prompt, provider, model, temperature, system, json_schema=None, info=None):
     if provider == "ollama":
-        import requests
-        url = "http://localhost:11434/api/chat"
+        client = get_async_ollama_client()
         payload = {"model": model, "messages":[{"role":"system","content":system},{"role":"user","content":prompt}],
                    "stream": False, "options":{"temperature": temperature}}
-        r = requests.post(url, json=payload, timeout=600); r.raise_for_status()
-        return (r.json().get("message") or {}).get("content","").strip()
+        if json_schema:
+            payload["format"] = json_schema
+        r = await client.post(ollama_url("/api/chat"), json=payload); r.raise_for_status()
+        data = r.json()
+        _ollama_usage(info, data)
+        return (data.get("message") or {}).get("content","").strip()
     elif provider == "openai":
-        from openai import OpenAI
         try:
             config = get_api_config()
+            client = get_async_openai_client(config['api_key'], config['org'], config['base'])
             
-            # Create client with API key and org (skip project for compatibility)
-            client_args = {'api_key': config['api_key']}
-            if config['org']:
-                client_args['organization'] = config['org']
-            # Skip project to avoid 401 errors with project-scoped keys
-            # if config['project']:
-            #     client_args['project'] = config['project']
-            if config['base']:
-                client_args['base_url'] = config['base']
+            extra = {"response_format": _response_format(json_schema)} if json_schema else {}
+            
+            async def request():
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=model, 
+                    temperature=temperature,
+                    messages=[{"role":"system","content":system},{"role":"user","content":prompt}],
+                    **extra
+                )
+                RATE_LIMITER.observe(model, raw.headers)
+                response = raw.parse()
+                _openai_usage(info, response.usage)
+                return response.choices[0].message.content.strip()
             
-            client = OpenAI(**client_args)
-            resp = client.chat.completions.create(
-                model=model, 
-                temperature=temperature,
-                messages=[{"role":"system","content":system},{"role":"user","content":prompt}]
+            return await RATE_LIMITER.arun(request, model, estimate_tokens(system + prompt), info)
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+    else:
+        raise SystemExit("Unknown provider (use 'ollama' or 'openai').")
+
+def stream_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=SYSTEM_ROLE, use_cache=True,
+                 kind=None):
+    """Streaming variant van call_model: generator die tekst-fragmenten oplevert zodra ze binnenkomen
+
+    Een cache hit levert het volledige antwoord in één fragment. Het complete (gestripte)
+    antwoord wordt na afloop in de cache gezet, zodat call_model het daarna ook hergebruikt.
+    """
+    with measure_call(kind, provider, model) as info:
+        keys = _answer_keys(prompt, provider, model, temperature, system, use_cache=use_cache)
+        stored = _stored_answer(keys)
+        if stored is not None:
+            _count_tokens(info, system + prompt, stored, cache_hit=True)
+            yield stored
+            return
+        parts = []
+        with call_slot():
+            for chunk in _stream_provider(prompt, provider, model, temperature, system, info=info):
+                parts.append(chunk)
+                yield chunk
+        result = "".join(parts).strip()
+        _count_tokens(info, system + prompt, result)
+        _store_answer(keys, result)
+
+def _stream_provider(prompt, provider, model, temperature, system, info=None):
+    messages = [{"role":"system","content":system},{"role":"user","content":prompt}]
+    if provider == "ollama":
+        session = get_ollama_session()
+        payload = {"model": model, "messages": messages, "stream": True, "options":{"temperature": temperature}}
+        with session.post(ollama_url("/api/chat"), json=payload, timeout=request_timeout(), stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                chunk = (data.get("message") or {}).get("content", "")
+                if chunk:
+                    yield chunk
+                if data.get("done"):
+                    _ollama_usage(info, data)
+                    break
+    elif provider == "openai":
+        try:
+            config = get_api_config()
+            client = get_openai_client(config['api_key'], config['org'], config['base'])
+            # Only opening the stream is retried; a stream that breaks halfway is not replayed
+            stream = RATE_LIMITER.run(
+                lambda: client.chat.completions.create(model=model, temperature=temperature, messages=messages, stream=True,
+                                                       stream_options={"include_usage": True}),
+                model, estimate_tokens(system + prompt), info
             )
-            return resp.choices[0].message.content.strip()
+            for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+                if getattr(event, "usage", None):
+                    _openai_usage(info, event.usage)
         except Exception as e:
             raise Exception(f"OpenAI API Error: {str(e)}")
     else:
         raise SystemExit("Unknown provider (use 'ollama' or 'openai').")
 
+def stream_text(chunks, on_update=None, on_chunk=None, min_interval=0.1):
+    """Verbruik een stream van fragmenten en geef de volledige (gestripte) tekst terug
+
+    on_chunk(fragment) wordt voor elk fragment aangeroepen (terminal output).
+    on_update(tekst_tot_nu_toe) wordt hooguit elke min_interval seconden aangeroepen
+    (plus één keer aan het eind), zodat UI's niet bij elk token opnieuw renderen.
+    """
+    text, last = "", 0.0
+    for chunk in chunks:
+        text += chunk
+        if on_chunk:
+            on_chunk(chunk)
+        now = time.monotonic()
+        if on_update and now - last >= min_interval:
+            on_update(text)
+            last = now
+    text = text.strip()
+    if on_update:
+        on_update(text)
+    return text
+
 # ====== HELPERS ======
-def read_file(path: Path) -> str:
-    p = Path(path)
-    if p.suffix.lower() in [".txt", ".md"]:
+def _decode_text(data: bytes) -> str:
+    """Zelfde resultaat als Path.read_text: utf-8 (fouten negeren) en universele regeleinden"""
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+def read_file(source, name=None) -> str:
+    """Tekst van een manuscript uit een pad, bytes of binaire stream (bijv. een upload)
+
+    Het formaat volgt uit de extensie van het pad, van name of van source.name; zonder
+    extensie wordt een zip (.docx) herkend aan de eerste bytes. Uploads hoeven zo niet
+    eerst naar een tijdelijk bestand.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        p = Path(source)
+        if p.suffix.lower() in [".txt", ".md"]:
+            return p.read_text(encoding="utf-8", errors="ignore")
+        if p.suffix.lower() == ".docx" and DocxDocument:
+            doc = DocxDocument(str(p))
+            return "\n".join(par.text for par in doc.paragraphs)
         return p.read_text(encoding="utf-8", errors="ignore")
-    if p.suffix.lower() == ".docx" and DocxDocument:
-        doc = DocxDocument(str(p))
+
+    data = bytes(source) if isinstance(source, (bytes, bytearray, memoryview)) else source.read()
+    if isinstance(data, str):
+        return data
+    if name is None and isinstance(getattr(source, "name", None), str):
+        name = source.name
+    suffix = Path(name).suffix.lower() if name else ""
+    if DocxDocument and (suffix == ".docx" or (not suffix and data[:4] == b"PK\x03\x04")):
+        doc = DocxDocument(io.BytesIO(data))
         return "\n".join(par.text for par in doc.paragraphs)
-    return p.read_text(encoding="utf-8", errors="ignore")
+    return _decode_text(data)
 
 def split_sections(text: str):
     parts = re.split(r"(?im)^\s*(hoofdstuk\s+\d+|chapter\s+\d+|#+\s+.+)\s*$", text)
@@ -257,22 +530,15 @@ Also provide: 5 micro-rewrites (sentences/paragraphs), 1 'Mini-Revision' (80–1
 def p_outline(full_text):
     return f"""Create a 10–15 bullet point outline of this manuscript; also provide 5 bullets covering premise/protagonist/antagonist/emotional core/genre vibe.
 TEXT:
-{full_text[:15000]}"""
+{truncate_tokens(full_text, token_budget("outline"))}"""
+
+def likely_character_names(text):
+    """Waarschijnlijke karakternamen: woorden met hoofdletter die 2+ keer voorkomen"""
+    return capitalized_names(text)
 
 def p_rubric(title, text):
     # Extract character names from text
-    import re
-    # Find potential character names (capitalized words that appear multiple times)
-    words = re.findall(r'\b[A-Z][a-z]{2,}\b', text)
-    name_counts = {}
-    stopwords = {'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als', 'Dat', 'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog'}
-    
-    for word in words:
-        if word not in stopwords:
-            name_counts[word] = name_counts.get(word, 0) + 1
-    
-    # Get likely character names (appearing 2+ times)
-    character_names = [name for name, count in name_counts.items() if count >= 2]
+    character_names = likely_character_names(text)
     character_list = ", ".join(character_names) if character_names else "geen duidelijke karakternamen gedetecteerd"
     
     return f"""Section: {title}
@@ -283,13 +549,13 @@ CHARACTER NAMES IN THIS TEXT: {character_list}
 Rubric:
 {RUBRIC}
 TEXT:
-{text[:12000]}"""
+{truncate_tokens(text, token_budget("rubric"))}"""
 
 def p_short_rewrite(title, text):
     return f"""Rewrite this section concisely (300–400 words), preserve core events, increase micro-tension and subtext, remove info-dumps.
 Section: {title}
 TEXT:
-{text[:6000]}"""
+{truncate_tokens(text, token_budget("short_rewrite"))}"""
 
 def p_top_issues(rubric_blobs):
     return "Summarize the 10 most important issues in 1 sentence per point:\n\n" + "\n\n".join(rubric_blobs)
@@ -306,6 +572,681 @@ def p_timeline_feedback(timeline_rows):
     return f"""Here are time markers per section. Identify max 10 possible inconsistencies with fix suggestions.
 {timeline_rows}"""
 
+# ====== OUTLINE PROMPTS ======
+# De outline wordt hiërarchisch opgebouwd: samenvatting per sectie -> (indien nodig) gecondenseerd -> outline
+def p_section_summary(text, part=1, parts=1):
+    scope = f"part {part} of {parts} of a manuscript section" if parts > 1 else "manuscript section"
+    return f"""Summarize this {scope} in 80–120 words: the key events in order, the characters involved (exact names), the central conflict, setting/time, and how it ends.
+TEXT:
+{truncate_tokens(text, token_budget("summary"))}"""
+
+def p_condense_summaries(summary_blocks):
+    return "Condense these consecutive section summaries into one summary of 150–250 words. Keep the key events in order, the characters (exact names) and the conflicts.\n\n" + "\n\n".join(summary_blocks)
+
+def p_outline_from_summaries(summary_blocks):
+    summaries = truncate_tokens("\n\n".join(summary_blocks), token_budget("outline"))
+    return f"""Create a 10–15 bullet point outline of this manuscript from the section summaries below (in story order); also provide 5 bullets covering premise/protagonist/antagonist/emotional core/genre vibe.
+SUMMARIES:
+{summaries}"""
+
+# ====== MAP-REDUCE PROMPTS ======
+# Input die groter is dan het token budget wordt in delen geanalyseerd en daarna samengevoegd
+MERGE_LABELS = {
+    "rubric": "rubric evaluation",
+    "character_analysis": "character voice analysis",
+    "scene_structure": "scene structure analysis",
+    "emotional_depth": "emotional impact analysis",
+    "genre_analysis": "genre analysis",
+}
+
+def p_merge_analyses(title, key, partial_analyses):
+    parts = "\n\n".join(f"--- PART {k}/{len(partial_analyses)} ---\n{analysis}"
+                         for k, analysis in enumerate(partial_analyses, 1))
+    return f"""Section: {title}
+
+This section was too long for one pass, so its {MERGE_LABELS.get(key, key)} was done in {len(partial_analyses)} consecutive parts (below, in order). Merge them into ONE {MERGE_LABELS.get(key, key)} of the whole section, in the same format as the parts: combine the scores into one score per component, remove duplicates and keep the strongest concrete examples. Use only the character names that appear in the parts.
+
+{parts}"""
+
+# ====== COMBINED ANALYSIS ======
+# Eén structured call per sectie in plaats van een losse call per analyse: de sectietekst
+# gaat maar één keer mee en het model vult alle onderdelen in één JSON object in
+COMBINED_FIELDS = {
+    "rubric": "The full rubric evaluation described under RUBRIC (scores, reasoning, micro-rewrites, mini-revision, follow-up suggestions).",
+    "character_analysis": "Character voices: which characters speak/act (exact names), how their voices differ, consistency, and per character speech patterns, typical expressions, emotional tone and improvement points.",
+    "scene_structure": "Scene structure: opening, conflict/tension, turning point, climax and ending; for each what works, what is missing, concrete improvements and example sentences.",
+    "emotional_depth": "Emotional impact: which emotions are evoked, how they are conveyed (show vs tell), intensity and authenticity, with improvement points.",
+    "genre_analysis": "Genre evaluation against the GENRE REQUIREMENTS: elements present and missing, tone, pacing, 5 concrete suggestions and example sentences.",
+}
+
+def combined_fields(metrics, rewrite=True, enhanced=False):
+    """De analyses (resultaat keys) die in de combined call van één sectie horen"""
+    fields = ["rubric"]
+    if enhanced:
+        if metrics.get("characters"):
+            fields.append("character_analysis")
+        fields += ["scene_structure", "emotional_depth", "genre_analysis"]
+    if rewrite:
+        fields.append("rewrite")
+    return fields
+
+def combined_analysis_schema(fields):
+    """Strikt JSON schema: precies deze velden, allemaal verplicht tekst"""
+    return {"title": "section_analysis", "type": "object",
+            "properties": {field: {"type": "string"} for field in fields},
+            "required": list(fields), "additionalProperties": False}
+
+def p_combined_analysis(title, text, fields, enhanced=False, genre="fantasy", rewrite_focus="overall"):
+    character_names = likely_character_names(text)
+    character_list = ", ".join(character_names) if character_names else "geen duidelijke karakternamen gedetecteerd"
+    descriptions = dict(COMBINED_FIELDS)
+    if enhanced:
+        instruction = REWRITE_FOCUS_INSTRUCTIONS.get(rewrite_focus, REWRITE_FOCUS_INSTRUCTIONS["overall"])
+        descriptions["rewrite"] = (f"A professional rewrite of the section to {instruction} (focus: {rewrite_focus}); "
+                                   "keep all core events, show emotions through action, vary sentence length, add subtext.")
+    else:
+        descriptions["rewrite"] = "A concise rewrite (300–400 words): preserve core events, increase micro-tension and subtext, remove info-dumps."
+    guide = GENRE_GUIDELINES.get(genre, GENRE_GUIDELINES["fantasy"])
+    genre_block = (f"\nGENRE REQUIREMENTS ({genre.upper()}):\n- Elements: {', '.join(guide['elements'])}\n"
+                   f"- Tone: {guide['tone']}\n- Pacing: {guide['pacing']}\n") if "genre_analysis" in fields else ""
+    field_list = "\n".join(f'- "{field}": {descriptions[field]}' for field in fields)
+    
+    return f"""Section: {title}
+
+CHARACTER NAMES IN THIS TEXT: {character_list}
+⚠️ USE ONLY THESE EXACT NAMES - DO NOT CHANGE OR SUBSTITUTE THEM ⚠️
+
+Answer with ONE JSON object with exactly these keys; every value is a markdown string:
+{field_list}
+
+Rubric:
+{RUBRIC}{genre_block}
+TEXT:
+{truncate_tokens(text, token_budget("combined"))}"""
+
+def parse_combined_analysis(raw, fields):
+    """Lees een combined antwoord terug als {veld: tekst}; None als het geen bruikbare JSON is"""
+    raw = (raw or "").strip()
+    if raw.startswith("```"):
+        raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw)
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start < 0 or end <= start:
+            return None
+        try:
+            data = json.loads(raw[start:end + 1])
+        except ValueError:
+            return None
+    if not isinstance(data, dict) or any(field not in data for field in fields):
+        return None
+    parsed = {}
+    for field in fields:
+        value = data[field]
+        parsed[field] = value.strip() if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=2)
+    return parsed
+
+# ====== INCREMENTELE HER-ANALYSE ======
+# Resultaten per sectie worden bewaard onder de hash van de inhoud: bij een nieuwe revisie
+# gaan alleen nieuwe of gewijzigde secties naar het model.
+# Verhoog bij een inhoudelijke wijziging van de sectie prompts: bewaarde resultaten vervallen dan
+SECTION_RESULTS_VERSION = "1"
+
+def section_hash(text):
+    """Fingerprint van de genormaliseerde sectie-inhoud (witruimte en regeleinden tellen niet mee)"""
+    normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _section_results_key(section, provider, model, options):
+    if not RESPONSE_CACHE.enabled:
+        return None
+    return RESPONSE_CACHE.make_key(provider, model, 0, "section-results", section_hash(section["content"]),
+                                   json.dumps(options) + SECTION_RESULTS_VERSION)
+
+def stored_section_results(sections, provider, model, options):
+    """{sectie index: eerder resultaat} voor secties die met deze opties al geanalyseerd zijn"""
+    stored = {}
+    for i, sec in enumerate(sections):
+        key = _section_results_key(sec, provider, model, options)
+        raw = RESPONSE_CACHE.get(key) if key else None
+        if not raw:
+            continue
+        try:
+            stored[i] = json.loads(raw)
+        except ValueError:
+            continue
+    return stored
+
+def merge_section_results(sections, provider, model, options, results, stored, indices=None):
+    """Vul hergebruikte secties in en bewaar de nieuwe (alleen indices, indien gegeven)
+
+    Elk resultaat krijgt content_hash en reused (True als de sectie niet opnieuw naar het model ging).
+    """
+    for i in (range(len(sections)) if indices is None else indices):
+        sec = sections[i]
+        digest = section_hash(sec["content"])
+        if i in stored:
+            results[i] = {**stored[i], "title": sec["title"], "metrics": results[i]["metrics"],
+                          "content_hash": digest, "reused": True}
+            continue
+        results[i].update(content_hash=digest, reused=False)
+        key = _section_results_key(sec, provider, model, options)
+        if key:
+            analysis = {k: v for k, v in results[i].items() if k not in ("title", "metrics", "content_hash", "reused")}
+            RESPONSE_CACHE.put(key, json.dumps(analysis, ensure_ascii=False))
+    return results
+
+# ====== SECTION ANALYSIS ======
+# Metrics van ongewijzigde tekst worden niet opnieuw berekend (herhaalde analyses, UI reruns)
+METRICS_CACHE_ENTRIES = int(os.getenv("ARC_TEXT_METRICS_CACHE", "512"))
+_METRICS_CACHE = OrderedDict()
+_METRICS_LOCK = threading.Lock()
+
+def _metrics_key(text, enhanced):
+    return (hashlib.sha256(text.encode("utf-8")).hexdigest(), enhanced)
+
+def _cached_metrics(key):
+    with _METRICS_LOCK:
+        if key in _METRICS_CACHE:
+            _METRICS_CACHE.move_to_end(key)
+            # Kopie: de aanroeper mag het resultaat aanpassen zonder de cache te raken
+            return copy.deepcopy(_METRICS_CACHE[key])
+    return None
+
+def _cache_metrics(key, metrics):
+    if METRICS_CACHE_ENTRIES > 0:
+        with _METRICS_LOCK:
+            _METRICS_CACHE[key] = copy.deepcopy(metrics)
+            while len(_METRICS_CACHE) > METRICS_CACHE_ENTRIES:
+                _METRICS_CACHE.popitem(last=False)
+
+def text_metrics(text, enhanced=False):
+    """rough_metrics / enhanced_metrics met een begrensde LRU cache op de exacte tekst"""
+    key = _metrics_key(text, enhanced)
+    metrics = _cached_metrics(key)
+    if metrics is None:
+        metrics = enhanced_metrics(text) if enhanced else rough_metrics(text)
+        _cache_metrics(key, metrics)
+    return metrics
+
+def section_metrics(sections, enhanced=False, workers=None):
+    """Lokale (gratis) metrics per sectie
+
+    Secties die niet in de cache staan worden samen gemeten; bij een groot manuscript parallel
+    over de process pool van metrics_pool.
+    """
+    keys = [_metrics_key(s["content"], enhanced) for s in sections]
+    results = [_cached_metrics(key) for key in keys]
+    missing = {}
+    for i, key in enumerate(keys):
+        if results[i] is None:
+            missing.setdefault(key, []).append(i)
+    if missing:
+        texts = [sections[indices[0]]["content"] for indices in missing.values()]
+        for (key, indices), metrics in zip(missing.items(), parallel_metrics(texts, enhanced, workers)):
+            _cache_metrics(key, metrics)
+            for i in indices:
+                results[i] = copy.deepcopy(metrics) if i != indices[0] else metrics
+    return results
+
+def section_jobs(sections, metrics, rewrite=True, enhanced=False, genre="fantasy", rewrite_focus="overall",
+                 combined=False, indices=None):
+    """Alle onafhankelijke model calls voor de secties
+
+    Met combined=True wordt het één structured call per sectie (key "combined") waarvan het
+    JSON schema de losse analyses bevat. indices beperkt de jobs tot die secties.
+    Een sectie die niet in het token budget van een prompt past wordt in chunks geanalyseerd
+    (part = (k, n)); reduce_chunked_outputs voegt die daarna samen.
+
+    Returns:
+        Lijst met (sectie index, resultaat key, label, prompt, temperature, json_schema, part)
+    """
+    jobs = []
+    for i in (range(len(sections)) if indices is None else indices):
+        title, text = sections[i]["title"], sections[i]["content"]
+        if combined and count_tokens(text) <= token_budget("combined"):
+            fields = combined_fields(metrics[i], rewrite, enhanced)
+            prompt = p_combined_analysis(title, text, fields, enhanced, genre, rewrite_focus)
+            jobs.append((i, "combined", f"Analysis: {title}", prompt, 0.3, combined_analysis_schema(fields), None))
+            continue
+        chunks_by_budget = {}
+
+        def add(key, label, build, temperature, budget=None):
+            limit = token_budget(budget or key)
+            if limit not in chunks_by_budget:
+                chunks_by_budget[limit] = split_into_chunks(text, limit)
+            chunks = chunks_by_budget[limit]
+            if len(chunks) == 1:
+                jobs.append((i, key, label, build(title, text), temperature, None, None))
+                return
+            for k, chunk in enumerate(chunks, 1):
+                jobs.append((i, key, f"{label} ({k}/{len(chunks)})", build(f"{title} (part {k}/{len(chunks)})", chunk.strip()),
+                             temperature, None, (k, len(chunks))))
+
+        add("rubric", f"Rubric: {title}", p_rubric, 0.3)
+        if enhanced:
+            if metrics[i].get("characters"):
+                add("character_analysis", f"Characters: {title}", lambda _, t: p_character_voice_analysis(t), 0.3)
+            add("scene_structure", f"Scene structure: {title}", lambda _, t: p_scene_structure_analysis(t), 0.3)
+            add("emotional_depth", f"Emotional depth: {title}", lambda _, t: p_emotional_depth_analysis(t), 0.3)
+            add("genre_analysis", f"Genre: {title}", lambda _, t: p_genre_specific_analysis(t, genre), 0.3)
+        if rewrite:
+            if enhanced:
+                add("rewrite", f"Rewrite: {title}", lambda tt, t: p_advanced_rewrite(tt, t, rewrite_focus), 0.5)
+            else:
+                add("rewrite", f"Rewrite: {title}", p_short_rewrite, 0.5, "short_rewrite")
+    return jobs
+
+def reduce_chunked_outputs(sections, jobs, outputs):
+    """Reduce stap voor secties die in chunks zijn geanalyseerd
+
+    Herschrijvingen van opeenvolgende chunks worden aan elkaar geplakt; analyses worden met
+    een merge prompt samengevoegd.
+
+    Returns:
+        (jobs, outputs, merge_jobs) - merge_jobs moeten nog uitgevoerd worden
+    """
+    flat_jobs, flat_outputs, grouped = [], [], {}
+    for job, output in zip(jobs, outputs):
+        if job[6] is None:
+            flat_jobs.append(job)
+            flat_outputs.append(output)
+        else:
+            grouped.setdefault((job[0], job[1]), []).append((job, output))
+    merge_jobs = []
+    for (i, key), parts in grouped.items():
+        label = parts[0][0][2].rsplit(" (", 1)[0]
+        texts = [output for _, output in parts]
+        if key == "rewrite":
+            flat_jobs.append((i, key, label, None, parts[0][0][4], None, None))
+            flat_outputs.append("\n\n".join(texts))
+        else:
+            merge_jobs.append((i, key, f"Merge {label}", p_merge_analyses(sections[i]["title"], key, texts), 0.3, None, None))
+    return flat_jobs, flat_outputs, merge_jobs
+
+def split_combined_outputs(jobs, outputs):
+    """Pak combined antwoorden uit naar losse (job, output) paren per analyse
+
+    Returns:
+        (jobs, outputs, mislukte sectie indices) - voor de mislukte secties kan de caller
+        alsnog de losse calls uitvoeren
+    """
+    flat_jobs, flat_outputs, failed = [], [], []
+    for job, output in zip(jobs, outputs):
+        i, key, label, _, temperature, schema, _ = job
+        if key != "combined":
+            flat_jobs.append(job)
+            flat_outputs.append(output)
+            continue
+        fields = schema["required"]
+        parsed = parse_combined_analysis(output, fields)
+        if parsed is None:
+            failed.append(i)
+            continue
+        for field in fields:
+            flat_jobs.append((i, field, label, None, temperature, None, None))
+            flat_outputs.append(parsed[field])
+    return flat_jobs, flat_outputs, failed
+
+def fill_section_results(results, jobs, outputs):
+    """Zet call resultaten in de sectie dicts van results"""
+    for (i, key, *_), output in zip(jobs, outputs):
+        if key in ("rubric", "rewrite"):
+            results[i][key] = output
+        else:
+            results[i].setdefault("advanced_analysis", {})[key] = output
+    return results
+
+def assemble_section_results(sections, metrics, jobs, outputs):
+    """Zet de call resultaten terug in de vaste sectie structuur (input volgorde)"""
+    results = [{"title": sec["title"], "metrics": metrics[i], "rubric": "", "rewrite": ""}
+               for i, sec in enumerate(sections)]
+    return fill_section_results(results, jobs, outputs)
+
+def analyze_sections(sections, provider="ollama", model="llama3.1", rewrite=True, enhanced=False,
+                     genre="fantasy", rewrite_focus="overall", max_workers=None, on_progress=None,
+                     combined=False, on_section=None):
+    """Analyseer alle secties met begrensde concurrency
+
+    Alle onafhankelijke model calls (rubric, rewrite en bij enhanced de karakter-, scene-,
+    emotie- en genre-analyse) van alle secties worden tegelijk ingepland. Resultaten komen
+    terug in de volgorde van sections. on_progress(done, total, label) wordt na elke
+    afgeronde call aangeroepen in de aanroepende thread.
+
+    Te lange secties worden in chunks (parallel) geanalyseerd en daarna in één ronde
+    samengevoegd. combined=True doet één JSON-schema call per sectie; secties waarvan het
+    antwoord niet te parsen is vallen terug op de losse calls.
+
+    Secties waarvan de inhoud al eerder (met dezelfde opties) is geanalyseerd worden niet
+    opnieuw naar het model gestuurd; zie merge_section_results.
+    on_section(index, resultaat) volgt hier voor alle secties aan het eind (alle calls gaan in
+    één ronde naar run_tasks); analyze_sections_async meldt elke sectie zodra die klaar is.
+    """
+    metrics = section_metrics(sections, enhanced)
+    options = (rewrite, enhanced, genre, rewrite_focus)
+    stored = stored_section_results(sections, provider, model, options)
+    changed = [i for i in range(len(sections)) if i not in stored]
+    workers = max_workers or default_concurrency(provider)
+    finished = [0]
+
+    def run(jobs):
+        offset = finished[0]
+
+        def report(index, _result, done, total):
+            if on_progress:
+                on_progress(offset + done, offset + total, jobs[index][2])
+
+        calls = [partial(call_model, prompt, provider, model, temperature, json_schema=schema, kind=key)
+                 for (_, key, _, prompt, temperature, schema, _) in jobs]
+        outputs = run_tasks(calls, workers, report)
+        finished[0] += len(jobs)
+        return outputs
+
+    def run_reduced(jobs):
+        outputs = run(jobs)
+        jobs, outputs, merges = reduce_chunked_outputs(sections, jobs, outputs)
+        return jobs + merges, outputs + (run(merges) if merges else [])
+
+    jobs, outputs = run_reduced(section_jobs(sections, metrics, *options, combined=combined, indices=changed))
+    if combined:
+        jobs, outputs, failed = split_combined_outputs(jobs, outputs)
+        if failed:
+            retry, retry_outputs = run_reduced(section_jobs(sections, metrics, *options, indices=failed))
+            jobs, outputs = jobs + retry, outputs + retry_outputs
+    results = assemble_section_results(sections, metrics, jobs, outputs)
+    results = merge_section_results(sections, provider, model, options, results, stored)
+    if on_section:
+        for i, result in enumerate(results):
+            on_section(i, result)
+    return results
+
+async def analyze_sections_async(sections, provider="ollama", model="llama3.1", rewrite=True, enhanced=False,
+                                 genre="fantasy", rewrite_focus="overall", max_workers=None, on_progress=None,
+                                 combined=False, on_section=None):
+    """Async variant van analyze_sections op basis van acall_model (voor de FastAPI server)
+
+    Elke sectie doorloopt zijn eigen calls (chunks, merge, combined fallback) en wordt met
+    on_section(index, resultaat) gemeld zodra hij klaar is; de semaphore begrenst het totaal.
+    """
+    # Metrics zijn CPU werk: buiten de event loop houden
+    metrics = await asyncio.to_thread(section_metrics, sections, enhanced)
+    options = (rewrite, enhanced, genre, rewrite_focus)
+    stored = await asyncio.to_thread(stored_section_results, sections, provider, model, options)
+    changed = [i for i in range(len(sections)) if i not in stored]
+    limit = asyncio.Semaphore(max_workers or default_concurrency(provider))
+    done, total = 0, 0
+
+    async def run_one(job):
+        nonlocal done
+        _, key, label, prompt, temperature, schema, _ = job
+        async with limit:
+            output = await acall_model(prompt, provider, model, temperature, json_schema=schema, kind=key)
+        done += 1
+        if on_progress:
+            on_progress(done, total, label)
+        return output
+
+    async def run(jobs):
+        nonlocal total
+        total += len(jobs)
+        tasks = [asyncio.ensure_future(run_one(job)) for job in jobs]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            # Net als run_tasks: eerste fout breekt de rest af
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def run_reduced(jobs):
+        outputs = await run(jobs)
+        jobs, outputs, merges = reduce_chunked_outputs(sections, jobs, outputs)
+        return jobs + merges, outputs + (await run(merges) if merges else [])
+
+    results = assemble_section_results(sections, metrics, [], [])
+
+    async def finish(indices):
+        await asyncio.to_thread(merge_section_results, sections, provider, model, options, results, stored, indices)
+        if on_section:
+            for i in indices:
+                on_section(i, results[i])
+
+    async def analyze_one(jobs):
+        jobs, outputs = await run_reduced(jobs)
+        if combined:
+            jobs, outputs, failed = split_combined_outputs(jobs, outputs)
+            if failed:
+                retry, retry_outputs = await run_reduced(section_jobs(sections, metrics, *options, indices=failed))
+                jobs, outputs = jobs + retry, outputs + retry_outputs
+        fill_section_results(results, jobs, outputs)
+        await finish([jobs[0][0]])
+
+    jobs_by_section = {}
+    for job in await asyncio.to_thread(section_jobs, sections, metrics, *options, combined=combined, indices=changed):
+        jobs_by_section.setdefault(job[0], []).append(job)
+    await finish(sorted(stored))
+    tasks = [asyncio.ensure_future(analyze_one(jobs)) for jobs in jobs_by_section.values()]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return results
+
+# ====== OUTLINE ======
+# Verhoog bij een inhoudelijke wijziging van p_section_summary: gecachte samenvattingen vervallen dan
+SUMMARY_VERSION = "1"
+
+def _summary_key(section, provider, model):
+    if not RESPONSE_CACHE.enabled:
+        return None
+    return RESPONSE_CACHE.make_key(provider, model, 0.2, "section-summary", section_hash(section["content"]), SUMMARY_VERSION)
+
+def summary_jobs(sections, provider, model):
+    """Gecachte samenvattingen ophalen en prompts maken voor de rest
+
+    Returns:
+        ({sectie index: samenvatting}, [(sectie index, prompt), ...]) - te lange secties
+        krijgen een prompt per chunk
+    """
+    summaries, jobs = {}, []
+    for i, sec in enumerate(sections):
+        key = _summary_key(sec, provider, model)
+        cached = RESPONSE_CACHE.get(key) if key else None
+        if cached is not None:
+            summaries[i] = cached
+            continue
+        chunks = split_into_chunks(sec["content"], token_budget("summary"))
+        for k, chunk in enumerate(chunks, 1):
+            jobs.append((i, p_section_summary(chunk.strip(), k, len(chunks))))
+    return summaries, jobs
+
+def collect_summaries(sections, provider, model, summaries, jobs, outputs):
+    """Voeg chunk samenvattingen per sectie samen, cache ze op sectie hash; lijst in sectie volgorde"""
+    parts = {}
+    for (i, _), output in zip(jobs, outputs):
+        parts.setdefault(i, []).append(output)
+    for i, texts in parts.items():
+        summaries[i] = "\n".join(texts)
+        key = _summary_key(sections[i], provider, model)
+        if key:
+            RESPONSE_CACHE.put(key, summaries[i])
+    return [summaries[i] for i in range(len(sections))]
+
+def condense_prompts(summary_blocks):
+    """None als de samenvattingen in één outline prompt passen, anders condense prompts per groep"""
+    budget = token_budget("outline")
+    if len(summary_blocks) <= 1 or count_tokens("\n\n".join(summary_blocks)) <= budget:
+        return None
+    groups, current, size = [], [], 0
+    for block in summary_blocks:
+        tokens = count_tokens(block)
+        if current and size + tokens > budget:
+            groups.append(current)
+            current, size = [], 0
+        current.append(block)
+        size += tokens
+    groups.append(current)
+    if len(groups) == len(summary_blocks):
+        # Elke samenvatting is op zich al te groot: niets meer samen te voegen
+        return None
+    return [p_condense_summaries(group) for group in groups]
+
+def _summary_blocks(sections, summaries):
+    return [f"### {sec['title']}\n{summary}" for sec, summary in zip(sections, summaries)]
+
+def summarize_sections(sections, provider="ollama", model="llama3.1", max_workers=None):
+    """Korte samenvatting per sectie (parallel, gecachet op genormaliseerde inhoud)"""
+    summaries, jobs = summary_jobs(sections, provider, model)
+    calls = [partial(call_model, prompt, provider, model, 0.2, use_cache=False, kind="summary") for _, prompt in jobs]
+    outputs = run_tasks(calls, max_workers or default_concurrency(provider))
+    return collect_summaries(sections, provider, model, summaries, jobs, outputs)
+
+def build_outline(sections, provider="ollama", model="llama3.1", generate=None, max_workers=None):
+    """Outline van het hele manuscript uit de sectie-samenvattingen
+
+    Passen alle samenvattingen niet in één prompt, dan worden groepen eerst gecondenseerd
+    (herhaald tot het past). generate(prompt) kan de laatste call overnemen (bijv. om te streamen).
+    """
+    workers = max_workers or default_concurrency(provider)
+    blocks = _summary_blocks(sections, summarize_sections(sections, provider, model, workers))
+    while (prompts := condense_prompts(blocks)) is not None:
+        blocks = run_tasks([partial(call_model, prompt, provider, model, 0.2, kind="summary") for prompt in prompts], workers)
+    prompt = p_outline_from_summaries(blocks)
+    if generate:
+        return generate(prompt)
+    return call_model(prompt, provider, model, 0.2, kind="outline")
+
+async def abuild_outline(sections, provider="ollama", model="llama3.1", max_workers=None):
+    """Async variant van build_outline"""
+    limit = asyncio.Semaphore(max_workers or default_concurrency(provider))
+
+    async def call(prompt, **kwargs):
+        async with limit:
+            return await acall_model(prompt, provider, model, 0.2, **kwargs)
+
+    summaries, jobs = await asyncio.to_thread(summary_jobs, sections, provider, model)
+    outputs = await asyncio.gather(*(call(prompt, use_cache=False, kind="summary") for _, prompt in jobs))
+    blocks = _summary_blocks(sections, collect_summaries(sections, provider, model, summaries, jobs, outputs))
+    while (prompts := condense_prompts(blocks)) is not None:
+        blocks = list(await asyncio.gather(*(call(prompt, kind="summary") for prompt in prompts)))
+    return await acall_model(p_outline_from_summaries(blocks), provider, model, 0.2, kind="outline")
+
+# ====== BATCH MODE ======
+def _record_batch_call(item, model, system, output=None, usage=None, wall_time=0.0, cache_hit=False, error=None):
+    """Metrics record (call_metrics) voor één request uit een batch of de cache ervan"""
+    prompt, _, _, kind = item
+    with measure_call(kind, "openai", model) as info:
+        info.update(wall_time=wall_time, price_factor=BATCH_PRICE_FACTOR, error=error)
+        if usage:
+            info.update(input_tokens=usage.get("prompt_tokens"), output_tokens=usage.get("completion_tokens"))
+        if error is None:
+            _count_tokens(info, system + prompt, output, cache_hit=cache_hit)
+
+def batch_call_models(items, model="gpt-4o-mini", system=SYSTEM_ROLE, batch_path=None, poll_interval=None,
+                      on_status=None):
+    """Beantwoord een set prompts via de OpenAI Batch API (offline, 50% korting, buiten de rate limits)
+
+    items: {custom_id: (prompt, temperature, json_schema, kind)}. Prompts die al in de response cache
+    staan gaan niet mee in de batch; requests die in de batch mislukken worden daarna alsnog
+    als gewone call uitgevoerd. Elk request levert een call_metrics record met de usage uit de
+    batch output en de doorlooptijd van de batch als wall_time.
+
+    Returns:
+        {custom_id: antwoord}
+    """
+    outputs, requests, keys = {}, [], {}
+    for custom_id, (prompt, temperature, schema, _) in items.items():
+        key = _cache_key(prompt, "openai", model, temperature, system, schema)
+        cached = RESPONSE_CACHE.get(key) if key else None
+        if cached is not None:
+            outputs[custom_id] = cached
+            _record_batch_call(items[custom_id], model, system, cached, cache_hit=True)
+            continue
+        keys[custom_id] = key
+        requests.append(batch_request(custom_id, model, prompt, temperature, system,
+                                      _response_format(schema) if schema else None))
+
+    if requests:
+        config = get_api_config()
+        client = get_openai_client(config['api_key'], config['org'], config['base'])
+        path = batch_path or OUTPUT_DIR / "batches" / f"batch-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+        usage, started = {}, time.perf_counter()
+        batch, results, errors = run_batch(client, requests, path, poll_interval, on_status=on_status,
+                                           metadata={"source": "arc-crusade-cli"}, usage=usage)
+        wall_time = batch_duration(batch, time.perf_counter() - started)
+        for custom_id, text in results.items():
+            if custom_id in keys:
+                outputs[custom_id] = text
+                _record_batch_call(items[custom_id], model, system, text, usage.get(custom_id), wall_time)
+                if keys[custom_id]:
+                    RESPONSE_CACHE.put(keys[custom_id], text)
+        for custom_id, error in errors.items():
+            if custom_id in keys:
+                _record_batch_call(items[custom_id], model, system, wall_time=wall_time, error=error[:300])
+        if errors:
+            print(f"⚠️ {len(errors)} batch requests failed, retrying them directly")
+
+    missing = [custom_id for custom_id in items if custom_id not in outputs]
+    calls = [partial(call_model, items[c][0], "openai", model, items[c][1], system, json_schema=items[c][2],
+                     kind=items[c][3]) for c in missing]
+    outputs.update(zip(missing, run_tasks(calls, default_concurrency("openai"))))
+    return outputs
+
+def analyze_manuscript_batch(sections, model="gpt-4o-mini", rewrite=True, enhanced=False,
+                             genre="fantasy", rewrite_focus="overall", combined=False, batch_path=None,
+                             poll_interval=None, on_status=None):
+    """Sectie-samenvattingen (voor de outline) + alle sectie-analyses in één batch
+
+    Returns:
+        (outline, sectie resultaten) - dezelfde structuur als analyze_sections
+    """
+    metrics = section_metrics(sections, enhanced)
+    options = (rewrite, enhanced, genre, rewrite_focus)
+    stored = stored_section_results(sections, "openai", model, options)
+    changed = [i for i in range(len(sections)) if i not in stored]
+    jobs = section_jobs(sections, metrics, *options, combined=combined, indices=changed)
+    summaries, summary_prompts = summary_jobs(sections, "openai", model)
+    items = {f"summary-{n}": (prompt, 0.2, None, "summary") for n, (_, prompt) in enumerate(summary_prompts)}
+    job_ids = []
+    for i, key, _, prompt, temperature, schema, part in jobs:
+        job_ids.append(f"section-{i}-{key}" + (f"-{part[0]}" if part else ""))
+        items[job_ids[-1]] = (prompt, temperature, schema, key)
+
+    outputs = batch_call_models(items, model, batch_path=batch_path, poll_interval=poll_interval,
+                                on_status=on_status)
+
+    # Reduce stappen (outline uit de samenvattingen, chunk analyses samenvoegen) als gewone calls
+    summaries = collect_summaries(sections, "openai", model, summaries, summary_prompts,
+                                  [outputs[f"summary-{n}"] for n in range(len(summary_prompts))])
+    blocks = _summary_blocks(sections, summaries)
+    while (prompts := condense_prompts(blocks)) is not None:
+        blocks = run_tasks([partial(call_model, prompt, "openai", model, 0.2, kind="summary") for prompt in prompts],
+                           default_concurrency("openai"))
+    outline = call_model(p_outline_from_summaries(blocks), "openai", model, 0.2, kind="outline")
+    jobs, section_outputs, merges = reduce_chunked_outputs(sections, jobs, [outputs[c] for c in job_ids])
+    if merges:
+        calls = [partial(call_model, prompt, "openai", model, temperature, kind=key)
+                 for (_, key, _, prompt, temperature, _, _) in merges]
+        jobs, section_outputs = jobs + merges, section_outputs + run_tasks(calls, default_concurrency("openai"))
+    failed = []
+    if combined:
+        jobs, section_outputs, failed = split_combined_outputs(jobs, section_outputs)
+    results = assemble_section_results(sections, metrics, jobs, section_outputs)
+    if failed:
+        # Onbruikbare combined antwoorden: die secties direct met losse calls doen
+        retried = analyze_sections([sections[i] for i in failed], "openai", model, rewrite, enhanced,
+                                   genre, rewrite_focus)
+        for i, result in zip(failed, retried):
+            results[i] = result
+    return outline, merge_section_results(sections, "openai", model, options, results, stored)
+
+def rubric_blobs_for(results):
+    """Rubric fragmenten (max 4000 tekens per sectie) als input voor p_top_issues"""
+    return [f"--- {r['title']} ---\n{r['rubric'][:4000]}" for r in results]
+
 # ====== MAIN ======
 def main():
     load_dotenv = True
@@ -317,48 +1258,107 @@ def main():
         pass
 
     ap = argparse.ArgumentParser(description="Manuscript analyzer (CLI)")
-    ap.add_argument("files", nargs="+", help="Path to .docx/.md/.txt files")
+    ap.add_argument("files", nargs="*", help="Path to .docx/.md/.txt files")
+    ap.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run (see outputs/runs); completed stages and calls are skipped")
     ap.add_argument("--provider", choices=["ollama","openai"], default="ollama")
     ap.add_argument("--model", default="llama3.1")
     ap.add_argument("--no-rewrite", action="store_true", help="Skip section rewrites")
+    ap.add_argument("--combined", action="store_true", help="One structured (JSON) model call per section instead of one per analysis")
+    ap.add_argument("--batch", action="store_true", help="Submit outline and section analyses as one OpenAI batch (offline, 50%% cheaper)")
+    ap.add_argument("--batch-poll", type=float, default=None, help="Seconds between batch status checks (default: ARC_BATCH_POLL_INTERVAL or 60)")
+    ap.add_argument("--stream", action="store_true", help="Print outline, issues, plan and timeline advice while they are generated")
+    ap.add_argument("--no-cache", action="store_true", help="Always call the model, ignore the response cache")
+    ap.add_argument("--concurrency", type=int, default=None, help="Max parallel model calls (default: ARC_MAX_CONCURRENCY, 2 for ollama)")
     ap.add_argument("--client-name", help="Client name for organized export (creates client-specific folder)")
     ap.add_argument("--export-path", help="Custom export path for client folders (e.g., G:\\Mijn Drive\\The arc crusade\\Export Arc Crusade Program)")
     args = ap.parse_args()
+    if not args.files and not args.resume:
+        ap.error("give manuscript files or --resume RUN_ID")
+    if args.batch and args.provider != "openai":
+        ap.error("--batch requires --provider openai")
+    if args.no_cache:
+        RESPONSE_CACHE.enabled = False
 
     # Combineer input
-    full_text = ""
     sections = []
     for f in args.files:
-        txt = read_file(Path(f))
-        full_text += f"\n\n=== FILE: {Path(f).name} ===\n\n{txt}"
-        sections += split_sections(txt)
-
-    outline = call_model(p_outline(full_text), args.provider, args.model, 0.2)
-    results = []
-    rubric_blobs = []
-
-    for sec in sections:
-        m = rough_metrics(sec["content"])
-        rub = call_model(p_rubric(sec["title"], sec["content"]), args.provider, args.model, 0.3)
-        rubric_blobs.append(f"--- {sec['title']} ---\n{rub[:4000]}")
-        rewrite = ""
-        if not args.no_rewrite:
-            rewrite = call_model(p_short_rewrite(sec["title"], sec["content"]), args.provider, args.model, 0.5)
-        results.append({"title": sec["title"], "metrics": m, "rubric": rub, "rewrite": rewrite})
-
-    top_issues = call_model(p_top_issues(rubric_blobs), args.provider, args.model, 0.2)
-    plan = call_model(p_plan(outline, top_issues), args.provider, args.model, 0.2)
-
-    timeline_rows = []
-    for sec in sections:
-        marks = extract_time_markers(sec["content"])
-        pretty = "; ".join([f"{k}:{v}" for (k,v) in marks]) if marks else "(geen)"
-        timeline_rows.append(f"* {sec['title']}: {pretty}")
-    timeline_text = "\n".join(timeline_rows)
-    timeline_feedback = call_model(p_timeline_feedback(timeline_text), args.provider, args.model, 0.2)
+        sections += split_sections(read_file(Path(f)))
+
+    # pipeline importeert dit module: pas hier laden
+    from pipeline import run_analysis, resume_analysis
+    from run_store import RunNotFound, new_run_id
+
+    # --stream: rapport-onderdelen die tegelijk gegenereerd worden niet door elkaar printen;
+    # één onderdeel streamt live, de rest verschijnt zodra dat klaar is
+    headings = {"outline": "Outline", "issues": "Top 10 Issues", "plan": "Improvement Plan",
+                "timeline_feedback": "Timeline Consistency (advice)"}
+    live = {"stage": None, "shown": 0, "finished": []}
+
+    def on_text(stage, text):
+        text = text.lstrip()
+        if live["stage"] is None and stage not in dict(live["finished"]):
+            live.update(stage=stage, shown=0)
+            print(f"\n## {headings[stage]}\n", flush=True)
+        if live["stage"] == stage:
+            print(text[live["shown"]:], end="", flush=True)
+            live["shown"] = len(text)
+
+    def on_stage_done(stage, text):
+        if live["stage"] != stage:
+            live["finished"].append((stage, text))
+            if live["stage"] is not None:
+                return
+        else:
+            print(text[live["shown"]:], flush=True)
+            live["stage"] = None
+        for done_stage, done_text in live["finished"]:
+            print(f"\n## {headings[done_stage]}\n\n{done_text}", flush=True)
+        live["finished"] = []
+
+    def on_event(event):
+        if event["type"] == "progress":
+            print(f"[{event['done']}/{event['total']}] {event['label']}")
+        elif event["type"] == "batch":
+            progress = f" ({event['completed']}/{event['total']})" if event["total"] else ""
+            print(f"⏳ Batch {event['id']}: {event['status']}{progress}", flush=True)
+        elif args.stream and event["type"] == "text":
+            on_text(event["stage"], event["text"])
+        elif args.stream and event["type"] == "stage" and event["stage"] in headings:
+            on_stage_done(event["stage"], event["result"])
+
+    run_id = args.resume or new_run_id()
+    print(f"🧾 Run {run_id}")
+    try:
+        if args.resume:
+            report = resume_analysis(run_id, on_event=on_event, max_workers=args.concurrency, stream=args.stream)
+        else:
+            report = run_analysis(sections, args.provider, args.model, on_event=on_event, run_id=run_id,
+                                  rewrite=not args.no_rewrite, combined=args.combined, batch=args.batch,
+                                  batch_poll=args.batch_poll, max_workers=args.concurrency, stream=args.stream)
+    except RunNotFound as e:
+        ap.error(str(e))
+    except Exception as e:
+        print(f"❌ Run {run_id} failed: {e}")
+        print(f"💡 Completed work is saved; continue with: --resume {run_id}")
+        raise SystemExit(1)
+    if not sections:
+        sections = report["sections"]
+    outline, top_issues, plan = report["outline"], report["issues"], report["plan"]
+    timeline_text, timeline_feedback = report["timeline_extract"], report["timeline_feedback"]
+    results, analysis_info = report["sections"], report["analysis_info"]
+
+    if RESPONSE_CACHE.enabled:
+        cache_stats = RESPONSE_CACHE.stats()
+        print(f"♻️ Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    reused = analysis_info["reused_sections"]
+    if reused:
+        print(f"♻️ {reused}/{len(results)} unchanged sections reused from a previous analysis")
+    call_stats = analysis_info["calls"]
+    print(f"📈 {call_stats['calls']} model calls, {call_stats['input_tokens']} input / "
+          f"{call_stats['output_tokens']} output tokens, ~${call_stats['cost_usd']:.4f}")
 
     # Exports
-    ts = time.strftime("%Y%m%d-%H%M%S")
+    ts = analysis_info["timestamp"]
     report_md = [f"# Manuscript Analysis Report – {ts}",
                  "## Outline", outline,
                  "## Top 10 Issues", top_issues,
@@ -368,7 +1368,7 @@ def main():
                  "## Sections"]
     rew_dir = OUTPUT_DIR / "rewrites"; rew_dir.mkdir(exist_ok=True)
     for r in results:
-        report_md += [f"### {r['title']}",
+        report_md += [f"### {r['title']}" + (" (unchanged – reused)" if r.get("reused") else ""),
                       f"- Metrics: {json.dumps(r['metrics'])}",
                       "#### Analysis", r["rubric"],
                       "#### Rewrite Suggestion", r["rewrite"] or "_(disabled)_"]
@@ -384,7 +1384,7 @@ def main():
     results_path.write_text(json.dumps(
         {"outline": outline, "issues": top_issues, "plan": plan,
          "timeline_extract": timeline_text, "timeline_feedback": timeline_feedback,
-         "sections": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+         "sections": results, "analysis_info": analysis_info}, ensure_ascii=False, indent=2), encoding="utf-8")
     
     # Create analysis data structure
     analysis_data = {
@@ -394,6 +1394,7 @@ def main():
         'improvement_plan': plan,
         'timeline_feedback': timeline_feedback,
         'sections': results,
+        'analysis_info': analysis_info,
         'metrics_summary': {
             'total_sections': len(sections),
             'total_words': sum(r['metrics']['words'] for r in results),
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Gedeelde pytest fixtures: lokale nep-Ollama en nep-OpenAI servers voor tests zonder echte LLM
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_clients
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Beantwoordt /api/chat met 'echo: ' + de eerste regel van de prompt (ook als stream)"""
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        FakeOllamaHandler.calls.append(prompt)
+        content = "echo: " + prompt.splitlines()[0][:60]
+        if body.get("stream"):
+            words = content.split(" ")
+            lines = [{"message": {"content": w + (" " if i < len(words) - 1 else "")}, "done": False}
+                     for i, w in enumerate(words)] + [{"message": {"content": ""}, "done": True}]
+            reply = "".join(json.dumps(line) + "\n" for line in lines).encode()
+            content_type = "application/x-ndjson"
+        else:
+            reply = json.dumps({"message": {"content": content}}).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    import cli_manuscript_assistant
+    # Elke call moet de server echt bereiken
+    monkeypatch.setattr(cli_manuscript_assistant.RESPONSE_CACHE, "enabled", False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    old_host = llm_clients.OLLAMA_HOST
+    llm_clients.configure(ollama_host=f"http://127.0.0.1:{server.server_port}")
+    FakeOllamaHandler.calls = []
+    try:
+        yield FakeOllamaHandler
+    finally:
+        llm_clients.configure(ollama_host=old_host)
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture(autouse=True)
+def metrics_sink(tmp_path, monkeypatch):
+    """Schrijf call metrics van tests naar een tijdelijk JSONL bestand"""
+    import call_metrics
+    sink = call_metrics.JsonlSink(tmp_path / "calls.jsonl")
+    monkeypatch.setattr(call_metrics, "SINK", sink)
+    return sink
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Eigen response cache per test: geen hergebruik van antwoorden of sectie-resultaten tussen tests"""
+    import cli_manuscript_assistant
+    from response_cache import ResponseCache
+    cache = ResponseCache(tmp_path / "cache" / "responses.sqlite3")
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", cache)
+    yield cache
+    cache.close()
+
+@pytest.fixture(autouse=True)
+def isolated_runs(tmp_path, monkeypatch):
+    """Run checkpoints van tests in een tijdelijke map"""
+    import pipeline
+    monkeypatch.setattr(pipeline, "runs_dir", lambda: tmp_path / "runs")
+    return tmp_path / "runs"
+
+@pytest.fixture
+def api_app(tmp_path, monkeypatch):
+    """De FastAPI module met een job queue in een tijdelijke database"""
+    import api
+    from job_queue import JobQueue
+    jobs = JobQueue(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(api, "JOBS", jobs)
+    yield api
+    jobs.close()
+
+def fake_completion(body):
+    """Chat completion response voor een request body ("echo: " + eerste regel, of JSON bij een schema)"""
+    prompt = body["messages"][-1]["content"]
+    content = "echo: " + prompt.splitlines()[0][:60]
+    schema = (body.get("response_format") or {}).get("json_schema")
+    if schema:
+        # Structured output: elk verplicht veld krijgt "echo: <veld>"
+        content = json.dumps({field: f"echo: {field}" for field in schema["schema"]["required"]})
+    return {"id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}}
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimale /v1/chat/completions plus /v1/files en /v1/batches (Batch API)
+
+    `failures` is een lijst (status, headers) die eerst wordt afgespeeld. Een batch staat bij
+    de eerste status-opvraag op in_progress en daarna op completed; `batch_failures` is een
+    set custom_ids die in de batch output een fout krijgen.
+    """
+    calls = []
+    failures = []
+    files = {}
+    batches = {}
+    batch_failures = set()
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/files"):
+            return self._upload(raw)
+        body = json.loads(raw)
+        if self.path.endswith("/batches"):
+            return self._create_batch(body)
+        FakeOpenAIHandler.calls.append(body)
+        if FakeOpenAIHandler.failures:
+            status, headers = FakeOpenAIHandler.failures.pop(0)
+            self._reply({"error": {"message": "slow down", "type": "rate_limit"}}, status, headers)
+        else:
+            self._reply(fake_completion(body), 200, {"x-ratelimit-limit-requests": "5000"})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[-1] == "content":
+            text = FakeOpenAIHandler.files[parts[-2]]
+            return self._reply(text, 200, content_type="application/octet-stream")
+        batch = FakeOpenAIHandler.batches[parts[-1]]
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        else:
+            self._finish_batch(batch)
+        self._reply(batch)
+
+    # ====== BATCH API ======
+    def _upload(self, raw):
+        # Multipart body: de JSONL regels zijn de regels die met een custom_id object beginnen
+        lines = [line for line in raw.decode().splitlines() if line.startswith('{"custom_id"')]
+        file_id = f"file-{len(FakeOpenAIHandler.files) + 1}"
+        FakeOpenAIHandler.files[file_id] = "\n".join(lines)
+        self._reply({"id": file_id, "object": "file", "bytes": len(raw), "created_at": 0,
+                     "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+
+    def _create_batch(self, body):
+        batch_id = f"batch-{len(FakeOpenAIHandler.batches) + 1}"
+        total = len(FakeOpenAIHandler.files[body["input_file_id"]].splitlines())
+        batch = {"id": batch_id, "object": "batch", "endpoint": body["endpoint"], "errors": None,
+                 "input_file_id": body["input_file_id"], "completion_window": body["completion_window"],
+                 "status": "validating", "output_file_id": None, "error_file_id": None, "created_at": 0,
+                 "metadata": body.get("metadata"),
+                 "request_counts": {"total": total, "completed": 0, "failed": 0}}
+        FakeOpenAIHandler.batches[batch_id] = batch
+        self._reply(batch)
+
+    def _finish_batch(self, batch):
+        if batch["status"] == "completed":
+            return
+        output = []
+        for line in FakeOpenAIHandler.files[batch["input_file_id"]].splitlines():
+            request = json.loads(line)
+            if request["custom_id"] in FakeOpenAIHandler.batch_failures:
+                response = {"status_code": 500, "body": {"error": {"message": "server error"}}}
+            else:
+                FakeOpenAIHandler.calls.append(request["body"])
+                response = {"status_code": 200, "body": fake_completion(request["body"])}
+            output.append(json.dumps({"id": "req", "custom_id": request["custom_id"], "response": response, "error": None}))
+        output_id = f"file-{len(FakeOpenAIHandler.files) + 1}"
+        FakeOpenAIHandler.files[output_id] = "\n".join(output)
+        failed = len(FakeOpenAIHandler.batch_failures & {json.loads(line)["custom_id"] for line in output})
+        batch.update(status="completed", output_file_id=output_id,
+                     request_counts={"total": len(output), "completed": len(output) - failed, "failed": failed})
+
+    def _reply(self, payload, status=200, headers=None, content_type="application/json"):
+        reply = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    import cli_manuscript_assistant
+    monkeypatch.setattr(cli_manuscript_assistant.RESPONSE_CACHE, "enabled", False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE", f"http://127.0.0.1:{server.server_port}/v1")
+    FakeOpenAIHandler.calls = []
+    FakeOpenAIHandler.failures = []
+    FakeOpenAIHandler.files = {}
+    FakeOpenAIHandler.batches = {}
+    FakeOpenAIHandler.batch_failures = set()
+    try:
+        yield FakeOpenAIHandler
+    finally:
+        server.shutdown()
+        server.server_close()
+        llm_clients.close_all()
@@ -75,19 +75,12 @@ if uploaded_file:
     try:
         from cli_manuscript_assistant import read_file
         
-        # Write temp file
-        temp_path = Path(f"temp_{uploaded_file.name}")
-        temp_path.write_bytes(uploaded_file.getvalue())
-        
-        # Read it back
-        content = read_file(temp_path)
+        # Read straight from the upload
+        content = read_file(uploaded_file.getvalue(), uploaded_file.name)
         
         st.success(f"✅ Bestand gelezen: {len(content)} karakters")
         st.text_area("Inhoud preview:", content[:500] + "..." if len(content) > 500 else content)
         
-        # Clean up
-        temp_path.unlink()
-        
     except Exception as e:
         st.error(f"❌ File reading error: {e}")
 
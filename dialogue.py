@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Dialoog herkenning voor Arc Crusade Manuscript Assistant
+Een kleine state machine vindt dialoog tussen rechte en gekrulde aanhalingstekens („…”, “…”, "…",
+‘…’, '…', «…») in één lineaire pass. Losse apostrofs (don't, 'tis, the boys') openen geen dialoog
+en een niet gesloten aanhalingsteken loopt nooit verder dan het einde van de alinea.
+"""
+import re
+
+# Alleen aanhalingstekens en alinea grenzen zijn interessant; de rest slaat de regex (in C) over.
+# [^\S\n]* kan zelf geen \n bevatten, dus er is geen backtracking over lange witruimte.
+_EVENTS = re.compile(r"[\"“”„«»'‘’]|\n[^\S\n]*\n")
+
+# Openend teken -> tekens die die dialoog sluiten
+_DOUBLE = {'"': '"”', '“': '”"', '„': '”“"', '«': '»'}
+_SINGLE_OPEN = "'‘"
+_SINGLE_CLOSE = "'’"
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+def dialogue_spans(text):
+    """(start, end) van elke dialoog, inclusief de aanhalingstekens, in tekstvolgorde
+
+    Dubbele aanhalingstekens die aan het einde van een alinea nog open staan sluiten daar
+    (doorlopende dialoog over alinea's). Een enkel aanhalingsteken opent alleen als het
+    sluitteken volgt vóór het volgende enkele openingsteken en binnen de alinea; anders was
+    het een apostrof ('tis, 'ya).
+    """
+    events = [(m.start(), m.group()) for m in _EVENTS.finditer(text)]
+    events.append((len(text), "\n\n"))
+
+    def kind(pos, char):
+        before = text[pos - 1] if pos else " "
+        after = text[pos + 1] if pos + 1 < len(text) else " "
+        if char in _SINGLE_CLOSE and not before.isspace() and not _is_word(after):
+            return "close"
+        if char in _SINGLE_OPEN and not _is_word(before) and not after.isspace():
+            return "open"
+        return None
+
+    # Van achter naar voren: heeft een enkel openingsteken op deze plek een sluitteken?
+    single_kinds = [None if len(char) > 1 or char in _DOUBLE else kind(pos, char) for pos, char in events]
+    closes = [False] * len(events)
+    ahead = False
+    for k in range(len(events) - 1, -1, -1):
+        closes[k] = ahead
+        if len(events[k][1]) > 1 or single_kinds[k] == "open":
+            ahead = False
+        elif single_kinds[k] == "close":
+            ahead = True
+
+    spans = []
+    start, closers, single = None, "", False
+    for k, (pos, char) in enumerate(events):
+        if len(char) > 1:  # alinea grens
+            if start is not None:
+                spans.append((start, pos))
+                start = None
+        elif start is None:
+            if char in _DOUBLE:
+                start, closers, single = pos, _DOUBLE[char], False
+            elif single_kinds[k] == "open" and closes[k]:
+                start, closers, single = pos, _SINGLE_CLOSE, True
+        elif char in closers and (not single or single_kinds[k] == "close"):
+            spans.append((start, pos + 1))
+            start = None
+    return spans
+
+def dialogue_words(text, spans=None):
+    """Aantal woorden (text.split()) binnen dialoog"""
+    spans = dialogue_spans(text) if spans is None else spans
+    return sum(len(text[start:end].split()) for start, end in spans)
+
+# ====== SPREKERS ======
+_SPEECH_VERBS = (r"said|says|asked|replied|answered|whispered|shouted|yelled|cried|called|muttered|murmured|"
+                 r"snapped|added|continued|zei|zegt|vroeg|antwoordde|fluisterde|riep|schreeuwde|mompelde|"
+                 r"snauwde|zuchtte|vervolgde")
+_NAME = r"[A-Z][a-z]+(?:[ \t]+[A-Z][a-z]+)*"
+# “…,” said Mara / “…,” Mara said
+_TAG_AFTER = re.compile(rf"[^\w\n]*(?:(?:{_SPEECH_VERBS})[ \t]+({_NAME})\b|({_NAME})[ \t]+(?:{_SPEECH_VERBS})\b)")
+# Mara said: “…”
+_TAG_BEFORE = re.compile(rf"\b({_NAME})[ \t]+(?:{_SPEECH_VERBS})[^\w\n]*$")
+# “…,” she said: wel een tag, maar geen naam; die dialoog neemt de spreker van de alinea niet over
+_PRONOUNS = r"[Hh]e|[Ss]he|[Tt]hey|[Hh]ij|[Zz]ij|[Zz]e"
+_PRONOUN_TAG = re.compile(rf"[^\w\n]*(?:(?:{_SPEECH_VERBS})[ \t]+(?:{_PRONOUNS})|(?:{_PRONOUNS})[ \t]+(?:{_SPEECH_VERBS}))\b")
+_PARAGRAPH = re.compile(r"\n[^\S\n]*\n")
+# Woorden met hoofdletter die in een tag geen naam zijn ("He said")
+_NOT_NAMES = {"He", "She", "They", "It", "We", "You", "The", "Then", "Hij", "Zij", "Ze", "Het", "De", "Toen", "Die"}
+
+def dialogue_lines(text, spans=None):
+    """Elke dialoog met spreker (of None als die niet uit de tekst af te leiden is)
+
+    De spreker komt uit de tag direct na ("…," said Mara) of voor (Mara said: "…") de dialoog;
+    dialoog zonder tag in dezelfde alinea krijgt de spreker van de rest van die alinea.
+    """
+    spans = dialogue_spans(text) if spans is None else spans
+    breaks = list(_PARAGRAPH.finditer(text))
+    paragraph_starts = [0] + [m.end() for m in breaks]
+    paragraph_ends = [m.start() for m in breaks] + [len(text)]
+    lines, paragraph = [], 0
+    for n, (start, end) in enumerate(spans):
+        while paragraph_ends[paragraph] < start:
+            paragraph += 1
+        # tags zoeken tot de volgende dialoog en binnen de alinea
+        next_start = spans[n + 1][0] if n + 1 < len(spans) else len(text)
+        previous_end = spans[n - 1][1] if n else 0
+        tag_end = min(end + 80, next_start, paragraph_ends[paragraph])
+        after = _TAG_AFTER.match(text, end, tag_end)
+        before = _TAG_BEFORE.search(text[max(start - 80, previous_end, paragraph_starts[paragraph]):start])
+        speaker = (after.group(1) or after.group(2)) if after else (before.group(1) if before else None)
+        if speaker in _NOT_NAMES or (speaker is None and _PRONOUN_TAG.match(text, end, tag_end)):
+            speaker = False  # tag zonder naam
+        inner = text[start:end].strip("\"“”„«»'‘’ \n")
+        lines.append({"start": start, "end": end, "paragraph": paragraph, "speaker": speaker, "text": inner})
+
+    # Eén spreker per alinea: dialoog zonder tag neemt de spreker van de alinea over
+    by_paragraph = {}
+    for line in lines:
+        if line["speaker"]:
+            by_paragraph.setdefault(line["paragraph"], line["speaker"])
+    for line in lines:
+        if line["speaker"] is None:
+            line["speaker"] = by_paragraph.get(line["paragraph"])
+        elif line["speaker"] is False:
+            line["speaker"] = None
+    return lines
+
+def speaker_stats(text, spans=None):
+    """{spreker: {"lines", "words"}} voor alle dialoog met een bekende spreker"""
+    stats = {}
+    for line in dialogue_lines(text, spans):
+        if line["speaker"]:
+            entry = stats.setdefault(line["speaker"], {"lines": 0, "words": 0})
+            entry["lines"] += 1
+            entry["words"] += len(line["text"].split())
+    return stats
+
+def dialogue_by_speaker(text, names=None, spans=None):
+    """{spreker: [dialoog, ...]}; onbekende sprekers (of sprekers buiten names) onder None"""
+    speakers = {}
+    for line in dialogue_lines(text, spans):
+        speaker = line["speaker"] if names is None or line["speaker"] in names else None
+        speakers.setdefault(speaker, []).append(line["text"])
+    return speakers
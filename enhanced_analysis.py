@@ -12,72 +12,59 @@ Enhanced Manuscript Assistant - Geava    action_count = len(re.findall(action_wo
 import re
 from pathlib import Path
 
+from chunking import token_budget, truncate_tokens
+from text_context import TextContext, WordSet, positions
+from character_index import character_index, likely_characters
+
 # ====== GEAVANCEERDE ANALYSE FUNCTIES ======
 
 def analyze_character_development(text):
     """Analyseer karakterontwikkeling en personages"""
-    characters = {}
-    
-    # Verbeterde naam detectie - meer specifiek voor karakternamen
-    names = re.findall(r'\b[A-Z][a-z]{2,}(?:\s+[A-Z][a-z]+)*\b', text)
-    name_counts = {}
-    
-    # Uitgebreidere stopwoorden lijst
-    stopwords = {
-        'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als',
-        'Dat', 'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog', 'Al', 'Zo', 'Zeer',
-        'Hoofdstuk', 'Chapter', 'Deel', 'Part', 'Sectie', 'Epiloog', 'Proloog'
-    }
+    ctx = TextContext.of(text)
     
-    for name in names:
-        # Controleer of het geen stopwoord of algemeen woord is
-        if len(name) >= 3 and name not in stopwords and not name.lower() in ['het', 'een', 'die', 'deze']:
-            name_counts[name] = name_counts.get(name, 0) + 1
+    # Verbeterde naam detectie - meer specifiek voor karakternamen (longer names like "Eldrin" get priority)
+    characters = likely_characters(ctx)
     
-    # Filter for likely character names (mentioned >1 time, longer names get priority)
-    likely_characters = {}
-    for name, count in name_counts.items():
-        if count >= 2 or (count >= 1 and len(name) >= 5):  # Longer names like "Eldrin" get priority
-            likely_characters[name] = count
+    # Zinnen en emotiewoorden per personage in één pass over de tekst
+    index = character_index(ctx, characters)
     
-    # Search for emotion words per character
-    emotions = r'\b(afraid|happy|sad|angry|frustrated|excited|nervous|calm|tense|joyful|unhappy|anxious|proud|ashamed|disappointed|scared|worried|confused|surprised|shocked)\b'
-    
-    character_analysis = {}
-    for char in likely_characters:
-        # Find sentences with this character
-        char_sentences = re.findall(f'[^.!?]*\\b{char}\\b[^.!?]*[.!?]', text, re.IGNORECASE)
-        emotions_found = []
-        for sentence in char_sentences:
-            emotions_found.extend(re.findall(emotions, sentence, re.IGNORECASE))
-        
-        character_analysis[char] = {
-            'mentions': likely_characters[char],
-            'emotions': emotions_found,
-            'sentences': len(char_sentences)
+    return {
+        char: {
+            'mentions': count,
+            'emotions': index[char]['emotions'],
+            'sentences': len(index[char]['sentence_ids'])
         }
-    
-    return character_analysis
+        for char, count in characters.items()
+    }
+
+# Woordenlijsten voor de analyses; geteld als heel woord, hoofdletterongevoelig
+ACTION_WORDS = WordSet('ran', 'jumped', 'grabbed', 'shouted', 'screamed', 'fought', 'hit', 'pushed', 'pulled',
+                       'threw', 'rushed', 'leaped', 'struck', 'slammed', 'burst', 'charged')
+DESCRIPTION_WORDS = WordSet('was', 'had', 'seemed', 'stood', 'lay', 'sat', 'looked', 'felt', 'thought', 'knew',
+                            'appeared', 'remained')
+TELL_WORDS = WordSet('felt', 'thought', 'knew', 'understood', 'realized')
+TELL_LINKING_VERBS = WordSet('was', 'seemed', 'appeared')  # tellen samen met het volgende woord
+SHOW_WORDS = WordSet('looked', 'listened', 'smelled', 'tasted', 'felt', 'grabbed', 'whispered', 'shouted',
+                     'trembled', 'sweated', 'glanced', 'stared', 'reached', 'touched', 'smiled', 'frowned')
+SENSORY_WORDS = WordSet('saw', 'heard', 'smelled', 'tasted', 'felt', 'warm', 'cold', 'soft', 'rough', 'sweet',
+                        'sour', 'bright', 'dark', 'loud', 'quiet')
+WEAK_VERBS = ['was', 'had', 'went', 'came', 'did', 'made', 'got', 'put', 'took']
 
 def analyze_pacing(text):
     """Analyze story rhythm and pacing"""
-    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    ctx = TextContext.of(text)
     
     # Calculate sentence length variation
-    lengths = [len(s.split()) for s in sentences]
+    lengths = ctx.sentence_lengths
     avg_length = sum(lengths) / len(lengths) if lengths else 0
     
     # Search for action words vs description
-    action_words = r'\b(ran|jumped|grabbed|shouted|screamed|fought|hit|pushed|pulled|threw|rushed|leaped|struck|slammed|burst|charged)\b'
-    description_words = r'\b(was|had|seemed|stood|lay|sat|looked|felt|thought|knew|appeared|remained)\b'
-    
-    action_count = len(re.findall(action_words, text, re.IGNORECASE))
-    description_count = len(re.findall(description_words, text, re.IGNORECASE))
+    action_count = ctx.count_words(ACTION_WORDS)
+    description_count = ctx.count_words(DESCRIPTION_WORDS)
     
     # Dialog vs narratief ratio
-    dialog_text = re.findall(r'["\'"][^"\']*["\']', text)
-    dialog_words = sum(len(d.split()) for d in dialog_text)
-    total_words = len(text.split())
+    dialog_words = ctx.dialogue_words
+    total_words = len(ctx.split_words)
     dialog_ratio = dialog_words / total_words if total_words > 0 else 0
     
     return {
@@ -96,56 +83,75 @@ def calculate_pacing_score(action_count, description_count, dialog_ratio):
     
     return round((action_balance + dialog_balance) * 5, 1)
 
+def _is_adverb(word):
+    # \b\w+ly\b met IGNORECASE
+    if word.isascii():
+        return len(word) > 2 and word[-2:].lower() == 'ly'
+    return re.fullmatch(r'\w+ly', word, re.IGNORECASE) is not None
+
+def _is_verb_form(word):
+    # \b\w+(?:ed|ing|s)\b
+    return ((len(word) > 1 and word.endswith('s')) or (len(word) > 2 and word.endswith('ed'))
+            or (len(word) > 3 and word.endswith('ing')))
+
 def analyze_style_issues(text):
     """Detect common style problems"""
+    ctx = TextContext.of(text)
     issues = []
     
     # Too many adverbs
-    adverbs = re.findall(r'\b\w+ly\b', text, re.IGNORECASE)
-    if len(adverbs) > len(text.split()) * 0.05:  # More than 5%
-        issues.append(f"Too many adverbs ({len(adverbs)} found). Replace with stronger verbs.")
-    
-    # Repeated words
-    words = re.findall(r'\b\w+\b', text.lower())
-    word_counts = {}
-    for word in words:
-        if len(word) > 3:  # Only longer words
-            word_counts[word] = word_counts.get(word, 0) + 1
+    adverb_count = ctx.count_tokens(_is_adverb)
+    if adverb_count > len(ctx.split_words) * 0.05:  # More than 5%
+        issues.append(f"Too many adverbs ({adverb_count} found). Replace with stronger verbs.")
     
-    repeated = {w: c for w, c in word_counts.items() if c > 5}
+    # Repeated words (only longer words)
+    repeated = {w: c for w, c in ctx.word_freq.items() if len(w) > 3 and c > 5}
     if repeated:
         issues.append(f"Repeated words: {', '.join([f'{w} ({c}x)' for w, c in list(repeated.items())[:5]])}")
     
-    # Weak verbs
-    weak_verbs = ['was', 'had', 'went', 'came', 'did', 'made', 'got', 'put', 'took']
-    weak_count = sum(text.lower().count(verb) for verb in weak_verbs)
-    total_verbs = len(re.findall(r'\b\w+(?:ed|ing|s)\b', text)) + weak_count
+    # Weak verbs (let op: telt ook binnen woorden, "was" in "wasn't")
+    weak_count = sum(ctx.lower.count(verb) for verb in WEAK_VERBS)
+    total_verbs = ctx.count_tokens(_is_verb_form) + weak_count
     
     if weak_count > total_verbs * 0.3:
         issues.append(f"Many weak verbs ({weak_count}). Use more specific actions.")
     
     # Info dumps (long paragraphs without dialog)
-    paragraphs = text.split('\n\n')
-    long_paras = [p for p in paragraphs if len(p.split()) > 100 and '"' not in p]
+    long_paras = [p for p in ctx.paragraphs if len(p.split()) > 100 and '"' not in p]
     if long_paras:
         issues.append(f"{len(long_paras)} possible info-dumps found. Break up with action/dialog.")
     
     return issues
 
+def count_tell(ctx):
+    """"Tell" indicatoren: felt/thought/... en was/seemed/appeared + het volgende woord
+
+    Zoals de regex \\b(felt|...|was\\s+\\w+|...)\\b: een linking verb slokt het woord erna
+    op ("was thought" telt één keer), maar alleen als er enkel witruimte tussen staat.
+    """
+    tokens, gaps = ctx.tokens, ctx.gaps
+    hits = {w for w in ctx.token_counts if w in TELL_WORDS or w in TELL_LINKING_VERBS}
+    count, consumed = 0, -1
+    for i in positions(tokens, hits.__contains__):
+        if i == consumed:
+            continue
+        if tokens[i] in TELL_WORDS:
+            count += 1
+        elif i + 1 < len(tokens) and gaps[i + 1].isspace():
+            count += 1
+            consumed = i + 1
+    return count
+
 def analyze_show_vs_tell(text):
     """Analyze show vs tell ratio"""
-    # "Tell" indicators
-    tell_words = r'\b(felt|thought|knew|understood|realized|was\s+\w+|seemed\s+\w+|appeared\s+\w+)\b'
-    tell_matches = len(re.findall(tell_words, text, re.IGNORECASE))
+    ctx = TextContext.of(text)
+    tell_matches = count_tell(ctx)
     
     # "Show" indicators (actions, senses, dialog)
-    show_words = r'\b(looked|listened|smelled|tasted|felt|grabbed|whispered|shouted|trembled|sweated|glanced|stared|reached|touched|smiled|frowned)\b'
-    show_matches = len(re.findall(show_words, text, re.IGNORECASE))
+    show_matches = ctx.count_words(SHOW_WORDS)
+    sensory_count = ctx.count_words(SENSORY_WORDS)
     
-    sensory_words = r'\b(saw|heard|smelled|tasted|felt|warm|cold|soft|rough|sweet|sour|bright|dark|loud|quiet)\b'
-    sensory_count = len(re.findall(sensory_words, text, re.IGNORECASE))
-    
-    total_words = len(text.split())
+    total_words = len(ctx.split_words)
     
     return {
         'tell_ratio': round(tell_matches / max(total_words, 1) * 100, 2),
@@ -162,19 +168,19 @@ def calculate_show_tell_score(show_count, tell_count):
 
 # ====== ADVANCED PROMPT FUNCTIONS ======
 
+REWRITE_FOCUS_INSTRUCTIONS = {
+    "overall": "improve overall quality, increase tension and emotional impact",
+    "pacing": "improve rhythm, alternate short and long sentences, add micro-tension",
+    "character": "deepen characterization, show emotions through actions instead of telling",
+    "dialog": "make dialogues more natural and characteristic, add subtext",
+    "description": "make descriptions more vivid with sensory details",
+    "tension": "increase tension and conflict in every scene",
+    "style": "improve writing style, replace weak verbs and remove unnecessary adverbs"
+}
+
 def p_advanced_rewrite(title, text, focus_area="overall"):
     """Advanced rewrite prompt with specific focus"""
-    focus_instructions = {
-        "overall": "improve overall quality, increase tension and emotional impact",
-        "pacing": "improve rhythm, alternate short and long sentences, add micro-tension",
-        "character": "deepen characterization, show emotions through actions instead of telling",
-        "dialog": "make dialogues more natural and characteristic, add subtext",
-        "description": "make descriptions more vivid with sensory details",
-        "tension": "increase tension and conflict in every scene",
-        "style": "improve writing style, replace weak verbs and remove unnecessary adverbs"
-    }
-    
-    instruction = focus_instructions.get(focus_area, focus_instructions["overall"])
+    instruction = REWRITE_FOCUS_INSTRUCTIONS.get(focus_area, REWRITE_FOCUS_INSTRUCTIONS["overall"])
     
     return f"""Rewrite this section professionally to {instruction}. 
 
@@ -192,7 +198,7 @@ GUIDELINES:
 SECTION: {title}
 
 ORIGINAL TEXT:
-{text[:8000]}
+{truncate_tokens(text, token_budget("rewrite"))}
 
 REWRITTEN VERSION:"""
 
@@ -216,7 +222,7 @@ For each character (with exact name from text):
 IMPORTANT: Use ONLY names that actually appear in the text. Don't invent alternative names.
 
 TEXT:
-{text[:10000]}"""
+{truncate_tokens(text, token_budget("character_analysis"))}"""
 
 def p_scene_structure_analysis(text):
     """Analyze scene structure and dramatic development"""
@@ -235,7 +241,7 @@ For each element provide:
 - Example sentences for improvement
 
 TEXT:
-{text[:12000]}"""
+{truncate_tokens(text, token_budget("scene_structure"))}"""
 
 def p_emotional_depth_analysis(text):
     """Analyze emotional depth and impact"""
@@ -253,7 +259,7 @@ Improvement points:
 - Make dialogue more emotionally charged
 
 TEXT:
-{text[:10000]}"""
+{truncate_tokens(text, token_budget("emotional_depth"))}"""
 
 def p_prose_quality_analysis(text):
     """Analyze prose quality and style"""
@@ -272,36 +278,36 @@ For each aspect, provide:
 - Rewrite 2-3 weak sentences as demonstration
 
 TEXT:
-{text[:8000]}"""
+{truncate_tokens(text, token_budget("prose_quality"))}"""
 
 # ====== GENRE-SPECIFIC ANALYSIS ======
 
+GENRE_GUIDELINES = {
+    "fantasy": {
+        "elements": ["worldbuilding", "magic systems", "mythical creatures", "hero's journey"],
+        "tone": "epic and immersive",
+        "pacing": "alternating between action and character building"
+    },
+    "thriller": {
+        "elements": ["tension", "danger", "time pressure", "plot twists"],
+        "tone": "tense and urgent", 
+        "pacing": "fast with short, gripping sentences"
+    },
+    "romance": {
+        "elements": ["emotional connection", "sexual tension", "relationship dynamics"],
+        "tone": "emotional and intimate",
+        "pacing": "building romantic tension"
+    },
+    "mystery": {
+        "elements": ["clues", "red herrings", "deduction", "revelations"],
+        "tone": "intriguing and mysterious",
+        "pacing": "gradual revelation of information"
+    }
+}
+
 def p_genre_specific_analysis(text, genre="fantasy"):
     """Genre-specific analysis and suggestions"""
-    genre_guidelines = {
-        "fantasy": {
-            "elements": ["worldbuilding", "magic systems", "mythical creatures", "hero's journey"],
-            "tone": "epic and immersive",
-            "pacing": "alternating between action and character building"
-        },
-        "thriller": {
-            "elements": ["tension", "danger", "time pressure", "plot twists"],
-            "tone": "tense and urgent", 
-            "pacing": "fast with short, gripping sentences"
-        },
-        "romance": {
-            "elements": ["emotional connection", "sexual tension", "relationship dynamics"],
-            "tone": "emotional and intimate",
-            "pacing": "building romantic tension"
-        },
-        "mystery": {
-            "elements": ["clues", "red herrings", "deduction", "revelations"],
-            "tone": "intriguing and mysterious",
-            "pacing": "gradual revelation of information"
-        }
-    }
-    
-    guide = genre_guidelines.get(genre, genre_guidelines["fantasy"])
+    guide = GENRE_GUIDELINES.get(genre, GENRE_GUIDELINES["fantasy"])
     
     return f"""Analyze this text from a {genre.upper()} perspective:
 
@@ -322,4 +328,4 @@ IMPROVEMENT POINTS:
 - What should be added/removed?
 
 TEXT:
-{text[:10000]}"""
\ No newline at end of file
+{truncate_tokens(text, token_budget("genre_analysis"))}"""
\ No newline at end of file
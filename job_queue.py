@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Persistente job queue voor de API server
+Analyse jobs staan in SQLite (status, voortgang, rapport) en worden door een pool van worker
+threads afgewerkt; jobs die bij een herstart nog liepen gaan terug in de wachtrij
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+JOB_DB = os.getenv("ARC_JOB_DB", str(Path("outputs") / "jobs" / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("ARC_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = 1.0  # seconden; ook jobs van andere processen worden zo opgepikt
+
+# Velden die GET /jobs/{id} teruggeeft (secties en rapport zijn te groot)
+_STATUS_FIELDS = ("id", "status", "created", "started", "finished", "provider", "model",
+                  "total_sections", "progress", "error")
+
+class JobQueue:
+    """Jobs in SQLite: queued -> running -> completed/failed
+
+    Veilig te delen tussen threads; claim() is atomisch, dus meerdere workers (of processen
+    op hetzelfde bestand) pakken nooit dezelfde job.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._wakeup = threading.Event()
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit; claim() opent zelf een IMMEDIATE transactie
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                options TEXT NOT NULL,
+                sections TEXT NOT NULL,
+                total_sections INTEGER NOT NULL,
+                progress TEXT,
+                error TEXT,
+                report TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created)")
+            self._conn = conn
+        return self._conn
+
+    # ====== INDIENEN EN OPPAKKEN ======
+    def submit(self, sections, provider, model, options=None):
+        """Zet een analyse in de wachtrij en geef direct het job ID terug"""
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO jobs (id, status, created, provider, model, options, sections, total_sections, progress) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, time.time(), provider, model, json.dumps(options or {}),
+                 json.dumps(sections, ensure_ascii=False), len(sections), json.dumps({})))
+        self._wakeup.set()
+        return job_id
+
+    def claim(self):
+        """Zet de oudste wachtende job op running en geef hem terug (of None)"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT id, provider, model, options, sections FROM jobs "
+                                   "WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "provider": row[1], "model": row[2],
+                "options": json.loads(row[3]), "sections": json.loads(row[4])}
+
+    def wait(self, timeout=JOB_POLL_INTERVAL):
+        """Wacht tot er (misschien) nieuw werk is"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def requeue_interrupted(self):
+        """Jobs die liepen toen het proces stopte weer in de wachtrij zetten"""
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+        if cursor.rowcount:
+            self._wakeup.set()
+        return cursor.rowcount
+
+    # ====== STATUS ======
+    def _set(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._connection().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def set_progress(self, job_id, progress):
+        self._set(job_id, progress=json.dumps(progress, ensure_ascii=False))
+
+    def complete(self, job_id, report):
+        self._set(job_id, status="completed", finished=time.time(), error=None,
+                  report=json.dumps(report, ensure_ascii=False))
+
+    def fail(self, job_id, error):
+        self._set(job_id, status="failed", finished=time.time(), error=f"{type(error).__name__}: {error}"[:500])
+
+    def get(self, job_id):
+        """Status en voortgang van een job, of None"""
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(_STATUS_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_STATUS_FIELDS, row))
+        job["progress"] = json.loads(job["progress"] or "{}")
+        return job
+
+    def result(self, job_id):
+        """Het rapport van een afgeronde job, of None"""
+        with self._lock:
+            row = self._connection().execute("SELECT report FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# ====== WORKERS ======
+class JobWorkers:
+    """Pool van worker threads die jobs uit de queue halen
+
+    handler(job, set_progress) voert de job uit en geeft het rapport terug; een exception
+    markeert de job als failed. Bij stop() maken lopende jobs hun huidige stap niet af; die
+    komen bij de volgende start via requeue_interrupted() terug.
+    """
+
+    def __init__(self, jobs, handler, workers=None):
+        self.jobs = jobs
+        self.handler = handler
+        self.workers = JOB_WORKERS if workers is None else workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.jobs.requeue_interrupted()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"arc-job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.jobs._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.jobs.claim()
+            if job is None:
+                self.jobs.wait()
+                continue
+            try:
+                report = self.handler(job, lambda progress: self.jobs.set_progress(job["id"], progress))
+            except Exception as e:
+                self.jobs.fail(job["id"], e)
+            else:
+                self.jobs.complete(job["id"], report)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Process-wide LLM client registry voor Arc Crusade Manuscript Assistant
+Hergebruikt OpenAI clients en Ollama HTTP sessies over calls, threads en Streamlit sessies heen
+"""
+import asyncio
+import os
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+# ====== CONFIGURATIE ======
+# Alle waarden zijn via environment variables in te stellen en via configure() aan te passen
+POOL_SIZE = int(os.getenv("ARC_HTTP_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.getenv("ARC_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("ARC_READ_TIMEOUT", "600"))
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+_lock = threading.Lock()
+_openai_clients = {}
+_ollama_sessions = {}
+# Async clients zijn gebonden aan de event loop waarin ze gebruikt worden: per loop bijhouden
+_async_clients = weakref.WeakKeyDictionary()
+
+def configure(pool_size=None, connect_timeout=None, read_timeout=None, ollama_host=None):
+    """Pas pool size / timeouts aan. Bestaande clients worden gesloten zodat de nieuwe waarden gelden."""
+    global POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT, OLLAMA_HOST
+    if pool_size is not None:
+        POOL_SIZE = int(pool_size)
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = float(connect_timeout)
+    if read_timeout is not None:
+        READ_TIMEOUT = float(read_timeout)
+    if ollama_host is not None:
+        OLLAMA_HOST = ollama_host
+    close_all()
+
+def request_timeout():
+    """(connect, read) tuple voor requests calls"""
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# ====== OPENAI ======
+def _pooled_http_client(async_client=False):
+    """httpx client met een begrensde connection pool en keep-alive"""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    client_class = httpx.AsyncClient if async_client else httpx.Client
+    return client_class(
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
+
+def get_openai_client(api_key, organization=None, base_url=None):
+    """Geef de gedeelde OpenAI client voor (api_key, organization, base_url)
+
+    De client is thread-safe en wordt één keer per key aangemaakt, zodat alle calls
+    dezelfde connection pool (en dus dezelfde TLS sessies) hergebruiken.
+    """
+    key = (api_key, organization or None, base_url or None)
+    client = _openai_clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            from openai import OpenAI
+            # Retries regelt rate_limiter (backoff + Retry-After), niet de SDK
+            client_args = {'api_key': api_key, 'timeout': READ_TIMEOUT, 'max_retries': 0}
+            if organization:
+                client_args['organization'] = organization
+            if base_url:
+                client_args['base_url'] = base_url
+            http_client = _pooled_http_client()
+            if http_client is not None:
+                client_args['http_client'] = http_client
+            client = OpenAI(**client_args)
+            _openai_clients[key] = client
+    return client
+
+def get_async_openai_client(api_key, organization=None, base_url=None):
+    """Async variant van get_openai_client: één AsyncOpenAI client per key per event loop"""
+    from openai import AsyncOpenAI
+    key = ("openai", api_key, organization or None, base_url or None)
+    clients = _loop_clients()
+    client = clients.get(key)
+    if client is None:
+        # Retries regelt rate_limiter (backoff + Retry-After), niet de SDK
+        client_args = {'api_key': api_key, 'timeout': READ_TIMEOUT, 'max_retries': 0}
+        if organization:
+            client_args['organization'] = organization
+        if base_url:
+            client_args['base_url'] = base_url
+        http_client = _pooled_http_client(async_client=True)
+        if http_client is not None:
+            client_args['http_client'] = http_client
+        client = clients[key] = AsyncOpenAI(**client_args)
+    return client
+
+# ====== OLLAMA ======
+OLLAMA_DEFAULT_PORT = 11434
+
+def _normalize_host(host):
+    """Basis URL van de Ollama server
+
+    OLLAMA_HOST wordt vaak zoals Ollama zelf hem leest gezet: zonder schema ("0.0.0.0:11434",
+    "gpu-box"). Dan komt er http:// voor en zonder poort de standaard poort; het bind-adres
+    0.0.0.0 wordt localhost. Een volledige URL blijft zoals hij is.
+    """
+    host = (host or OLLAMA_HOST).strip().rstrip("/")
+    bare = "://" not in host
+    parts = urlsplit("http://" + host if bare else host)
+    hostname = parts.hostname or "localhost"
+    if hostname in ("0.0.0.0", "::"):
+        hostname = "localhost"
+    elif ":" in hostname:
+        hostname = f"[{hostname}]"
+    port = parts.port or (OLLAMA_DEFAULT_PORT if bare else None)
+    return f"{parts.scheme}://{hostname}" + (f":{port}" if port else "") + parts.path
+
+def get_ollama_session(host=None):
+    """Geef de gedeelde requests.Session (met connection pool) voor een Ollama host"""
+    host = _normalize_host(host)
+    session = _ollama_sessions.get(host)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _ollama_sessions.get(host)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _ollama_sessions[host] = session
+    return session
+
+def ollama_url(path, host=None):
+    """Volledige URL voor een Ollama API pad, bijv. ollama_url('/api/chat')"""
+    return _normalize_host(host) + "/" + path.lstrip("/")
+
+def get_async_ollama_client(host=None):
+    """Gedeelde httpx.AsyncClient (met connection pool) voor een Ollama host in de huidige event loop
+
+    Vereist httpx (wordt met de openai package meegeïnstalleerd).
+    """
+    key = ("ollama", _normalize_host(host))
+    clients = _loop_clients()
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = _pooled_http_client(async_client=True)
+    return client
+
+# ====== BEHEER ======
+def _loop_clients():
+    """Client cache voor de draaiende event loop (alleen vanuit die loop gebruikt, dus geen lock nodig)"""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+    return clients
+
+async def aclose_all():
+    """Sluit de async clients van de huidige event loop (bijv. bij FastAPI shutdown)"""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            # httpx.AsyncClient heeft aclose(), AsyncOpenAI een async close()
+            close = getattr(client, "aclose", None) or client.close
+            await close()
+        except Exception:
+            pass
+
+def close_all():
+    """Sluit en vergeet alle gedeelde clients (bijv. na configure() of in tests)"""
+    with _lock:
+        clients = list(_openai_clients.values())
+        sessions = list(_ollama_sessions.values())
+        _openai_clients.clear()
+        _ollama_sessions.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
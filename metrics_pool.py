@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Parallelle lokale metrics voor Arc Crusade Manuscript Assistant
+rough_metrics / enhanced_metrics zijn pure CPU (tokenisatie, tellen) en houden de GIL vast,
+dus threads helpen niet. Grote manuscripten worden in blokken secties over een herbruikbare
+process pool verdeeld; de resultaten komen terug in sectie volgorde. Kleine input blijft
+sequentieel, want dan kost het opstarten en versturen meer dan het rekenen.
+
+Het starten van de workers (elk importeert de analyse modules) duurt langer dan een quick-scan
+zelf. Daarom start de eerste grote aanvraag de pool op de achtergrond en meet zelf nog
+sequentieel; zodra de workers klaar zijn gaat het parallel.
+
+De teksten gaan niet per taak mee (pickle), maar staan één keer in een gedeelde buffer
+(shared_text); een taak is alleen de buffernaam plus byte offsets.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from shared_text import SharedManuscript, read_texts
+
+METRICS_WORKERS = int(os.getenv("ARC_METRICS_WORKERS", "0")) or os.cpu_count() or 1
+# Onder deze omvang (tekens, ~6 per woord) is sequentieel sneller dan de pool
+PARALLEL_MIN_CHARS = int(os.getenv("ARC_METRICS_PARALLEL_MIN_CHARS", "200000"))
+BATCHES_PER_WORKER = 4  # meerdere blokken per worker, zodat één lang hoofdstuk niet alles ophoudt
+
+_pool = None
+_pool_workers = 0
+_pool_ready = threading.Event()
+_pool_lock = threading.Lock()
+
+def _context():
+    # Geen fork: Streamlit en de API hebben threads, en een fork kopieert hun locks
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def get_pool(workers=None):
+    """De gedeelde process pool (wordt bij het eerste gebruik gestart en daarna hergebruikt)"""
+    global _pool, _pool_workers
+    workers = workers or METRICS_WORKERS
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool_ready.clear()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+            _pool_workers = workers
+        return _pool
+
+def warm_up(workers=None, block=False):
+    """Start de pool en laat elke worker de analyse modules importeren
+
+    Zonder block gebeurt dat op de achtergrond; parallel_metrics gebruikt de pool pas als hij klaar is.
+    """
+    workers = workers or METRICS_WORKERS
+    pool = get_pool(workers)
+    futures = [pool.submit(measure, []) for _ in range(workers)]
+
+    def ready():
+        done, _ = wait(futures)
+        if pool is _pool and all(f.exception() is None for f in done):
+            _pool_ready.set()
+
+    if block:
+        ready()
+    else:
+        threading.Thread(target=ready, name="arc-metrics-warmup", daemon=True).start()
+    return _pool_ready.is_set()
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        _pool_ready.clear()
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_pool)
+
+def measure(texts, enhanced=False):
+    """Metrics van een blok teksten (draait in de worker processen)"""
+    from cli_manuscript_assistant import enhanced_metrics, rough_metrics
+    return [enhanced_metrics(text) if enhanced else rough_metrics(text) for text in texts]
+
+def measure_shared(name, spans, enhanced=False):
+    """measure voor teksten uit de gedeelde buffer (draait in de worker processen)"""
+    return measure(read_texts(name, spans), enhanced)
+
+def _span_length(span):
+    return span[1] - span[0]
+
+def batches(items, count, size_of=len):
+    """Deel items op in hooguit count opeenvolgende blokken van ongeveer gelijke omvang"""
+    target = sum(map(size_of, items)) / max(1, count)
+    result, current, size = [], [], 0
+    for item in items:
+        current.append(item)
+        size += size_of(item)
+        if size >= target:
+            result.append(current)
+            current, size = [], 0
+    if current:
+        result.append(current)
+    return result
+
+def parallel_metrics(texts, enhanced=False, workers=None):
+    """rough_metrics / enhanced_metrics voor elke tekst, in dezelfde volgorde
+
+    Verdeelt over de process pool als er genoeg tekst is en meer dan één worker; anders (of als
+    de pool nog opstart of niet kan starten) sequentieel in dit proces.
+    """
+    texts = list(texts)
+    workers = workers or METRICS_WORKERS
+    if workers <= 1 or len(texts) < 2 or sum(map(len, texts)) < PARALLEL_MIN_CHARS:
+        return measure(texts, enhanced)
+    try:
+        if not (_pool_ready.is_set() and _pool_workers == workers):
+            if _pool is None or _pool_workers != workers:
+                warm_up(workers)
+            return measure(texts, enhanced)
+        pool = get_pool(workers)
+        with SharedManuscript(texts) as shared:
+            spans = batches(shared.spans, workers * BATCHES_PER_WORKER, _span_length)
+            parts = pool.map(measure_shared, repeat(shared.name), spans, repeat(enhanced))
+            return [metrics for part in parts for metrics in part]
+    except (BrokenProcessPool, OSError) as e:
+        print(f"⚠️ Metrics pool unavailable ({e}), measuring sequentially")
+        shutdown_pool()
+        return measure(texts, enhanced)
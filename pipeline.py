@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Analyse pipeline voor Arc Crusade Manuscript Assistant
+De stappen (outline, secties, top issues, plan, tijdlijn) zijn stages met afhankelijkheden;
+stages waarvan de afhankelijkheden klaar zijn draaien tegelijk. De CLI, beide Streamlit apps
+en de API zijn dunne adapters over run_analysis / arun_analysis.
+Elke run wordt gecheckpoint (run_store); resume_analysis gaat verder waar een run gestopt is.
+"""
+import asyncio
+import contextvars
+import queue
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cli_manuscript_assistant
+from call_metrics import track_run
+from run_store import CHECKPOINTS_ENABLED, RunStore, use_run_store
+from task_runner import default_concurrency, limit_calls
+from cli_manuscript_assistant import (
+    call_model, acall_model, stream_model, stream_text, build_outline, abuild_outline,
+    analyze_sections, analyze_sections_async, analyze_manuscript_batch, rubric_blobs_for,
+    extract_time_markers, p_top_issues, p_plan, p_timeline_feedback,
+)
+
+class PipelineError(Exception):
+    """De stages vormen geen geldige DAG (dubbele naam, onbekende afhankelijkheid of cykel)"""
+
+class Stage:
+    """Eén stap van de pipeline
+
+    run(results, emit) krijgt de resultaten van de eerdere stages ({naam: resultaat}) en een
+    emit(event) functie voor tussentijdse events. arun is de optionele async variant; zonder
+    arun draait run in een thread.
+    """
+
+    def __init__(self, name, run, deps=(), arun=None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.arun = arun
+
+# ====== SCHEDULER ======
+def topological_order(stages):
+    """Stages in een uitvoerbare volgorde; PipelineError als dat niet kan"""
+    names = [stage.name for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise PipelineError(f"Duplicate stages: {', '.join(duplicates)}")
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in names]
+        if unknown:
+            raise PipelineError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(unknown)}")
+    order, done, remaining = [], set(), list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.deps) <= done]
+        if not ready:
+            raise PipelineError("Cycle between stages: " + ", ".join(stage.name for stage in remaining))
+        order += ready
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in done]
+    return order
+
+def _skip_completed(stages, completed, emit):
+    """Resultaten van al afgeronde stages (bij hervatten); die krijgen een "resumed" stage event"""
+    results = {}
+    for stage in topological_order(stages):
+        if stage.name in (completed or {}):
+            results[stage.name] = completed[stage.name]
+            emit({"type": "stage", "stage": stage.name, "result": results[stage.name], "resumed": True})
+    return results
+
+def run_stages(stages, on_event=None, completed=None):
+    """Voer stages in threads uit zodra hun afhankelijkheden klaar zijn
+
+    Events van de stages en {"type": "stage", "stage": naam, "result": ...} na elke afgeronde
+    stage gaan naar on_event(event), altijd in de aanroepende thread (veilig voor Streamlit).
+    Stages in completed ({naam: resultaat}) worden niet opnieuw uitgevoerd.
+    De eerste fout annuleert de stages die nog niet gestart zijn en wordt opnieuw opgegooid.
+
+    Returns:
+        {stage naam: resultaat}
+    """
+    results = _skip_completed(stages, completed, on_event or (lambda event: None))
+    pending = {stage.name: stage for stage in topological_order(stages) if stage.name not in results}
+    running, events = {}, queue.Queue()
+
+    def deliver():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                return
+            if on_event:
+                on_event(event)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="arc-stage")
+    try:
+        while pending or running:
+            for name in [name for name, stage in pending.items() if all(dep in results for dep in stage.deps)]:
+                stage = pending.pop(name)
+                # Elke stage draait in een kopie van de context van de caller (o.a. de call_metrics run)
+                future = pool.submit(contextvars.copy_context().run, stage.run, dict(results), events.put)
+                running[future] = name
+            finished, _ = wait(running, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = future.result()
+                events.put({"type": "stage", "stage": name, "result": results[name]})
+            deliver()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+async def arun_stages(stages, on_event=None, completed=None):
+    """Async variant van run_stages; on_event wordt in de event loop aangeroepen"""
+    loop = asyncio.get_running_loop()
+
+    def emit(event):
+        if on_event:
+            on_event(event)
+
+    def emit_threadsafe(event):
+        # Stages zonder arun draaien in een thread; hun events gaan via de event loop
+        loop.call_soon_threadsafe(emit, event)
+
+    results = _skip_completed(stages, completed, emit)
+    tasks = {}
+
+    async def run(stage):
+        await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+        if stage.arun:
+            result = await stage.arun(dict(results), emit)
+        else:
+            result = await asyncio.to_thread(stage.run, dict(results), emit_threadsafe)
+        results[stage.name] = result
+        emit({"type": "stage", "stage": stage.name, "result": result})
+        return result
+
+    async def done(name):
+        return results[name]
+
+    for stage in topological_order(stages):
+        tasks[stage.name] = asyncio.ensure_future(done(stage.name) if stage.name in results else run(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return results
+
+# ====== ANALYSE STAGES ======
+def timeline_rows(sections):
+    """Tijdsaanduidingen per sectie als markdown lijst"""
+    rows = []
+    for sec in sections:
+        marks = extract_time_markers(sec["content"])
+        pretty = "; ".join([f"{k}:{v}" for (k, v) in marks]) if marks else "(geen)"
+        rows.append(f"* {sec['title']}: {pretty}")
+    return "\n".join(rows)
+
+def analysis_stages(sections, provider="ollama", model="llama3.1", rewrite=True, enhanced=False,
+                    genre="fantasy", rewrite_focus="overall", combined=False, batch=False, batch_poll=None,
+                    max_workers=None, stream=False):
+    """De stages van een volledige manuscript analyse
+
+    outline, sections en timeline_extract zijn onafhankelijk; issues wacht op de secties,
+    plan op outline + issues en timeline_feedback op timeline_extract.
+    Met stream=True leveren de rapport-onderdelen {"type": "text", "stage", "text"} events
+    met de tekst tot nu toe; met batch=True gaan outline en secties via de OpenAI Batch API.
+    Events: {"type": "progress", "done", "total", "label"} tijdens de sectie-analyse en
+    {"type": "section", "index", "total", "result"} per geanalyseerde sectie.
+    max_workers begrenst per stage; run_analysis begrenst daarnaast de calls van alle stages samen.
+    """
+    def generate(stage, kind, prompt, emit):
+        if not stream:
+            return call_model(prompt, provider, model, 0.2, kind=kind)
+        return stream_text(stream_model(prompt, provider, model, 0.2, kind=kind),
+                           on_update=lambda text: emit({"type": "text", "stage": stage, "text": text}))
+
+    def progress(emit):
+        return lambda done, total, label: emit({"type": "progress", "done": done, "total": total, "label": label})
+
+    def section_done(emit):
+        return lambda index, result: emit({"type": "section", "index": index, "total": len(sections), "result": result})
+
+    def run_sections(results, emit):
+        return analyze_sections(sections, provider, model, rewrite=rewrite, enhanced=enhanced, genre=genre,
+                                rewrite_focus=rewrite_focus, max_workers=max_workers, combined=combined,
+                                on_progress=progress(emit), on_section=section_done(emit))
+
+    async def arun_sections(results, emit):
+        return await analyze_sections_async(sections, provider, model, rewrite=rewrite, enhanced=enhanced,
+                                            genre=genre, rewrite_focus=rewrite_focus, max_workers=max_workers,
+                                            combined=combined, on_progress=progress(emit),
+                                            on_section=section_done(emit))
+
+    if batch:
+        def run_batch(results, emit):
+            def on_status(job):
+                counts = job.request_counts
+                emit({"type": "batch", "id": job.id, "status": job.status,
+                      "completed": counts.completed if counts else None, "total": counts.total if counts else None})
+            return analyze_manuscript_batch(sections, model, rewrite=rewrite, enhanced=enhanced, genre=genre,
+                                            rewrite_focus=rewrite_focus, combined=combined,
+                                            poll_interval=batch_poll, on_status=on_status)
+
+        stages = [
+            Stage("batch", run_batch),
+            Stage("outline", lambda results, emit: results["batch"][0], ["batch"]),
+            Stage("sections", lambda results, emit: results["batch"][1], ["batch"]),
+        ]
+    else:
+        stages = [
+            Stage("outline",
+                  lambda results, emit: build_outline(
+                      sections, provider, model, max_workers=max_workers,
+                      generate=lambda prompt: generate("outline", "outline", prompt, emit)),
+                  arun=lambda results, emit: abuild_outline(sections, provider, model, max_workers)),
+            Stage("sections", run_sections, arun=arun_sections),
+        ]
+
+    return stages + [
+        Stage("timeline_extract", lambda results, emit: timeline_rows(sections)),
+        Stage("issues",
+              lambda results, emit: generate("issues", "issues", p_top_issues(rubric_blobs_for(results["sections"])), emit),
+              ["sections"],
+              arun=lambda results, emit: acall_model(p_top_issues(rubric_blobs_for(results["sections"])),
+                                                     provider, model, 0.2, kind="issues")),
+        Stage("plan",
+              lambda results, emit: generate("plan", "plan", p_plan(results["outline"], results["issues"]), emit),
+              ["outline", "issues"],
+              arun=lambda results, emit: acall_model(p_plan(results["outline"], results["issues"]),
+                                                     provider, model, 0.2, kind="plan")),
+        Stage("timeline_feedback",
+              lambda results, emit: generate("timeline_feedback", "timeline",
+                                             p_timeline_feedback(results["timeline_extract"]), emit),
+              ["timeline_extract"],
+              arun=lambda results, emit: acall_model(p_timeline_feedback(results["timeline_extract"]),
+                                                     provider, model, 0.2, kind="timeline")),
+    ]
+
+def build_report(results, provider, model, started, run_metrics):
+    """Het rapport in de vorm die alle front ends opslaan en tonen"""
+    sections = results["sections"]
+    return {
+        "outline": results["outline"],
+        "issues": results["issues"],
+        "plan": results["plan"],
+        "timeline_extract": results["timeline_extract"],
+        "timeline_feedback": results["timeline_feedback"],
+        "sections": sections,
+        "analysis_info": {
+            "run_id": run_metrics.run_id,
+            "provider": provider,
+            "model": model,
+            "timestamp": time.strftime("%Y%m%d-%H%M%S"),
+            "total_sections": len(sections),
+            "reused_sections": sum(1 for r in sections if r.get("reused")),
+            "processing_time": time.time() - started,
+            "calls": run_metrics.summary(),
+        },
+    }
+
+# ====== RUNS EN CHECKPOINTS ======
+# Opties die het resultaat bepalen (en dus in het manifest van een run horen)
+RUN_OPTIONS = ("rewrite", "enhanced", "genre", "rewrite_focus", "combined", "batch", "batch_poll")
+
+def runs_dir():
+    return cli_manuscript_assistant.OUTPUT_DIR / "runs"
+
+def _checkpointed(store, on_event):
+    """on_event dat ook elke nieuw afgeronde stage in de run map bewaart"""
+    def handle(event):
+        if store is not None and event["type"] == "stage" and not event.get("resumed"):
+            store.save_stage(event["stage"], event["result"])
+        if on_event:
+            on_event(event)
+    return handle
+
+@contextmanager
+def _run_scope(store):
+    """Metrics onder het run ID, checkpoints in de run map en bij een fout de status in het manifest"""
+    with track_run(store.run_id if store else None) as run_metrics, use_run_store(store):
+        try:
+            yield run_metrics
+        except BaseException as e:
+            if store is not None:
+                store.fail(e)
+            raise
+
+def _new_store(sections, provider, model, options, run_id=None):
+    if not CHECKPOINTS_ENABLED:
+        return None
+    manifest_options = {name: options[name] for name in RUN_OPTIONS if name in options}
+    return RunStore.create(runs_dir(), sections, provider, model, manifest_options, run_id)
+
+def run_analysis(sections, provider="ollama", model="llama3.1", on_event=None, run_id=None, store=None, **options):
+    """Volledige analyse van de secties; options zie analysis_stages
+
+    Elke afgeronde stage en model call wordt bewaard in OUTPUT_DIR/runs/<run_id> (tenzij
+    ARC_CHECKPOINTS=0), zodat resume_analysis een afgebroken run kan afmaken.
+
+    Returns:
+        rapport dict (outline, issues, plan, timeline_extract, timeline_feedback, sections, analysis_info)
+    """
+    started = time.time()
+    store = store or _new_store(sections, provider, model, options, run_id)
+    completed = store.stage_results() if store else None
+    with _run_scope(store) as run_metrics, limit_calls(options.get("max_workers") or default_concurrency(provider)):
+        results = run_stages(analysis_stages(sections, provider, model, **options), _checkpointed(store, on_event),
+                             completed)
+    report = build_report(results, provider, model, started, run_metrics)
+    if store is not None:
+        store.finish(report)
+    return report
+
+async def arun_analysis(sections, provider="ollama", model="llama3.1", on_event=None, run_id=None, store=None,
+                        **options):
+    """Async variant van run_analysis (voor de FastAPI server); batch en stream worden niet ondersteund"""
+    started = time.time()
+    store = store or await asyncio.to_thread(_new_store, sections, provider, model, options, run_id)
+    completed = await asyncio.to_thread(store.stage_results) if store else None
+    with _run_scope(store) as run_metrics, limit_calls(options.get("max_workers") or default_concurrency(provider)):
+        results = await arun_stages(analysis_stages(sections, provider, model, **options),
+                                    _checkpointed(store, on_event), completed)
+    report = build_report(results, provider, model, started, run_metrics)
+    if store is not None:
+        await asyncio.to_thread(store.finish, report)
+    return report
+
+def _open_run(run_id):
+    """(store, manifest, bewaard rapport of None); zet een onafgemaakte run weer op running"""
+    store = RunStore.open(runs_dir(), run_id)
+    manifest = store.manifest
+    report = store.report() if manifest["status"] == "completed" else None
+    if report is None:
+        store.update(status="running", error=None)
+    return store, manifest, report
+
+def resume_analysis(run_id, on_event=None, **overrides):
+    """Maak een afgebroken run af; afgeronde stages en model calls worden niet opnieuw gedaan
+
+    overrides zijn opties die het resultaat niet veranderen (stream, max_workers).
+    Een run die al klaar is geeft direct het bewaarde rapport terug.
+    """
+    store, manifest, report = _open_run(run_id)
+    if report is not None:
+        return report
+    return run_analysis(manifest["sections"], manifest["provider"], manifest["model"], on_event, store=store,
+                        **{**manifest["options"], **overrides})
+
+async def aresume_analysis(run_id, on_event=None, **overrides):
+    """Async variant van resume_analysis"""
+    store, manifest, report = await asyncio.to_thread(_open_run, run_id)
+    if report is not None:
+        return report
+    return await arun_analysis(manifest["sections"], manifest["provider"], manifest["model"], on_event,
+                               store=store, **{**manifest["options"], **overrides})
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Process-wide rate limiter voor OpenAI calls
+Token buckets per model (requests/minuut en tokens/minuut), Retry-After en rate-limit headers,
+en retries met jittered exponential backoff
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+
+DEFAULT_RPM = float(os.getenv("ARC_OPENAI_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("ARC_OPENAI_TPM", "200000"))
+# Geschatte output tokens per call (OpenAI rekent die mee voor de TPM limiet)
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("ARC_EXPECTED_OUTPUT_TOKENS", "800"))
+MAX_RETRIES = int(os.getenv("ARC_MAX_RETRIES", "6"))
+BACKOFF_BASE = float(os.getenv("ARC_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("ARC_BACKOFF_MAX", "60"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def estimate_tokens(text):
+    """Ruwe token schatting (~4 tekens per token voor Engels/Nederlands proza)"""
+    return len(text) // 4 + 1
+
+def parse_duration(value):
+    """Parse OpenAI reset waarden ('1s', '6m0s', '20ms', '0.5') naar seconden"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, found = 0.0, False
+    for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value):
+        found = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if found else None
+
+class TokenBucket:
+    """Thread-safe token bucket die per minuut `per_minute` eenheden bijvult
+
+    reserve() trekt direct af (mag negatief worden) en geeft terug hoe lang de caller
+    moet wachten; zo kan dezelfde bucket zowel door threads als door asyncio gebruikt worden.
+    """
+
+    def __init__(self, per_minute):
+        self._lock = threading.Lock()
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    @property
+    def rate(self):
+        return self.capacity / 60.0
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_limit(self, per_minute):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.capacity = float(per_minute)
+            self.level = min(self.level, self.capacity)
+
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= min(float(amount), self.capacity)
+            wait = -self.level / self.rate if self.level < 0 else 0.0
+            return max(wait, self.blocked_until - now, 0.0)
+
+    def block(self, seconds):
+        """Houd alle callers tegen tot `seconds` vanaf nu (bijv. na een 429)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level = min(self.level, 0.0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+class RateLimiter:
+    """Laat calls per model toe via request- en token buckets en regelt retries"""
+
+    def __init__(self, rpm=None, tpm=None, max_retries=None, backoff_base=None, backoff_max=None):
+        self.rpm = DEFAULT_RPM if rpm is None else rpm
+        self.tpm = DEFAULT_TPM if tpm is None else tpm
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = BACKOFF_MAX if backoff_max is None else backoff_max
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def buckets(self, model):
+        """(requests bucket, tokens bucket) voor een model"""
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = (TokenBucket(self.rpm), TokenBucket(self.tpm))
+            return self._buckets[model]
+
+    def configure(self, model, rpm=None, tpm=None):
+        """Stel de limieten voor één model expliciet in"""
+        requests_bucket, tokens_bucket = self.buckets(model)
+        if rpm:
+            requests_bucket.set_limit(rpm)
+        if tpm:
+            tokens_bucket.set_limit(tpm)
+
+    # ====== TOELATING ======
+    def reserve(self, model, tokens):
+        """Reserveer één request + tokens; geeft de benodigde wachttijd in seconden"""
+        requests_bucket, tokens_bucket = self.buckets(model)
+        return max(requests_bucket.reserve(1), tokens_bucket.reserve(tokens + EXPECTED_OUTPUT_TOKENS))
+
+    def observe(self, model, headers):
+        """Verwerk rate-limit headers van een response (limieten bijwerken, pauzeren bij 0 remaining)"""
+        if not headers:
+            return
+        requests_bucket, tokens_bucket = self.buckets(model)
+        for bucket, kind in ((requests_bucket, "requests"), (tokens_bucket, "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            if limit:
+                try:
+                    if float(limit) > 0 and float(limit) != bucket.capacity:
+                        bucket.set_limit(float(limit))
+                except ValueError:
+                    pass
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and remaining.strip() == "0":
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    bucket.block(reset)
+
+    # ====== RETRIES ======
+    def backoff(self, attempt, retry_after=None):
+        """Jittered exponential backoff; een Retry-After van de server gaat altijd voor"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _after_failure(self, model, error, attempt):
+        """Bepaal of we opnieuw proberen; zo ja, geef de wachttijd terug"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        headers = error_headers(error)
+        retry_after = retry_after_seconds(headers)
+        delay = self.backoff(attempt, retry_after)
+        if getattr(error, "status_code", None) == 429:
+            # Het account zit aan zijn plafond: alle callers voor dit model even pauzeren
+            self.observe(model, headers)
+            self.buckets(model)[0].block(delay)
+        return delay
+
+    def run(self, request, model, tokens, info=None):
+        """Voer request() uit binnen de limieten, met retries
+
+        Als info een dict is worden 'queue_wait' (seconden in de wachtrij, incl. backoff)
+        en 'retries' daarin bijgehouden.
+        """
+        waited, attempt = 0.0, 0
+        while True:
+            wait = self.reserve(model, tokens)
+            if wait:
+                time.sleep(wait)
+            waited += wait
+            try:
+                result = request()
+                break
+            except Exception as e:
+                delay = self._after_failure(model, e, attempt)
+                if delay is None:
+                    _record(info, waited, attempt)
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                waited += delay
+        _record(info, waited, attempt)
+        return result
+
+    async def arun(self, request, model, tokens, info=None):
+        """Async variant van run(); request is een coroutine functie"""
+        waited, attempt = 0.0, 0
+        while True:
+            wait = self.reserve(model, tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            waited += wait
+            try:
+                result = await request()
+                break
+            except Exception as e:
+                delay = self._after_failure(model, e, attempt)
+                if delay is None:
+                    _record(info, waited, attempt)
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                waited += delay
+        _record(info, waited, attempt)
+        return result
+
+def _record(info, waited, attempt):
+    if info is not None:
+        info["queue_wait"] = round(info.get("queue_wait", 0.0) + waited, 3)
+        info["retries"] = info.get("retries", 0) + attempt
+
+# ====== FOUTEN ======
+def is_retryable(error):
+    """Rate limits, time-outs, verbindingsfouten en 5xx zijn tijdelijk"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    try:
+        import openai
+        return isinstance(error, (openai.APIConnectionError, openai.APITimeoutError))
+    except ImportError:
+        return False
+
+def error_headers(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+def retry_after_seconds(headers):
+    """Lees Retry-After (ms of seconden) of de rate-limit reset headers"""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    seconds = parse_duration(headers.get("retry-after"))
+    if seconds is not None:
+        return seconds
+    resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Content-addressed response cache voor LLM calls
+SQLite op schijf, met size-bounded LRU eviction, optionele TTL en hit/miss tellers
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_ENABLED = os.getenv("ARC_CACHE", "1").lower() not in ("0", "false", "no", "off")
+CACHE_MAX_MB = float(os.getenv("ARC_CACHE_MAX_MB", "256"))
+CACHE_TTL = float(os.getenv("ARC_CACHE_TTL", "0"))  # seconden, 0 = nooit verlopen
+
+class ResponseCache:
+    """Persistente key/value cache voor model responses
+
+    Keys zijn een sha256 van alles wat het antwoord bepaalt (provider, model, temperature,
+    system role, prompt en prompt-template versie). Veilig te delen tussen threads; meerdere
+    processen kunnen hetzelfde bestand gebruiken dankzij SQLite WAL mode.
+    """
+
+    def __init__(self, path, max_bytes=None, ttl=None, enabled=None):
+        self.path = Path(path)
+        self.max_bytes = int(CACHE_MAX_MB * 1024 * 1024) if max_bytes is None else int(max_bytes)
+        self.ttl = (CACHE_TTL if ttl is None else ttl) or None
+        self.enabled = CACHE_ENABLED if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # ====== KEYS ======
+    @staticmethod
+    def make_key(provider, model, temperature, system, prompt, version=""):
+        payload = json.dumps([provider, model, round(float(temperature), 4), system, prompt, version],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ====== OPSLAG ======
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """Geef de gecachte response of None (telt als hit/miss)"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        """Sla een response op en evict de minst recent gebruikte entries boven max_bytes"""
+        if not self.enabled or not value:
+            return
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                         (key, value, size, now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC").fetchall():
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ====== BEHEER ======
+    def stats(self):
+        """Hit/miss tellers (dit proces) en omvang van de cache op schijf"""
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Verwijder alle entries en reset de tellers"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+            self.hits = self.misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Hulpfuncties voor het tonen van analyse resultaten in de Streamlit apps
+Zoeken en pagineren van secties, zodat een manuscript met 80+ hoofdstukken niet in één
+keer gerenderd hoeft te worden, en de rijen voor de grafieken (één keer per run)
+"""
+import os
+
+SECTIONS_PER_PAGE = int(os.getenv("ARC_SECTIONS_PER_PAGE", "10"))
+
+def run_key(report_data):
+    """Vaste sleutel van een rapport voor caches en widget keys"""
+    info = report_data.get("analysis_info", {})
+    return info.get("run_id") or info.get("timestamp", "")
+
+def section_search_text(result):
+    """Alle doorzoekbare tekst van een sectie resultaat (titel, analyses, herschrijving)"""
+    parts = [result.get("title", ""), result.get("rubric", ""), result.get("rewrite", "")]
+    parts += [text for text in (result.get("advanced_analysis") or {}).values() if isinstance(text, str)]
+    return "\n".join(parts).casefold()
+
+def search_sections(search_texts, query):
+    """Indices van de secties die alle woorden van query bevatten (hoofdletterongevoelig)"""
+    words = query.casefold().split()
+    return [i for i, text in enumerate(search_texts) if all(word in text for word in words)]
+
+def page_of(indices, page, per_page=None):
+    """Eén pagina van indices
+
+    Returns:
+        (indices op deze pagina, pagina nummer (begrensd, vanaf 1), aantal pagina's)
+    """
+    per_page = per_page or SECTIONS_PER_PAGE
+    pages = max(1, -(-len(indices) // per_page))
+    page = min(max(1, page), pages)
+    return indices[(page - 1) * per_page:page * per_page], page, pages
+
+def section_rows(results, title_width=25):
+    """Per sectie titel (ingekort), woorden, zinnen en dialoog percentage voor grafieken"""
+    rows = []
+    for r in results:
+        metrics = r["metrics"]
+        title = r["title"][:title_width] + "..." if len(r["title"]) > title_width else r["title"]
+        rows.append({
+            "title": title,
+            "words": metrics.get("words", 0),
+            "sentences": metrics.get("sentences", 0),
+            "dialogue_pct": round(metrics.get("dialog_word_share", 0) * 100, 1),
+        })
+    return rows
+
+def character_overview(results):
+    """Personages over alle secties: totaal vermeldingen, aantal secties en emoties (set)"""
+    overview = {}
+    for r in results:
+        for char, data in (r.get("metrics", {}).get("characters") or {}).items():
+            entry = overview.setdefault(char, {"total_mentions": 0, "sections": 0, "sentences": 0, "emotions": set()})
+            entry["total_mentions"] += data["mentions"]
+            entry["sections"] += 1
+            entry["sentences"] += data.get("sentences", 0)
+            entry["emotions"].update(data["emotions"])
+    return overview
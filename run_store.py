@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Checkpoints van analyse runs voor Arc Crusade Manuscript Assistant
+Elke run krijgt een map (OUTPUT_DIR/runs/<run_id>) met het manifest (secties, provider, opties,
+status), het resultaat van elke afgeronde stage en het antwoord van elke afgeronde model call.
+Een afgebroken run kan zo hervat worden zonder voltooid werk over te doen.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+CHECKPOINTS_ENABLED = os.getenv("ARC_CHECKPOINTS", "1").lower() not in ("0", "false", "no", "off")
+
+class RunNotFound(Exception):
+    """Er is geen (leesbare) run met dit ID"""
+
+def new_run_id():
+    """Sorteerbaar en uniek: 20240101-120000-ab12cd"""
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+def _write_json(path, data):
+    """Atomisch schrijven: een onderbroken run laat nooit een half bestand achter"""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+class RunStore:
+    """De checkpoint map van één run
+
+    manifest.json   run_id, status (running/failed/completed), secties, provider, model, opties
+    stages/<n>.json resultaat van een afgeronde pipeline stage
+    calls.jsonl     {"key", "output"} per afgeronde model call (append-only)
+    report.json     het eindrapport zodra de run klaar is
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._calls = None
+
+    @property
+    def run_id(self):
+        return self.path.name
+
+    @classmethod
+    def create(cls, root, sections, provider, model, options, run_id=None):
+        store = cls(Path(root) / (run_id or new_run_id()))
+        (store.path / "stages").mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        _write_json(store.path / "manifest.json", {
+            "run_id": store.run_id, "status": "running", "created": now, "updated": now, "error": None,
+            "provider": provider, "model": model, "options": options, "sections": sections,
+        })
+        return store
+
+    @classmethod
+    def open(cls, root, run_id):
+        if not run_id or Path(run_id).name != run_id or run_id.startswith("."):
+            raise RunNotFound(f"Invalid run ID '{run_id}'")
+        store = cls(Path(root) / run_id)
+        try:
+            store.manifest
+        except (OSError, ValueError) as e:
+            raise RunNotFound(f"Run '{run_id}' not found in {root}") from e
+        return store
+
+    # ====== MANIFEST ======
+    @property
+    def manifest(self):
+        return json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+
+    def update(self, **fields):
+        with self._lock:
+            manifest = self.manifest
+            manifest.update(fields, updated=time.time())
+            _write_json(self.path / "manifest.json", manifest)
+
+    def finish(self, report):
+        _write_json(self.path / "report.json", report)
+        self.update(status="completed", error=None)
+
+    def fail(self, error):
+        self.update(status="failed", error=f"{type(error).__name__}: {error}"[:500])
+
+    def report(self):
+        """Het eindrapport, of None als de run nog niet klaar is"""
+        try:
+            return json.loads((self.path / "report.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    # ====== STAGES ======
+    def save_stage(self, name, result):
+        _write_json(self.path / "stages" / f"{name}.json", result)
+
+    def stage_results(self):
+        results = {}
+        for path in sorted((self.path / "stages").glob("*.json")):
+            try:
+                results[path.stem] = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+        return results
+
+    # ====== MODEL CALLS ======
+    @staticmethod
+    def key(provider, model, temperature, system, prompt, json_schema=None):
+        payload = json.dumps([provider, model, temperature, system, prompt, json_schema], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_calls(self):
+        calls = {}
+        try:
+            with (self.path / "calls.jsonl").open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Laatste regel van een afgebroken run kan half geschreven zijn
+                        continue
+                    calls[entry["key"]] = entry["output"]
+        except OSError:
+            pass
+        return calls
+
+    def get(self, key):
+        with self._lock:
+            if self._calls is None:
+                self._calls = self._load_calls()
+            return self._calls.get(key)
+
+    def put(self, key, output):
+        line = json.dumps({"key": key, "output": output}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._calls is None:
+                self._calls = self._load_calls()
+            self._calls[key] = output
+            with (self.path / "calls.jsonl").open("a", encoding="utf-8") as f:
+                f.write(line)
+
+def list_runs(root, status=None):
+    """Manifesten (zonder secties) van alle runs, nieuwste eerst; status filtert bijv. op 'failed'"""
+    runs = []
+    for path in Path(root).glob("*/manifest.json"):
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if status is None or manifest.get("status") in ([status] if isinstance(status, str) else status):
+            manifest["total_sections"] = len(manifest.pop("sections", []))
+            runs.append(manifest)
+    return sorted(runs, key=lambda m: m.get("created", 0), reverse=True)
+
+# Model calls binnen use_run_store() worden in die run gecheckpoint (ook in worker threads)
+_current_store = contextvars.ContextVar("arc_run_store", default=None)
+
+@contextmanager
+def use_run_store(store):
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
+
+def current_run_store():
+    return _current_store.get()
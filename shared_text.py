@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Gedeelde manuscript buffer voor de worker processen van metrics_pool
+De sectieteksten staan één keer als UTF-8 achter elkaar in multiprocessing.shared_memory.
+Een taak voor een worker bevat alleen de naam van de buffer en (start, end) byte offsets;
+de worker leest en decodeert zijn eigen stukken. Meer workers betekent dus geen extra kopieën
+van de tekst in elke taak.
+"""
+from multiprocessing import shared_memory
+
+class SharedManuscript:
+    """Teksten achter elkaar in één shared memory blok (gebruik als context manager)
+
+    spans[i] is het (start, end) byte bereik van texts[i]. Alleen het proces dat de buffer
+    maakt ruimt hem op (close); workers koppelen aan via read_texts.
+    """
+    def __init__(self, texts):
+        texts = list(texts)
+        # UTF-8 lengte zonder de hele tekst te coderen als hij ASCII is
+        sizes = [len(t) if t.isascii() else len(t.encode("utf-8")) for t in texts]
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, sum(sizes)))
+        self.name = self._shm.name
+        self.spans = []
+        buf, pos = self._shm.buf, 0
+        # Eén sectie tegelijk coderen, zodat er geen tweede kopie van het hele manuscript ontstaat
+        for text, size in zip(texts, sizes):
+            buf[pos:pos + size] = text.encode("utf-8")
+            self.spans.append((pos, pos + size))
+            pos += size
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ====== WORKER KANT ======
+# Per worker blijft alleen de laatst gebruikte buffer gekoppeld
+_attached = {}
+
+def _attach(name):
+    shm = _attached.get(name)
+    if shm is None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+def read_texts(name, spans):
+    """De teksten op de gegeven byte offsets uit de gedeelde buffer"""
+    buf = _attach(name).buf
+    return [str(buf[start:end], "utf-8") for start, end in spans]
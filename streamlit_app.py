@@ -9,6 +9,7 @@ import time
 from pathlib import Path
 import zipfile
 import io
+import tempfile
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -53,16 +54,12 @@ def check_password():
 
 # Import our existing functions
 from cli_manuscript_assistant import (
-    call_model, read_file, split_sections, rough_metrics, enhanced_metrics,
-    p_outline, p_rubric, p_short_rewrite, p_top_issues, p_plan,
-    p_timeline_feedback, extract_time_markers, OUTPUT_DIR, 
-    save_analysis_with_onedrive
-)
-# Import advanced analysis functions
-from enhanced_analysis import (
-    p_advanced_rewrite, p_character_voice_analysis, p_scene_structure_analysis,
-    p_emotional_depth_analysis, p_prose_quality_analysis, p_genre_specific_analysis
+    read_file, split_sections, OUTPUT_DIR,
+    save_analysis_with_onedrive, RESPONSE_CACHE, section_metrics
 )
+from pipeline import run_analysis, resume_analysis, runs_dir
+from run_store import RunNotFound, RunStore, list_runs
+from results_view import character_overview, page_of, run_key, search_sections, section_rows, section_search_text
 
 # Page config
 st.set_page_config(
@@ -107,6 +104,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ====== CACHED PARSING ======
+# Widget changes rerun the whole script; st.cache_data hashes the upload bytes, so only new
+# content is parsed and measured again. Bounded in entries and age to cap memory.
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def parse_upload(data, name):
+    """Sections of one uploaded file"""
+    return split_sections(read_file(data, name))
+
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def upload_stats(data, name):
+    """Section and word counts for the statistics panel"""
+    metrics = section_metrics(parse_upload(data, name))
+    return {"sections": len(metrics), "words": sum(m["words"] for m in metrics)}
+
+# ====== RESULTS ACROSS RERUNS ======
+# Every widget (also a download button) reruns the script. The finished report has to survive
+# that without a new analysis: session state only keeps the run ID, the report itself stays
+# in the run store (outputs/runs/<run_id>/report.json).
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_run_report(run_id):
+    """Report of a completed run (None if it is missing)"""
+    try:
+        return RunStore.open(runs_dir(), run_id).report()
+    except RunNotFound:
+        return None
+
+def remember_report(report_data):
+    """Make report_data the analysis shown on every rerun"""
+    run_id = report_data["analysis_info"].get("run_id")
+    if run_id and load_run_report(run_id) is not None:
+        st.session_state["active_run"] = {"run_id": run_id}
+    else:
+        # Checkpoints disabled (ARC_CHECKPOINTS=0): keep the report itself
+        st.session_state["active_run"] = {"report": report_data}
+
+def active_report():
+    active = st.session_state.get("active_run")
+    if not active:
+        return None
+    return active.get("report") or load_run_report(active["run_id"])
+
+def recent_analyses_picker(limit=20):
+    """Reopen a completed analysis without running it again"""
+    completed = list_runs(runs_dir(), status="completed")[:limit]
+    if not completed:
+        return
+    with st.expander(f"🕘 Recent analyses ({len(completed)})"):
+        runs = {f"{r['run_id']} – {r['provider']}/{r['model']}, {r['total_sections']} sections": r["run_id"]
+                for r in completed}
+        choice = st.selectbox("Analysis", list(runs))
+        if st.button("📂 Open analysis"):
+            st.session_state["active_run"] = {"run_id": runs[choice]}
+
 def main():
     # Check password first
     if not check_password():
@@ -149,6 +199,10 @@ def main():
         # Basic settings
         no_rewrite = st.checkbox("Skip rewrite suggestions", help="Skip rewrite suggestions for faster processing")
         enhanced_analysis = st.checkbox("🚀 Enhanced Analysis", value=True, help="Use in-depth analysis of characters, pacing and style")
+        combined_analysis = st.checkbox(
+            "⚡ Combined analysis (1 call per section)",
+            help="Request all section analyses in one structured response instead of a separate call per analysis (fewer tokens and calls)"
+        )
         
         # Genre selection for specific analysis  
         genre = st.selectbox(
@@ -167,6 +221,18 @@ def main():
         else:
             rewrite_focus = "overall"
         
+        # Response cache (identical prompts are answered from disk)
+        st.subheader("♻️ Response Cache")
+        if RESPONSE_CACHE.enabled:
+            cache_stats = RESPONSE_CACHE.stats()
+            st.caption(f"{cache_stats['entries']} cached responses ({cache_stats['bytes'] / 1024 / 1024:.1f} MB) · "
+                       f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
+            if st.button("🗑️ Clear cache"):
+                RESPONSE_CACHE.clear()
+                st.rerun()
+        else:
+            st.caption("Disabled (ARC_CACHE=0)")
+        
         # API Status check
         st.subheader("📡 API Status")
         if provider == "openai":
@@ -284,7 +350,7 @@ def main():
             # Show file info
             with st.expander("📋 File information"):
                 for file in uploaded_files:
-                    file_size = len(file.getvalue()) / 1024  # KB
+                    file_size = file.size / 1024  # KB
                     st.write(f"• **{file.name}** ({file_size:.1f} KB)")
                     
             # Show export preview if client info provided
@@ -310,22 +376,41 @@ def main():
                 
             result = process_manuscript(
                 uploaded_files, provider, model, no_rewrite, enhanced_analysis, 
-                genre, rewrite_focus, auto_save_setting, client_export_settings
+                genre, rewrite_focus, auto_save_setting, client_export_settings,
+                combined_analysis=combined_analysis
             )
             
-            # Process results
-            if result and result[0] is not None:
-                # Results are already displayed within process_manuscript
-                pass
-            else:
+            # Results are shown below from session state (also after the next rerun)
+            if not result or result[0] is None:
                 st.error("❌ Analysis failed")
+        
+        # Resume an interrupted run: completed stages and model calls are kept in outputs/runs
+        unfinished = list_runs(runs_dir(), status=("failed", "running"))
+        if unfinished:
+            with st.expander(f"♻️ Resume an interrupted analysis ({len(unfinished)})"):
+                runs = {f"{r['run_id']} – {r['provider']}/{r['model']}, {r['total_sections']} sections ({r['status']})": r
+                        for r in unfinished}
+                choice = st.selectbox("Run", list(runs))
+                if runs[choice].get("error"):
+                    st.caption(f"Stopped with: {runs[choice]['error']}")
+                if st.button("▶️ Resume analysis"):
+                    process_manuscript(None, provider, model, no_rewrite, resume_run_id=runs[choice]["run_id"])
+        recent_analyses_picker()
+
+        # The active analysis (just finished, reopened, or from before this rerun)
+        report_data = active_report()
+        if report_data:
+            display_results(report_data, report_data["sections"], report_data["analysis_info"]["timestamp"])
     
     with col2:
         st.subheader("📊 Statistics")
         if uploaded_files:
-            total_size = sum(len(f.getvalue()) for f in uploaded_files) / 1024
+            total_size = sum(f.size for f in uploaded_files) / 1024
+            stats = [upload_stats(f.getvalue(), f.name) for f in uploaded_files]
             st.metric("Total size", f"{total_size:.1f} KB")
             st.metric("Number of files", len(uploaded_files))
+            st.metric("Sections", sum(s["sections"] for s in stats))
+            st.metric("Words", f"{sum(s['words'] for s in stats):,}")
         
         st.subheader("🎯 Features")
         st.info("""
@@ -339,165 +424,97 @@ def main():
         • 📊 Detailed reports
         """)
 
-def process_manuscript(uploaded_files, provider, model, no_rewrite, enhanced_analysis=True, genre="fantasy", rewrite_focus="overall", auto_save_onedrive=False, client_export_settings=None):
-    """Process the uploaded manuscript files"""
+def process_manuscript(uploaded_files, provider, model, no_rewrite, enhanced_analysis=True, genre="fantasy", rewrite_focus="overall", auto_save_onedrive=False, client_export_settings=None, combined_analysis=False, resume_run_id=None):
+    """Process the uploaded manuscript files (or finish the interrupted run resume_run_id)"""
     
     # Progress tracking
     progress_bar = st.progress(0)
     status_text = st.empty()
+    live_preview = st.empty()  # Shows report text while the model is still generating it
+    headings = {"outline": "🗂️ Outline", "issues": "🎯 Top Issues", "plan": "📈 Improvement Plan",
+                "timeline_feedback": "🕒 Timeline Consistency"}
+    
+    def on_event(event):
+        """Pipeline events (always delivered in this script thread)"""
+        if event["type"] == "progress":
+            progress_bar.progress(int(20 + (event["done"] / event["total"]) * 50))
+            status_text.text(f"🔍 {event['label']} ({event['done']}/{event['total']} calls)")
+        elif event["type"] == "text":
+            live_preview.markdown(f"**{headings[event['stage']]}**\n\n{event['text']} ▌")
+        elif event["type"] == "stage" and event["stage"] == "sections":
+            status_text.text("🎯 Identifying top issues...")
+            progress_bar.progress(75)
+        elif event["type"] == "stage" and event["stage"] == "issues":
+            status_text.text("📈 Writing improvement plan...")
+            progress_bar.progress(85)
     
     try:
+        if resume_run_id:
+            status_text.text(f"♻️ Resuming run {resume_run_id}...")
+            progress_bar.progress(20)
+            report_data = resume_analysis(resume_run_id, on_event=on_event, stream=True)
+            return finish_analysis(report_data, progress_bar, status_text, live_preview, auto_save_onedrive,
+                                   client_export_settings, uploaded_files)
+        
         # Step 1: Read files
         status_text.text("📖 Reading files...")
         progress_bar.progress(10)
         
-        full_text = ""
         sections = []
         
         for file in uploaded_files:
-            # Simulate file writing and reading
-            temp_path = Path("temp_" + file.name)
-            temp_path.write_bytes(file.getvalue())
-            
-            try:
-                txt = read_file(temp_path)
-                full_text += f"\n\n=== FILE: {file.name} ===\n\n{txt}"
-                sections += split_sections(txt)
-            finally:
-                if temp_path.exists():
-                    temp_path.unlink()
+            # Straight from memory (and cached per content): no temporary file per upload
+            sections += parse_upload(file.getvalue(), file.name)
         
         if not sections:
             st.error("❌ No sections found. Make sure your chapters are clearly marked.")
             return
         
-        # Step 2: Generate outline
-        status_text.text("🗂️ Generating outline...")
+        # Step 2: Outline, section analyses and timeline run concurrently (see pipeline.py)
+        status_text.text(f"🔍 Analyzing {len(sections)} sections...")
         progress_bar.progress(20)
         
-        outline = call_model(p_outline(full_text), provider, model, 0.2)
-        
-        # Step 3: Analyze sections
-        status_text.text("🔍 Analyzing sections...")
-        results = []
-        rubric_blobs = []
-        
-        total_sections = len(sections)
-        for i, sec in enumerate(sections):
-            progress = 20 + (i / total_sections) * 50
-            progress_bar.progress(int(progress))
-            status_text.text(f"🔍 Analyzing: {sec['title']} ({i+1}/{total_sections})")
-            
-            # Basic metrics
-            if enhanced_analysis:
-                m = enhanced_metrics(sec["content"])
-            else:
-                m = rough_metrics(sec["content"])
-            
-            # Basic rubric
-            rub = call_model(p_rubric(sec["title"], sec["content"]), provider, model, 0.3)
-            rubric_blobs.append(f"--- {sec['title']} ---\n{rub[:4000]}")
-            
-            # Advanced analyses
-            advanced_analyses = {}
-            if enhanced_analysis:
-                status_text.text(f"🎭 Advanced analysis: {sec['title']} ({i+1}/{total_sections})")
-                
-                # Character analysis
-                if m.get("characters"):
-                    char_analysis = call_model(p_character_voice_analysis(sec["content"]), provider, model, 0.3)
-                    advanced_analyses["character_analysis"] = char_analysis
-                
-                # Scene structure
-                scene_analysis = call_model(p_scene_structure_analysis(sec["content"]), provider, model, 0.3)
-                advanced_analyses["scene_structure"] = scene_analysis
-                
-                # Emotional depth
-                emotion_analysis = call_model(p_emotional_depth_analysis(sec["content"]), provider, model, 0.3)
-                advanced_analyses["emotional_depth"] = emotion_analysis
-                
-                # Genre-specific analysis
-                genre_analysis = call_model(p_genre_specific_analysis(sec["content"], genre), provider, model, 0.3)
-                advanced_analyses["genre_analysis"] = genre_analysis
-            
-            # Rewrite suggestions
-            rewrite = ""
-            if not no_rewrite:
-                if enhanced_analysis:
-                    rewrite = call_model(p_advanced_rewrite(sec["title"], sec["content"], rewrite_focus), provider, model, 0.5)
-                else:
-                    rewrite = call_model(p_short_rewrite(sec["title"], sec["content"]), provider, model, 0.5)
-            
-            section_result = {
-                "title": sec["title"], 
-                "metrics": m, 
-                "rubric": rub, 
-                "rewrite": rewrite
-            }
-            
-            # Add advanced analyses if available
-            if enhanced_analysis and advanced_analyses:
-                section_result["advanced_analysis"] = advanced_analyses
-                
-            results.append(section_result)
-        
-        # Step 4: Top issues and plan
-        status_text.text("🎯 Identifying top issues...")
-        progress_bar.progress(75)
-        
-        top_issues = call_model(p_top_issues(rubric_blobs), provider, model, 0.2)
-        plan = call_model(p_plan(outline, top_issues), provider, model, 0.2)
-        
-        # Step 5: Timeline analysis
-        status_text.text("🕒 Analyzing timeline...")
-        progress_bar.progress(85)
-        
-        timeline_rows = []
-        for sec in sections:
-            marks = extract_time_markers(sec["content"])
-            pretty = "; ".join([f"{k}:{v}" for (k,v) in marks]) if marks else "(none)"
-            timeline_rows.append(f"* {sec['title']}: {pretty}")
-        
-        timeline_text = "\n".join(timeline_rows)
-        timeline_feedback = call_model(p_timeline_feedback(timeline_text), provider, model, 0.2)
-        
-        # Step 6: Save and show results
-        status_text.text("💾 Saving results...")
-        progress_bar.progress(95)
-        
-        ts = time.strftime("%Y%m%d-%H%M%S")
-        
-        # Save files
-        report_data = {
-            "outline": outline,
-            "issues": top_issues,
-            "plan": plan,
-            "timeline_extract": timeline_text,
-            "timeline_feedback": timeline_feedback,
-            "sections": results
-        }
-        
-        # Create output files
-        create_output_files(report_data, results, ts, auto_save_onedrive, client_export_settings, uploaded_files)
-        
-        # Step 7: Done!
-        progress_bar.progress(100)
-        status_text.text("✅ Analysis completed!")
-        time.sleep(0.5)
-        progress_bar.empty()
-        status_text.empty()
-        
-        # Show results
-        display_results(report_data, results, ts)
-        
-        return report_data, results, ts
+        report_data = run_analysis(
+            sections, provider, model, on_event=on_event, rewrite=not no_rewrite,
+            enhanced=enhanced_analysis, genre=genre, rewrite_focus=rewrite_focus,
+            combined=combined_analysis, stream=True
+        )
+        return finish_analysis(report_data, progress_bar, status_text, live_preview, auto_save_onedrive,
+                               client_export_settings, uploaded_files)
         
     except Exception as e:
         st.error(f"❌ Error during processing: {str(e)}")
+        st.info("♻️ Completed work was saved – resume it under \"Resume an interrupted analysis\"")
         progress_bar.progress(0)
         status_text.text("❌ Processing failed")
         return None, None, None
 
+def finish_analysis(report_data, progress_bar, status_text, live_preview, auto_save_onedrive=False,
+                    client_export_settings=None, uploaded_files=None):
+    """Save and show a finished report"""
+    results = report_data["sections"]
+    ts = report_data["analysis_info"]["timestamp"]
+    
+    # Step 3: Save and show results
+    status_text.text("💾 Saving results...")
+    progress_bar.progress(95)
+    
+    # Create output files
+    create_output_files(report_data, results, ts, auto_save_onedrive, client_export_settings, uploaded_files)
+    
+    # Step 4: Done!
+    progress_bar.progress(100)
+    status_text.text("✅ Analysis completed!")
+    time.sleep(0.5)
+    progress_bar.empty()
+    status_text.empty()
+    live_preview.empty()
+    
+    # Shown from session state by main(), on this and every following rerun
+    remember_report(report_data)
+    
+    return report_data, results, ts
+
 def create_output_files(report_data, results, ts, auto_save_onedrive=False, client_export_settings=None, uploaded_files=None):
     """Create output files and prepare downloads"""
     OUTPUT_DIR.mkdir(exist_ok=True)
@@ -517,7 +534,7 @@ def create_output_files(report_data, results, ts, auto_save_onedrive=False, clie
     
     for r in results:
         report_md += [
-            f"### {r['title']}",
+            f"### {r['title']}" + (" (unchanged – reused)" if r.get("reused") else ""),
             f"- Metrics: {json.dumps(r['metrics'], indent=2)}",
             "#### Rubric", r["rubric"]
         ]
@@ -564,26 +581,22 @@ def create_output_files(report_data, results, ts, auto_save_onedrive=False, clie
             if client_name and export_path:
                 # Setup custom export path
                 if onedrive.set_custom_export_path(export_path):
-                    # Get original file for client folder
-                    original_file = None
-                    if uploaded_files:
-                        # Create temporary file to represent the original
-                        original_filename = uploaded_files[0].name
-                        original_file = Path("temp_original_" + original_filename)
-                        original_file.write_bytes(uploaded_files[0].getvalue())
-                    
-                    success = onedrive.save_analysis_to_client_folder(
-                        client_name=client_name,
-                        analysis_data=report_data,
-                        report_content="\n\n".join(report_md),
-                        original_file=original_file,
-                        rewrite_files=rewrite_files,
-                        timestamp=ts
-                    )
-                    
-                    # Clean up temp file
-                    if original_file and original_file.exists():
-                        original_file.unlink()
+                    # The export copies the original from disk: write it to a private temp dir
+                    # (no collisions between sessions, and the copy keeps the upload's own name)
+                    with tempfile.TemporaryDirectory() as tmp_dir:
+                        original_file = None
+                        if uploaded_files:
+                            original_file = Path(tmp_dir) / Path(uploaded_files[0].name).name
+                            original_file.write_bytes(uploaded_files[0].getvalue())
+
+                        success = onedrive.save_analysis_to_client_folder(
+                            client_name=client_name,
+                            analysis_data=report_data,
+                            report_content="\n\n".join(report_md),
+                            original_file=original_file,
+                            rewrite_files=rewrite_files,
+                            timestamp=ts
+                        )
                     
                     if success:
                         st.success(f"🎯 Client export created for **{client_name}**")
@@ -626,8 +639,103 @@ def create_output_files(report_data, results, ts, auto_save_onedrive=False, clie
     except Exception as e:
         st.error(f"❌ Export error: {str(e)}")
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def results_view(run_key, _report_data):
+    """JSON download, chart data and search texts, built once per run instead of on every rerun"""
+    import pandas as pd
+    results = _report_data["sections"]
+    chart = pd.DataFrame([{"Section": row["title"], "Words": row["words"], "Dialogue %": row["dialogue_pct"]}
+                          for row in section_rows(results, title_width=20)])
+    return {
+        "json": json.dumps(_report_data, ensure_ascii=False, indent=2),
+        "chart": chart,
+        "search": [section_search_text(r) for r in results],
+    }
+
+def render_section(result):
+    """Metrics, analyses and rewrite of one section (only called for opened sections)"""
+    col1, col2 = st.columns([1, 1])
+
+    # Basic metrics
+    st.markdown("**📊 Basic Metrics:**")
+    metrics = result['metrics']
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Words", metrics.get('words', 0))
+        st.metric("Sentences", metrics.get('sentences', 0))
+    with col2:
+        st.metric("Dialogue %", f"{metrics.get('dialog_word_share', 0)*100:.1f}")
+        st.metric("Adverbs", metrics.get('adverb_count', 0))
+    with col3:
+        if 'readability_score' in metrics:
+            st.metric("Readability", f"{metrics['readability_score']:.1f}")
+        if 'engagement_score' in metrics:
+            st.metric("⚡ Engagement", f"{metrics['engagement_score']:.1f}")
+
+    # Show advanced metrics
+    if 'pacing' in metrics:
+        st.markdown("**🎭 Pacing & Style:**")
+        pacing = metrics['pacing']
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"• Pacing Score: {pacing.get('pacing_score', 0):.1f}/10")
+            st.write(f"• Action/Description: {pacing.get('action_description_ratio', 0):.2f}")
+        with col2:
+            st.write(f"• Show vs Tell: {metrics.get('show_vs_tell', {}).get('show_vs_tell_score', 0):.1f}/10")
+            st.write(f"• Style Issues: {len(metrics.get('style_issues', []))}")
+
+    # Show characters
+    if 'characters' in metrics and metrics['characters']:
+        st.markdown("**👥 Characters:**")
+        for char, data in metrics['characters'].items():
+            st.write(f"• **{char}**: {data['mentions']} mentions, {len(data['emotions'])} emotions")
+
+    if metrics.get('speakers'):
+        st.markdown("**🗣️ Dialogue:**")
+        for speaker, data in sorted(metrics['speakers'].items(), key=lambda x: x[1]['words'], reverse=True):
+            st.write(f"• **{speaker}**: {data['lines']} lines, {data['words']} words")
+
+    # Basic analysis
+    st.markdown("**🔍 Analysis:**")
+    with st.expander("View complete analysis"):
+        st.markdown(result['rubric'])
+
+    # Advanced analyses
+    if "advanced_analysis" in result:
+        adv = result["advanced_analysis"]
+
+        # Tabbed interface voor geavanceerde analyses
+        adv_tabs = st.tabs(["🎭 Karakter", "🏗️ Structuur", "❤️ Emotie", "📖 Genre"])
+
+        with adv_tabs[0]:
+            if "character_analysis" in adv:
+                st.markdown(adv["character_analysis"])
+
+        with adv_tabs[1]:
+            if "scene_structure" in adv:
+                st.markdown(adv["scene_structure"])
+
+        with adv_tabs[2]:
+            if "emotional_depth" in adv:
+                st.markdown(adv["emotional_depth"])
+
+        with adv_tabs[3]:
+            if "genre_analysis" in adv:
+                st.markdown(adv["genre_analysis"])
+
+    # Rewrite proposal
+    if result['rewrite']:
+        st.markdown("**✍️ Rewrite Proposal:**")
+        with st.expander("View complete rewrite"):
+            st.markdown(result['rewrite'])
+    else:
+        st.info("No rewrite proposal generated")
+
 def display_results(report_data, results, ts):
     """Display the analysis results in Streamlit"""
+    key = run_key(report_data)
+    view = results_view(key, report_data)
     
     st.success("🎉 **Analysis completed!**")
     
@@ -637,10 +745,9 @@ def display_results(report_data, results, ts):
     
     with col1:
         # JSON download
-        json_data = json.dumps(report_data, ensure_ascii=False, indent=2)
         st.download_button(
             "📊 JSON Results",
-            json_data,
+            view["json"],
             f"results-{ts}.json",
             "application/json"
         )
@@ -678,80 +785,23 @@ def display_results(report_data, results, ts):
     
     with tab2:
         st.subheader("📖 Section Analyses")
-        for i, result in enumerate(results):
-            with st.expander(f"📝 {result['title']}"):
-                col1, col2 = st.columns([1, 1])
-                
-                # Basic metrics
-                st.markdown("**📊 Basic Metrics:**")
-                metrics = result['metrics']
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Words", metrics.get('words', 0))
-                    st.metric("Sentences", metrics.get('sentences', 0))
-                with col2:
-                    st.metric("Dialogue %", f"{metrics.get('dialog_word_share', 0)*100:.1f}")
-                    st.metric("Adverbs", metrics.get('adverb_count', 0))
-                with col3:
-                    if 'readability_score' in metrics:
-                        st.metric("Readability", f"{metrics['readability_score']:.1f}")
-                    if 'engagement_score' in metrics:
-                        st.metric("⚡ Engagement", f"{metrics['engagement_score']:.1f}")
-                
-                # Show advanced metrics
-                if 'pacing' in metrics:
-                    st.markdown("**🎭 Pacing & Style:**")
-                    pacing = metrics['pacing']
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"• Pacing Score: {pacing.get('pacing_score', 0):.1f}/10")
-                        st.write(f"• Action/Description: {pacing.get('action_description_ratio', 0):.2f}")
-                    with col2:
-                        st.write(f"• Show vs Tell: {metrics.get('show_vs_tell', {}).get('show_vs_tell_score', 0):.1f}/10")
-                        st.write(f"• Style Issues: {len(metrics.get('style_issues', []))}")
-                
-                # Show characters
-                if 'characters' in metrics and metrics['characters']:
-                    st.markdown("**👥 Characters:**")
-                    for char, data in metrics['characters'].items():
-                        st.write(f"• **{char}**: {data['mentions']} mentions, {len(data['emotions'])} emotions")
-                
-                # Basic analysis
-                st.markdown("**🔍 Analysis:**")
-                with st.expander("View complete analysis"):
-                    st.markdown(result['rubric'])
-                
-                # Advanced analyses
-                if "advanced_analysis" in result:
-                    adv = result["advanced_analysis"]
-                    
-                    # Tabbed interface voor geavanceerde analyses
-                    adv_tabs = st.tabs(["🎭 Karakter", "🏗️ Structuur", "❤️ Emotie", "📖 Genre"])
-                    
-                    with adv_tabs[0]:
-                        if "character_analysis" in adv:
-                            st.markdown(adv["character_analysis"])
-                    
-                    with adv_tabs[1]:
-                        if "scene_structure" in adv:
-                            st.markdown(adv["scene_structure"])
-                    
-                    with adv_tabs[2]:
-                        if "emotional_depth" in adv:
-                            st.markdown(adv["emotional_depth"])
-                    
-                    with adv_tabs[3]:
-                        if "genre_analysis" in adv:
-                            st.markdown(adv["genre_analysis"])
-                
-                # Rewrite proposal
-                if result['rewrite']:
-                    st.markdown("**✍️ Rewrite Proposal:**")
-                    with st.expander("View complete rewrite"):
-                        st.markdown(result['rewrite'])
-                else:
-                    st.info("No rewrite proposal generated")
+        # Only the current page is listed and only opened sections are rendered in full
+        search = st.text_input("🔍 Search sections", placeholder="Title or analysis text...",
+                               key=f"section_search_{key}")
+        matches = search_sections(view["search"], search)
+        shown, page, pages = page_of(matches, 1)
+        if pages > 1:
+            # A new search starts on page 1 again (the widget key contains the query)
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                   key=f"section_page_{key}_{search}")
+            shown, page, pages = page_of(matches, page)
+        st.caption(f"{len(matches)} of {len(results)} sections" + (f" – page {page} of {pages}" if pages > 1 else ""))
+        for i in shown:
+            result = results[i]
+            label = f"📝 {result['title']} ({result['metrics'].get('words', 0):,} words)"
+            if st.toggle(label + (" ♻️ unchanged" if result.get("reused") else ""), key=f"section_open_{key}_{i}"):
+                with st.container(border=True):
+                    render_section(result)
     
     with tab3:
         st.subheader("🕒 Timeline Analysis")
@@ -767,7 +817,7 @@ def display_results(report_data, results, ts):
         # Overall stats
         total_words = sum(r['metrics'].get('words', 0) for r in results)
         total_sentences = sum(r['metrics'].get('sentences', 0) for r in results)
-        avg_dialogue = sum(r['metrics'].get('dialogue_pct', 0) for r in results) / len(results) if results else 0
+        avg_dialogue = view["chart"]["Dialogue %"].mean() if results else 0
         
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Total words", total_words)
@@ -777,32 +827,34 @@ def display_results(report_data, results, ts):
         
         # Per section chart
         if results:
-            import pandas as pd
-            chart_data = pd.DataFrame([
-                {
-                    'Section': r['title'][:20] + "..." if len(r['title']) > 20 else r['title'],
-                    'Words': r['metrics'].get('words', 0),
-                    'Dialogue %': r['metrics'].get('dialogue_pct', 0)
-                }
-                for r in results
-            ])
-            
             st.subheader("📈 Words per section")
-            st.bar_chart(chart_data.set_index('Section')['Words'])
+            st.bar_chart(view["chart"].set_index('Section')['Words'])
+        
+        # Model call statistics for this run (see call_metrics)
+        calls = report_data.get("analysis_info", {}).get("calls") or {}
+        if calls.get("calls"):
+            import pandas as pd
+            st.subheader("⏱️ Model calls")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Calls", calls["calls"])
+            col2.metric("Cache hits", calls["cache_hits"])
+            col3.metric("Tokens (in/out)", f"{calls['input_tokens']:,} / {calls['output_tokens']:,}")
+            col4.metric("Est. cost", f"${calls['cost_usd']:.4f}")
+            st.dataframe(pd.DataFrame.from_dict(calls["by_kind"], orient="index"))
     
     with tab5:
         st.subheader("🚀 Advanced Analysis Dashboard")
         
+        # Calculate averages (empty without enhanced analysis; also used by the recommendations)
+        readability_scores = [r['metrics'].get('readability_score', 0) for r in results if 'readability_score' in r['metrics']]
+        engagement_scores = [r['metrics'].get('engagement_score', 0) for r in results if 'engagement_score' in r['metrics']]
+        pacing_scores = [r['metrics'].get('pacing', {}).get('pacing_score', 0) for r in results if 'pacing' in r['metrics']]
+        show_tell_scores = [r['metrics'].get('show_vs_tell', {}).get('show_vs_tell_score', 0) for r in results if 'show_vs_tell' in r['metrics']]
+        
         # Overall manuscript scores
-        if results and any('readability_score' in r['metrics'] for r in results):
+        if readability_scores:
             st.subheader("📊 Overall Manuscript Scores")
             
-            # Calculate averages
-            readability_scores = [r['metrics'].get('readability_score', 0) for r in results if 'readability_score' in r['metrics']]
-            engagement_scores = [r['metrics'].get('engagement_score', 0) for r in results if 'engagement_score' in r['metrics']]
-            pacing_scores = [r['metrics'].get('pacing', {}).get('pacing_score', 0) for r in results if 'pacing' in r['metrics']]
-            show_tell_scores = [r['metrics'].get('show_vs_tell', {}).get('show_vs_tell_score', 0) for r in results if 'show_vs_tell' in r['metrics']]
-            
             col1, col2, col3, col4 = st.columns(4)
             if readability_scores:
                 col1.metric("🔤 Readability", f"{sum(readability_scores)/len(readability_scores):.1f}/100")
@@ -814,15 +866,7 @@ def display_results(report_data, results, ts):
                 col4.metric("👁️ Show vs Tell", f"{sum(show_tell_scores)/len(show_tell_scores):.1f}/10")
         
         # Character analysis overview
-        all_characters = {}
-        for result in results:
-            if 'characters' in result['metrics']:
-                for char, data in result['metrics']['characters'].items():
-                    if char not in all_characters:
-                        all_characters[char] = {'total_mentions': 0, 'sections': 0, 'emotions': set()}
-                    all_characters[char]['total_mentions'] += data['mentions']
-                    all_characters[char]['sections'] += 1
-                    all_characters[char]['emotions'].update(data['emotions'])
+        all_characters = character_overview(results)
         
         if all_characters:
             st.subheader("👥 Character Overview")
@@ -834,6 +878,7 @@ def display_results(report_data, results, ts):
                         st.write("**Mentions per section:**")
                         avg_per_section = data['total_mentions'] / data['sections']
                         st.write(f"Average: {avg_per_section:.1f} per section")
+                        st.write(f"In {data['sentences']} sentences")
                         
                     with col2:
                         st.write("**Emotions:**")
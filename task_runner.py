@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Bounded-concurrency task runner voor Arc Crusade Manuscript Assistant
+Voert onafhankelijke (LLM) calls parallel uit en levert resultaten in input volgorde
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Maximaal aantal gelijktijdige model calls
+DEFAULT_CONCURRENCY = int(os.getenv("ARC_MAX_CONCURRENCY", "8"))
+# Een lokale Ollama server verwerkt standaard maar een paar requests tegelijk
+OLLAMA_CONCURRENCY = int(os.getenv("ARC_OLLAMA_CONCURRENCY", "2"))
+
+def default_concurrency(provider=None):
+    """Standaard concurrency voor een provider"""
+    if provider == "ollama":
+        return OLLAMA_CONCURRENCY
+    return DEFAULT_CONCURRENCY
+
+def run_tasks(tasks, max_workers=None, on_done=None):
+    """Voer callables zonder argumenten parallel uit (begrensd door max_workers)
+
+    Args:
+        tasks: lijst met callables
+        max_workers: maximaal aantal gelijktijdige tasks (default DEFAULT_CONCURRENCY)
+        on_done: optionele callback on_done(index, result, done, total); wordt in de
+            aanroepende thread aangeroepen zodra een task klaar is (veilig voor Streamlit)
+
+    Returns:
+        Lijst met resultaten in dezelfde volgorde als tasks. De eerste exception
+        annuleert alle nog niet gestarte tasks en wordt opnieuw opgegooid.
+    """
+    tasks = list(tasks)
+    results = [None] * len(tasks)
+    if not tasks:
+        return results
+
+    workers = max(1, min(max_workers or DEFAULT_CONCURRENCY, len(tasks)))
+    if workers == 1:
+        for i, task in enumerate(tasks):
+            results[i] = task()
+            if on_done:
+                on_done(i, results[i], i + 1, len(tasks))
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arc-task") as pool:
+        # Elke task draait in een kopie van de context van de caller (o.a. de call_metrics run)
+        futures = {pool.submit(contextvars.copy_context().run, task): i for i, task in enumerate(tasks)}
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                results[i] = future.result()
+                if on_done:
+                    on_done(i, results[i], done, len(tasks))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+# ====== LIMIET PER RUN ======
+# Stages die tegelijk lopen (outline, secties, tijdlijn) hebben elk hun eigen pool; de limiet
+# van de run geldt voor de model calls van alle stages samen.
+_call_limit = contextvars.ContextVar("arc_call_limit", default=None)
+
+class CallLimit:
+    """Maximaal aantal gelijktijdige model calls (threads en asyncio tasks elk hun eigen semaphore)"""
+
+    def __init__(self, max_calls):
+        self.max_calls = max(1, int(max_calls))
+        self.threads = threading.BoundedSemaphore(self.max_calls)
+        self.tasks = asyncio.Semaphore(self.max_calls)
+
+@contextmanager
+def limit_calls(max_calls):
+    """Alle model calls binnen dit blok (ook in worker threads en tasks) delen max_calls plekken"""
+    token = _call_limit.set(CallLimit(max_calls))
+    try:
+        yield
+    finally:
+        _call_limit.reset(token)
+
+@contextmanager
+def call_slot():
+    """Houd een plek van de run limiet vast tijdens één model call (zonder limiet: direct door)"""
+    limit = _call_limit.get()
+    if limit is None:
+        yield
+        return
+    with limit.threads:
+        yield
+
+@asynccontextmanager
+async def acall_slot():
+    """Async variant van call_slot"""
+    limit = _call_limit.get()
+    if limit is None:
+        yield
+        return
+    async with limit.tasks:
+        yield
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test de async model calls (acall_model) en de FastAPI pipeline tegen een lokale nep-Ollama server
+"""
+import llm_clients
+
+def test_acall_model_ollama(fake_ollama):
+    """acall_model praat via de gedeelde async client met Ollama"""
+    import asyncio
+    from cli_manuscript_assistant import acall_model
+
+    async def run():
+        try:
+            return await asyncio.gather(*(acall_model(f"prompt {i}", "ollama", "llama3.1") for i in range(5)))
+        finally:
+            await llm_clients.aclose_all()
+
+    assert asyncio.run(run()) == [f"echo: prompt {i}" for i in range(5)]
+    assert len(fake_ollama.calls) == 5
+
+def test_acall_model_keeps_blocking_io_off_the_loop(fake_ollama, metrics_sink, monkeypatch):
+    """Response cache en metrics log draaien in een thread, niet in de event loop thread"""
+    import asyncio
+    import threading
+    import call_metrics
+    import cli_manuscript_assistant
+    from call_metrics import track_run
+
+    monkeypatch.setattr(cli_manuscript_assistant.RESPONSE_CACHE, "enabled", True)
+    threads = []
+    for obj, name in [(cli_manuscript_assistant.RESPONSE_CACHE, "get"), (cli_manuscript_assistant.RESPONSE_CACHE, "put"),
+                      (call_metrics, "record_call")]:
+        original = getattr(obj, name)
+        def spy(*args, _original=original, _name=name, **kwargs):
+            threads.append((_name, threading.current_thread()))
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(obj, name, spy)
+
+    async def run():
+        try:
+            with track_run() as run_metrics:
+                await cli_manuscript_assistant.acall_model("prompt", "ollama", "llama3.1", kind="outline")
+                await cli_manuscript_assistant.acall_model("prompt", "ollama", "llama3.1", kind="outline")
+            return run_metrics.summary()
+        finally:
+            await llm_clients.aclose_all()
+
+    summary = asyncio.run(run())
+    assert sorted({name for name, _ in threads}) == ["get", "put", "record_call"]
+    assert all(thread is not threading.main_thread() for _, thread in threads)
+    # de run metrics (contextvar) komen ook vanuit de thread binnen
+    assert summary["calls"] == 2 and summary["cache_hits"] == 1
+    assert len(fake_ollama.calls) == 1
+
+def test_api_analyze_and_health(fake_ollama, api_app):
+    """De /analyze endpoint draait de volledige async pipeline"""
+    from fastapi.testclient import TestClient
+    api = api_app
+
+    manuscript = "Chapter 1\nSarah ran through the rain.\n\nChapter 2\nTom waited at the door.\n"
+    with TestClient(api.app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        response = client.post(
+            "/analyze",
+            files={"file": ("book.txt", manuscript.encode(), "text/plain")},
+            data={"provider": "ollama", "model": "llama3.1", "rewrites": "true"},
+            headers={"x-arc-key": api.API_KEY},
+        )
+    assert response.status_code == 200
+    report = response.json()
+    assert [s["title"] for s in report["sections"]] == ["Chapter 1", "Chapter 2"]
+    assert report["sections"][0]["rubric"].startswith("echo: Section: Chapter 1")
+    assert report["outline"].startswith("echo: Create a 10")
+    # 2 samenvattingen + outline + 2x (rubric + rewrite) + issues + plan + timeline
+    assert len(fake_ollama.calls) == 10
+    calls = report["analysis_info"]["calls"]
+    assert calls["calls"] == 10
+    assert calls["by_kind"]["rubric"]["calls"] == calls["by_kind"]["rewrite"]["calls"] == 2
+
+def test_api_analyze_stream(fake_ollama, api_app):
+    """/analyze/stream levert outline, secties, issues, plan en tijdlijn als losse SSE events"""
+    import json
+    from fastapi.testclient import TestClient
+
+    manuscript = "Chapter 1\nSarah ran through the rain.\n\nChapter 2\nTom waited at the door.\n"
+    with TestClient(api_app.app) as client:
+        with client.stream("POST", "/analyze/stream",
+                           files={"file": ("book.txt", manuscript.encode(), "text/plain")},
+                           data={"provider": "ollama", "model": "llama3.1", "rewrites": "false"},
+                           headers={"x-arc-key": api_app.API_KEY}) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+
+    events = []
+    for message in body.strip().split("\n\n"):
+        name, data = message.split("\n")
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    names = [name for name, _ in events]
+    assert names[0] == "run" and names[-1] == "done"
+    assert events[-1][1]["run_id"] == events[0][1]["run_id"]
+    assert {"outline", "issues", "plan", "timeline_extract", "timeline_feedback"} <= set(names)
+    sections = [data for name, data in events if name == "section"]
+    assert sorted(data["index"] for data in sections) == [0, 1]
+    assert sections[0]["result"]["rubric"].startswith("echo: Section: Chapter")
+    # Issues pas na alle secties, plan na outline en issues
+    assert names.index("issues") > max(i for i, name in enumerate(names) if name == "section")
+    assert names.index("plan") > max(names.index("outline"), names.index("issues"))
+    assert "progress" in names
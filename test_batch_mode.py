@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test de offline batch mode (OpenAI Batch API) tegen een lokale nep-OpenAI server
+"""
+import json
+import sys
+
+import pytest
+
+import cli_manuscript_assistant
+from call_metrics import estimate_cost, track_run
+from cli_manuscript_assistant import analyze_manuscript_batch
+
+SECTIONS = [{"title": "Chapter 1", "content": "Sarah ran through the rain."},
+            {"title": "Chapter 2", "content": "Tom waited at the door."}]
+
+def test_batch_runs_summaries_and_sections_in_one_batch(fake_openai, tmp_path):
+    """Samenvatting + rubric + rewrite per sectie gaan in één JSONL batch; de resultaten landen bij de juiste sectie"""
+    statuses = []
+    outline, results = analyze_manuscript_batch(
+        SECTIONS, "gpt-4o-mini", rewrite=True, batch_path=tmp_path / "batch.jsonl",
+        poll_interval=0, on_status=lambda batch: statuses.append(batch.status))
+
+    lines = [json.loads(line) for line in (tmp_path / "batch.jsonl").read_text().splitlines()]
+    assert [line["custom_id"] for line in lines] == [
+        "summary-0", "summary-1", "section-0-rubric", "section-0-rewrite", "section-1-rubric", "section-1-rewrite"]
+    assert lines[0]["url"] == "/v1/chat/completions"
+    assert statuses == ["in_progress", "completed"]
+    assert outline.startswith("echo: Create a 10")
+    assert results[1]["rubric"].startswith("echo: Section: Chapter 2")
+    assert results[0]["rewrite"].startswith("echo: Rewrite this section")
+    # 6 batch requests + de outline als gewone call
+    assert len(fake_openai.calls) == 7
+
+def test_batch_failures_are_retried_directly(fake_openai, tmp_path):
+    """Requests die in de batch mislukken worden daarna als gewone call uitgevoerd"""
+    fake_openai.batch_failures = {"section-1-rubric"}
+    _, results = analyze_manuscript_batch(SECTIONS, "gpt-4o-mini", rewrite=False,
+                                          batch_path=tmp_path / "batch.jsonl", poll_interval=0)
+    assert results[1]["rubric"].startswith("echo: Section: Chapter 2")
+    # 3 geslaagde batch requests + 1 directe retry + outline
+    assert len(fake_openai.calls) == 5
+
+def test_batch_requests_are_recorded(fake_openai, metrics_sink, tmp_path):
+    """Elk batch request levert een call record met de usage uit de batch en de halve prijs"""
+    fake_openai.batch_failures = {"section-1-rubric"}
+    with track_run() as run:
+        analyze_manuscript_batch(SECTIONS, "gpt-4o-mini", rewrite=False,
+                                 batch_path=tmp_path / "batch.jsonl", poll_interval=0)
+
+    records = [json.loads(line) for line in metrics_sink.path.read_text().splitlines()]
+    batch = [r for r in records if r["cost_usd"] == pytest.approx(estimate_cost("gpt-4o-mini", 10, 5) / 2)]
+    assert sorted(r["kind"] for r in batch) == ["rubric", "summary", "summary"]
+    assert all(r["input_tokens"] == 10 and r["output_tokens"] == 5 for r in batch)
+    assert [r["kind"] for r in records if r["error"]] == ["rubric"]
+    summary = run.summary()
+    # 3 geslaagde + 1 mislukt batch request, de directe retry en de outline
+    assert summary["calls"] == 6 and summary["errors"] == 1
+    assert summary["by_kind"]["summary"]["calls"] == 2 and summary["by_kind"]["outline"]["calls"] == 1
+
+def test_cli_batch_runs_reduce_steps(fake_openai, tmp_path, monkeypatch):
+    """--batch: na de batch volgen issues, plan en timeline als gewone calls"""
+    manuscript = tmp_path / "book.txt"
+    manuscript.write_text("Chapter 1\nSarah ran.\n\nChapter 2\nTom waited.\n", encoding="utf-8")
+    monkeypatch.setattr(cli_manuscript_assistant, "OUTPUT_DIR", tmp_path / "outputs")
+    (tmp_path / "outputs").mkdir()
+    monkeypatch.setattr(cli_manuscript_assistant, "HAS_ONEDRIVE", False)
+    monkeypatch.setattr(sys, "argv", ["cli", str(manuscript), "--provider", "openai", "--model", "gpt-4o-mini",
+                                      "--batch", "--batch-poll", "0", "--no-rewrite"])
+    cli_manuscript_assistant.main()
+
+    assert len(fake_openai.batches) == 1
+    # 2 samenvattingen + 2 rubrics in de batch, daarna outline + issues + plan + timeline
+    assert len(fake_openai.calls) == 8
+    report = json.loads(next((tmp_path / "outputs").glob("results-*.json")).read_text(encoding="utf-8"))
+    assert report["outline"].startswith("echo: Create a 10")
+    assert report["issues"].startswith("echo: Summarize the 10")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test de per-call instrumentatie (call_metrics) van call_model en de sectie-analyse
+"""
+import json
+
+import pytest
+
+import cli_manuscript_assistant
+from call_metrics import CallAggregator, estimate_cost, track_run
+from cli_manuscript_assistant import analyze_sections, call_model
+from response_cache import ResponseCache
+
+def test_estimate_cost_uses_longest_prefix():
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert estimate_cost("gpt-4o", 0, 1_000_000) == pytest.approx(10.0)
+    assert estimate_cost("llama3.1", 1000, 1000) == 0.0
+
+def test_call_records_kind_cache_hit_and_jsonl(fake_ollama, metrics_sink, tmp_path, monkeypatch):
+    """Elke call_model levert een record; een cache hit wordt als zodanig gemarkeerd"""
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", ResponseCache(tmp_path / "cache.sqlite3"))
+    with track_run() as run:
+        call_model("Same prompt", "ollama", "llama3.1", kind="outline")
+        call_model("Same prompt", "ollama", "llama3.1", kind="outline")
+
+    records = [json.loads(line) for line in metrics_sink.path.read_text().splitlines()]
+    assert [r["cache_hit"] for r in records] == [False, True]
+    assert {r["kind"] for r in records} == {"outline"}
+    assert all(r["run_id"] == run.run_id and r["input_tokens"] > 0 for r in records)
+    summary = run.summary()
+    assert summary["calls"] == 2 and summary["cache_hits"] == 1
+    assert len(fake_ollama.calls) == 1
+
+def test_run_summary_covers_worker_threads(fake_openai):
+    """Calls in de worker threads van run_tasks tellen mee in de run, inclusief usage, retries en kosten"""
+    fake_openai.failures = [(429, {"retry-after-ms": "10"})]
+    sections = [{"title": "Chapter 1", "content": "Sarah ran."}, {"title": "Chapter 2", "content": "Tom waited."}]
+    with track_run() as run:
+        analyze_sections(sections, "openai", "gpt-4o-mini", rewrite=True, max_workers=4)
+
+    summary = run.summary()
+    assert summary["calls"] == 4
+    assert summary["by_kind"]["rubric"]["calls"] == summary["by_kind"]["rewrite"]["calls"] == 2
+    # Usage van de (nep) API: 10 input en 5 output tokens per call
+    assert summary["input_tokens"] == 40 and summary["output_tokens"] == 20
+    assert summary["retries"] == 1 and summary["queue_wait"] > 0
+    assert summary["cost_usd"] == pytest.approx(estimate_cost("gpt-4o-mini", 40, 20))
+
+def test_aggregator_counts_errors():
+    aggregator = CallAggregator()
+    record = {"kind": "plan", "cache_hit": False, "error": "boom", "input_tokens": 1, "output_tokens": 0,
+              "wall_time": 0.5, "queue_wait": 0.0, "retries": 0, "cost_usd": 0.0}
+    aggregator.add(record)
+    assert aggregator.summary()["errors"] == aggregator.summary()["by_kind"]["plan"]["errors"] == 1
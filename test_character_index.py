@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test de karakter index (vermeldingen, zin ID's, emoties) en het hergebruik door p_rubric en de UI
+"""
+import re
+import time
+
+from benchmark_metrics import legacy_character_development
+from character_index import character_index
+from cli_manuscript_assistant import likely_character_names, p_rubric
+from enhanced_analysis import analyze_character_development
+from results_view import character_overview
+
+TEXT = ("Lady Sera was afraid. Eldrin laughed, happy! Nobody spoke? Eldrin and lady sera were nervous. "
+        "Later Eldrin left")
+
+def test_index_returns_positions_sentences_and_emotions():
+    index = character_index(TEXT, ["Lady Sera", "Eldrin"])
+    assert index["Lady Sera"] == {"positions": [0, 11], "sentence_ids": [0, 3], "emotions": ["afraid", "nervous"]}
+    # de laatste vermelding staat na het laatste leesteken en telt niet als zin
+    assert index["Eldrin"]["positions"] == [4, 9, 16]
+    assert index["Eldrin"]["sentence_ids"] == [1, 3]
+    assert index["Eldrin"]["emotions"] == ["happy", "nervous"]
+    assert character_index(TEXT, []) == {}
+
+def test_character_development_scales_with_many_names():
+    names = [f"K{a}{b}n" for a in "aeiou" for b in "bcdfghjklmnpqrstvwxz"]
+    text = " ".join(f"{name} was calm, nobody minded." for name in names * 20)
+    start = time.perf_counter()
+    result = analyze_character_development(text)
+    assert time.perf_counter() - start < 2
+    assert len(result) == 100
+    assert result["Kabn"] == {"mentions": 20, "emotions": ["calm"] * 20, "sentences": 20}
+
+    small = " ".join(f"{name} was calm, nobody minded." for name in names * 2)
+    assert analyze_character_development(small) == legacy_character_development(small)
+
+def test_rubric_names_match_old_extraction():
+    def legacy(text):
+        counts = {}
+        stopwords = {'Het', 'De', 'Een', 'Maar', 'En', 'Of', 'Dan', 'Dus', 'Want', 'Omdat', 'Toen', 'Als', 'Dat',
+                     'Dit', 'Die', 'Deze', 'Wel', 'Niet', 'Ook', 'Nog'}
+        for word in re.findall(r'\b[A-Z][a-z]{2,}\b', text):
+            if word not in stopwords:
+                counts[word] = counts.get(word, 0) + 1
+        return [name for name, count in counts.items() if count >= 2]
+
+    text = "Het Mara zag Eldrin. Eldrin's zwaard, Mara_x, MARA, Mara2 en Mara! Toen Toen Thorne. Über Über"
+    assert likely_character_names(text) == legacy(text) == ["Mara", "Eldrin"]
+    assert "CHARACTER NAMES IN THIS TEXT: Mara, Eldrin" in p_rubric("Ch 1", text)
+
+def test_overview_merges_sections():
+    results = [{"metrics": {"characters": {"Mara": {"mentions": 3, "emotions": ["sad"], "sentences": 2}}}},
+               {"metrics": {"characters": {"Mara": {"mentions": 1, "emotions": ["sad", "calm"], "sentences": 1},
+                                           "Eldrin": {"mentions": 2, "emotions": [], "sentences": 2}}}},
+               {"metrics": {}}]
+    overview = character_overview(results)
+    assert overview["Mara"] == {"total_mentions": 4, "sections": 2, "sentences": 3, "emotions": {"sad", "calm"}}
+    assert overview["Eldrin"]["sections"] == 1
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test token-aware chunking en de map-reduce analyse van te lange secties
+"""
+import chunking
+import cli_manuscript_assistant
+from chunking import count_tokens, split_into_chunks
+from cli_manuscript_assistant import analyze_sections
+
+def scene(n, sentences=12):
+    return "\n\n".join(" ".join(f"Scene {n} paragraph {p} sentence {s} moves on." for s in range(sentences))
+                       for p in range(3))
+
+def test_split_keeps_text_and_budget():
+    """Chunks blijven binnen het budget en vormen samen weer exact de oorspronkelijke tekst"""
+    text = "\n\n* * *\n\n".join(scene(n) for n in range(6))
+    chunks = split_into_chunks(text, 400)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(count_tokens(chunk) <= 400 for chunk in chunks)
+
+def test_split_prefers_scene_and_paragraph_boundaries():
+    """Past een scène in het budget, dan wordt hij niet doorgesneden"""
+    scenes = [scene(n, sentences=5) for n in range(4)]
+    text = "\n\n***\n\n".join(scenes)
+    budget = max(count_tokens(s) for s in scenes) + 10
+    chunks = split_into_chunks(text, budget)
+    for chunk in chunks:
+        stripped = chunk.replace("***", "").strip()
+        assert stripped.endswith("moves on.")
+        assert stripped.startswith("Scene")
+
+def test_short_text_is_one_chunk():
+    assert split_into_chunks("Short text.", 100) == ["Short text."]
+
+def test_long_section_is_mapped_and_reduced(monkeypatch):
+    """Te lange sectie: chunks parallel analyseren, rubric mergen, rewrites aan elkaar plakken"""
+    monkeypatch.setattr(chunking, "CHUNK_TOKENS", 300)
+    prompts = []
+
+    def fake_call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=None,
+                        json_schema=None, kind=None):
+        prompts.append(prompt)
+        if "consecutive parts" in prompt:
+            return "merged rubric"
+        return f"{kind} for {prompt.split('(part ')[1].split(')')[0]}" if "(part " in prompt else f"{kind} whole"
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_call_model)
+
+    text = "\n\n".join(scene(n) for n in range(4))
+    sections = [{"title": "Chapter 1", "content": text}, {"title": "Chapter 2", "content": "Tom waited."}]
+    labels = []
+    results = analyze_sections(sections, rewrite=True, max_workers=4,
+                               on_progress=lambda done, total, label: labels.append((done, total, label)))
+
+    parts = len(split_into_chunks(text, 300))
+    assert parts > 1
+    assert results[0]["rubric"] == "merged rubric"
+    assert results[0]["rewrite"] == "\n\n".join(f"rewrite for {k}/{parts}" for k in range(1, parts + 1))
+    assert results[1]["rubric"] == "rubric whole"
+    # 2 * parts chunk calls + 2 calls voor de korte sectie + 1 merge
+    assert len(prompts) == 2 * parts + 3
+    assert labels[-1][0] == labels[-1][1] == len(prompts)
+    # De hele sectie is gezien: elke scène zit in een van de prompts
+    assert all(any(f"Scene {n} paragraph 2" in p for p in prompts) for n in range(4))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test de combined analysis mode (één JSON-schema call per sectie)
+"""
+import json
+
+import cli_manuscript_assistant
+from cli_manuscript_assistant import analyze_sections, parse_combined_analysis
+
+SECTIONS = [{"title": "Chapter 1", "content": "Sarah ran. Sarah was afraid. Tom shouted at Tom."},
+            {"title": "Chapter 2", "content": "The storm broke over the hills."}]
+
+def test_parse_combined_analysis():
+    """Code fences en tekst rond het JSON object worden genegeerd, ontbrekende velden niet"""
+    fields = ["rubric", "rewrite"]
+    assert parse_combined_analysis('```json\n{"rubric": " A ", "rewrite": "B"}\n```', fields) == {"rubric": "A", "rewrite": "B"}
+    assert parse_combined_analysis('Here you go: {"rubric": "A", "rewrite": ["x"]} done', fields)["rewrite"].startswith("[")
+    assert parse_combined_analysis('{"rubric": "A"}', fields) is None
+    assert parse_combined_analysis("no json here", fields) is None
+
+def test_combined_openai_one_call_per_section(fake_openai):
+    """Met combined gaat er per sectie één call met response_format uit, terug in het bekende dict"""
+    results = analyze_sections(SECTIONS, "openai", "gpt-4o-mini", rewrite=True, enhanced=True, combined=True)
+
+    assert len(fake_openai.calls) == 2
+    schema = fake_openai.calls[0]["response_format"]["json_schema"]
+    assert schema["strict"] is True and schema["schema"]["additionalProperties"] is False
+    assert results[0]["rubric"] == "echo: rubric"
+    assert results[0]["rewrite"] == "echo: rewrite"
+    assert results[0]["advanced_analysis"] == {
+        "character_analysis": "echo: character_analysis", "scene_structure": "echo: scene_structure",
+        "emotional_depth": "echo: emotional_depth", "genre_analysis": "echo: genre_analysis"}
+    assert "character_analysis" not in results[1]["advanced_analysis"]
+
+def test_combined_falls_back_to_separate_calls(monkeypatch):
+    """Een sectie met een onbruikbaar antwoord krijgt alsnog de losse calls"""
+    calls = []
+
+    def fake_call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=None, json_schema=None, kind=None):
+        calls.append(json_schema is not None)
+        if json_schema is None:
+            return "separate"
+        if prompt.startswith("Section: Chapter 2"):
+            return "Sorry, I cannot produce JSON."
+        return json.dumps({field: "combined" for field in json_schema["required"]})
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_call_model)
+
+    results = analyze_sections(SECTIONS, rewrite=True, combined=True, max_workers=2)
+    assert results[0]["rubric"] == results[0]["rewrite"] == "combined"
+    assert results[1]["rubric"] == results[1]["rewrite"] == "separate"
+    assert calls.count(True) == 2 and calls.count(False) == 2
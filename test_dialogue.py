@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test de dialoog scanner: rechte en gekrulde aanhalingstekens, apostrofs, alinea grenzen en sprekers
+"""
+import time
+
+from cli_manuscript_assistant import enhanced_metrics, rough_metrics
+from dialogue import dialogue_by_speaker, dialogue_spans, speaker_stats
+from enhanced_analysis import analyze_pacing
+
+def quotes(text):
+    return [text[start:end] for start, end in dialogue_spans(text)]
+
+def test_straight_and_curly_quotes():
+    text = "\"Run,\" he said. “Now!” ‘Go,’ she said. „Snel,” riep Mara. «Allez», 'Stop.'"
+    assert quotes(text) == ["\"Run,\"", "“Now!”", "‘Go,’", "„Snel,”", "«Allez»", "'Stop.'"]
+
+def test_apostrophes_do_not_open_dialogue():
+    text = "Don't go. The boys' swords. 'Tis true, “Go,” she said. It's Eldrin’s turn, 'ya know? 'Yes,' he said."
+    assert quotes(text) == ["“Go,”", "'Yes,'"]
+    # enkele binnen dubbele aanhalingstekens horen bij de dialoog
+    assert quotes("\"Don't touch the boys' 'toys',\" said Mara.") == ["\"Don't touch the boys' 'toys',\""]
+
+def test_unclosed_quote_stops_at_paragraph():
+    text = "“This speech runs on\n\n“and continues here.”\n\nNarration with a stray ' and 'no close."
+    assert quotes(text) == ["“This speech runs on", "“and continues here.”"]
+
+def test_scanner_is_linear_on_unbalanced_input():
+    for text in ["'a " * 50000, '"' * 100001, "a'" * 100000, "“x " * 50000]:
+        start = time.perf_counter()
+        dialogue_spans(text)
+        assert time.perf_counter() - start < 2
+
+def test_metrics_use_the_scanner():
+    text = "Mara waited. “Come here now,” said Eldrin. Don't 'ya think it's late? She nodded."
+    assert rough_metrics(text)["dialog_word_share"] == round(3 / 14, 3)
+    assert analyze_pacing(text)["dialog_ratio"] == round(3 / 14, 3)
+
+def test_speakers():
+    text = ("“Run,” said Mara. “Now!” Eldrin looked back. “Why?” Eldrin asked.\n\n"
+            "Lady Sera said: “Because.” “Fine,” she said.\n\n“Who?”")
+    assert dialogue_by_speaker(text) == {
+        "Mara": ["Run,", "Now!"], "Eldrin": ["Why?"], "Lady Sera": ["Because."], None: ["Fine,", "Who?"]}
+    assert dialogue_by_speaker(text, names={"Mara"})["Mara"] == ["Run,", "Now!"]
+    assert speaker_stats(text) == {"Mara": {"lines": 2, "words": 2}, "Eldrin": {"lines": 1, "words": 1},
+                                   "Lady Sera": {"lines": 1, "words": 1}}
+    assert enhanced_metrics(text)["speakers"] == speaker_stats(text)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test incrementele her-analyse: ongewijzigde secties (op inhoud-hash) gaan niet opnieuw naar het model
+"""
+import cli_manuscript_assistant
+from cli_manuscript_assistant import analyze_sections, section_hash
+from response_cache import ResponseCache
+
+SECTIONS = [{"title": f"Chapter {n}", "content": f"Sarah walks to place {n}. Tom follows her."} for n in range(1, 4)]
+
+def fake_model(prompts):
+    def fake_call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=None,
+                        use_cache=True, json_schema=None, kind=None):
+        prompts.append(prompt)
+        return f"{kind} {len(prompts)}"
+    return fake_call_model
+
+def test_revision_only_reanalyzes_changed_sections(tmp_path, monkeypatch):
+    """Bij een revisie gaat alleen de gewijzigde sectie naar het model; de rest wordt hergebruikt en gemarkeerd"""
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", ResponseCache(tmp_path / "cache.sqlite3", enabled=True))
+    prompts = []
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_model(prompts))
+
+    first = analyze_sections(SECTIONS, max_workers=2)
+    assert len(prompts) == 6
+    assert not any(r["reused"] for r in first)
+    assert [r["content_hash"] for r in first] == [section_hash(s["content"]) for s in SECTIONS]
+
+    prompts.clear()
+    revised = [dict(sec) for sec in SECTIONS]
+    revised[0]["title"] = "Prologue"
+    revised[1]["content"] = revised[1]["content"].replace("Tom", "Anna")
+    revised[2]["content"] = revised[2]["content"].replace(" ", "\n", 1)
+    second = analyze_sections(revised, max_workers=2)
+
+    # Alleen rubric + rewrite van de gewijzigde sectie
+    assert len(prompts) == 2 and all("Anna follows her" in p for p in prompts)
+    assert [r["reused"] for r in second] == [True, False, True]
+    assert second[0]["title"] == "Prologue"
+    assert second[0]["rubric"] == first[0]["rubric"]
+    assert second[2]["rewrite"] == first[2]["rewrite"]
+
+def test_other_options_are_not_reused(tmp_path, monkeypatch):
+    """Een analyse met andere opties (hier zonder rewrite) hergebruikt niets"""
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", ResponseCache(tmp_path / "cache.sqlite3", enabled=True))
+    prompts = []
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_model(prompts))
+
+    analyze_sections(SECTIONS, max_workers=2)
+    results = analyze_sections(SECTIONS, rewrite=False, max_workers=2)
+    assert len(prompts) == 6 + 3
+    assert not any(r["reused"] for r in results)
+
+def test_text_metrics_are_cached_per_exact_text(monkeypatch):
+    """Metrics van dezelfde tekst worden één keer berekend; de cache is begrensd en geeft kopieën"""
+    calls = []
+    real = cli_manuscript_assistant.rough_metrics
+    monkeypatch.setattr(cli_manuscript_assistant, "rough_metrics", lambda text: calls.append(text) or real(text))
+    monkeypatch.setattr(cli_manuscript_assistant, "_METRICS_CACHE", type(cli_manuscript_assistant._METRICS_CACHE)())
+    monkeypatch.setattr(cli_manuscript_assistant, "METRICS_CACHE_ENTRIES", 2)
+    text_metrics = cli_manuscript_assistant.text_metrics
+
+    first = text_metrics("Anna ran. Tom waited.")
+    first["words"] = -1
+    assert text_metrics("Anna ran. Tom waited.") == real("Anna ran. Tom waited.")
+    # Witruimte telt wel mee: metrics kunnen van alinea's afhangen
+    text_metrics("Anna ran.\n\nTom waited.")
+    text_metrics("A third text.")
+    text_metrics("Anna ran. Tom waited.")
+    assert calls == ["Anna ran. Tom waited.", "Anna ran.\n\nTom waited.", "A third text.", "Anna ran. Tom waited."]
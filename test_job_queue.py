@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test de persistente job queue en de /jobs endpoints
+"""
+import time
+
+import pytest
+
+from job_queue import JobQueue, JobWorkers
+
+SECTIONS = [{"title": "Chapter 1", "content": "Sarah ran through the rain."}]
+
+def test_queue_survives_restart(tmp_path):
+    """Wachtende en onderbroken jobs blijven na een herstart bewaard"""
+    jobs = JobQueue(tmp_path / "jobs.sqlite3")
+    first = jobs.submit(SECTIONS, "ollama", "llama3.1", {"rewrite": False})
+    second = jobs.submit(SECTIONS, "ollama", "llama3.1")
+    claimed = jobs.claim()
+    assert claimed["id"] == first and claimed["options"] == {"rewrite": False}
+    assert claimed["sections"] == SECTIONS
+    jobs.close()
+
+    jobs = JobQueue(tmp_path / "jobs.sqlite3")
+    assert jobs.get(first)["status"] == "running"
+    assert jobs.requeue_interrupted() == 1
+    assert [jobs.claim()["id"], jobs.claim()["id"], jobs.claim()] == [first, second, None]
+    assert jobs.get("missing") is None
+    jobs.close()
+
+def test_workers_record_result_and_failure(tmp_path):
+    jobs = JobQueue(tmp_path / "jobs.sqlite3")
+
+    def handler(job, set_progress):
+        set_progress({"sections_done": 1})
+        if job["provider"] == "broken":
+            raise RuntimeError("model offline")
+        return {"outline": job["model"]}
+
+    ok = jobs.submit(SECTIONS, "ollama", "llama3.1")
+    bad = jobs.submit(SECTIONS, "broken", "llama3.1")
+    workers = JobWorkers(jobs, handler, workers=2).start()
+    try:
+        deadline = time.time() + 10
+        while {jobs.get(ok)["status"], jobs.get(bad)["status"]} & {"queued", "running"} and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        workers.stop(5)
+    assert jobs.get(ok)["status"] == "completed"
+    assert jobs.get(ok)["progress"] == {"sections_done": 1}
+    assert jobs.result(ok) == {"outline": "llama3.1"}
+    assert jobs.get(bad)["status"] == "failed" and "model offline" in jobs.get(bad)["error"]
+    assert jobs.result(bad) is None
+    jobs.close()
+
+@pytest.mark.parametrize("rewrites", ["false", "true"])
+def test_api_jobs(fake_ollama, api_app, rewrites):
+    """POST /jobs antwoordt direct; de worker pool maakt het rapport"""
+    from fastapi.testclient import TestClient
+
+    manuscript = "Chapter 1\nSarah ran through the rain.\n\nChapter 2\nTom waited at the door.\n"
+    headers = {"x-arc-key": api_app.API_KEY}
+    with TestClient(api_app.app) as client:
+        response = client.post("/jobs", files={"file": ("book.txt", manuscript.encode(), "text/plain")},
+                               data={"provider": "ollama", "model": "llama3.1", "rewrites": rewrites},
+                               headers=headers)
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        assert client.get("/jobs/nope", headers=headers).status_code == 404
+
+        deadline = time.time() + 20
+        while (job := client.get(f"/jobs/{job_id}", headers=headers).json())["status"] in ("queued", "running"):
+            assert time.time() < deadline
+            assert client.get(f"/jobs/{job_id}/result", headers=headers).status_code in (200, 409)
+            time.sleep(0.05)
+        assert job["status"] == "completed"
+        assert job["progress"]["sections_done"] == job["progress"]["sections_total"] == 2
+        # model calls apart: met rewrites twee per sectie
+        calls = 4 if rewrites == "true" else 2
+        assert job["progress"]["calls_done"] == job["progress"]["calls_total"] == calls
+        assert "plan" in job["progress"]["stages"]
+        report = client.get(f"/jobs/{job_id}/result", headers=headers).json()
+    assert [s["title"] for s in report["sections"]] == ["Chapter 1", "Chapter 2"]
+    assert report["analysis_info"]["run_id"] == job_id
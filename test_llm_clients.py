@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test de gedeelde LLM client registry (connection pooling)
+"""
+import threading
+
+import llm_clients
+
+def test_openai_client_reused_per_key():
+    """Zelfde (api_key, org, base) geeft dezelfde client, andere key een nieuwe"""
+    llm_clients.close_all()
+    a = llm_clients.get_openai_client("sk-test-a")
+    b = llm_clients.get_openai_client("sk-test-a")
+    c = llm_clients.get_openai_client("sk-test-a", base_url="http://localhost:9999/v1")
+    assert a is b
+    assert a is not c
+    llm_clients.close_all()
+
+def test_ollama_session_shared_across_threads():
+    """Alle threads krijgen dezelfde gepoolde requests.Session per host"""
+    llm_clients.close_all()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(llm_clients.get_ollama_session("http://localhost:11434/")))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(s) for s in seen}) == 1
+    assert llm_clients.ollama_url("/api/chat", "http://localhost:11434/") == "http://localhost:11434/api/chat"
+    llm_clients.close_all()
+
+def test_ollama_host_without_scheme():
+    """OLLAMA_HOST zoals Ollama hem gebruikt: zonder schema, soms het bind-adres of zonder poort"""
+    assert llm_clients.ollama_url("api/chat", "0.0.0.0:11434") == "http://localhost:11434/api/chat"
+    assert llm_clients.ollama_url("/api/tags", "gpu-box") == "http://gpu-box:11434/api/tags"
+    assert llm_clients.ollama_url("/api/chat", "[::1]:8080") == "http://[::1]:8080/api/chat"
+    assert llm_clients.ollama_url("/api/chat", "https://ollama.example.com/proxy/") == \
+        "https://ollama.example.com/proxy/api/chat"
+
+def test_configure_resets_registry():
+    """configure() past timeouts aan en bouwt clients opnieuw op"""
+    old = (llm_clients.POOL_SIZE, llm_clients.CONNECT_TIMEOUT, llm_clients.READ_TIMEOUT)
+    first = llm_clients.get_ollama_session()
+    llm_clients.configure(pool_size=4, connect_timeout=3, read_timeout=30)
+    try:
+        assert llm_clients.request_timeout() == (3.0, 30.0)
+        assert llm_clients.get_ollama_session() is not first
+    finally:
+        llm_clients.configure(*old)
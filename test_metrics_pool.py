@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test de parallelle lokale metrics: zelfde resultaat en volgorde als sequentieel (ook via de
+gedeelde buffer), kleine input blijft in dit proces en een kapotte pool valt terug op sequentieel
+"""
+import pytest
+
+import cli_manuscript_assistant
+import metrics_pool
+from benchmark_metrics import make_manuscript
+from cli_manuscript_assistant import enhanced_metrics, rough_metrics, section_metrics, split_sections
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(metrics_pool, "PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(cli_manuscript_assistant, "_METRICS_CACHE", type(cli_manuscript_assistant._METRICS_CACHE)())
+    assert metrics_pool.warm_up(2, block=True)
+    yield
+    metrics_pool.shutdown_pool()
+
+SECTIONS = split_sections(make_manuscript(6000))
+
+def test_batches_keep_order():
+    texts = ["a" * n for n in (5, 1, 1, 8, 2, 3)]
+    parts = metrics_pool.batches(texts, 3)
+    assert [t for part in parts for t in part] == texts
+    assert len(parts) <= 4
+
+def test_parallel_matches_sequential(pool):
+    texts = [s["content"] for s in SECTIONS]
+    assert metrics_pool.parallel_metrics(texts, workers=2) == [rough_metrics(t) for t in texts]
+    assert metrics_pool.parallel_metrics(texts[:3], enhanced=True, workers=2) == [enhanced_metrics(t) for t in texts[:3]]
+    assert metrics_pool._pool is not None
+
+def test_parallel_reads_shared_buffer(pool):
+    # niet-ASCII tekst: byte offsets in de buffer zijn geen teken offsets
+    texts = ["“Héllo,” zei Zoë. ‘Ja’ — Eldrin knikte.", "", SECTIONS[0]["content"], "東京 Mara ran."]
+    assert metrics_pool.parallel_metrics(texts, workers=2) == [rough_metrics(t) for t in texts]
+
+def test_small_input_stays_sequential(monkeypatch):
+    monkeypatch.setattr(metrics_pool, "get_pool", lambda workers=None: pytest.fail("pool used for tiny input"))
+    assert metrics_pool.parallel_metrics(["Anna ran.", "Tom waited."], workers=4) == [
+        rough_metrics("Anna ran."), rough_metrics("Tom waited.")]
+
+def test_cold_pool_warms_up_in_background(monkeypatch):
+    monkeypatch.setattr(metrics_pool, "PARALLEL_MIN_CHARS", 0)
+    texts = [s["content"] for s in SECTIONS[:2]]
+    try:
+        # eerste aanvraag: sequentieel terwijl de workers opstarten
+        assert metrics_pool.parallel_metrics(texts, workers=2) == [rough_metrics(t) for t in texts]
+        assert metrics_pool._pool is not None
+        assert metrics_pool._pool_ready.wait(60)
+        assert metrics_pool.parallel_metrics(texts, workers=2) == [rough_metrics(t) for t in texts]
+    finally:
+        metrics_pool.shutdown_pool()
+
+def test_broken_pool_falls_back(pool, monkeypatch):
+    def broken(workers=None):
+        raise OSError("no processes here")
+    monkeypatch.setattr(metrics_pool, "get_pool", broken)
+    texts = [s["content"] for s in SECTIONS[:2]]
+    assert metrics_pool.parallel_metrics(texts, workers=2) == [rough_metrics(t) for t in texts]
+
+def test_section_metrics_uses_cache_and_pool(pool):
+    sections = SECTIONS + SECTIONS[:1]  # dubbele tekst wordt één keer gemeten
+    metrics = section_metrics(sections, workers=2)
+    assert metrics == [rough_metrics(s["content"]) for s in sections]
+    metrics[0]["words"] = -1
+    assert metrics[-1]["words"] != -1
+    # tweede keer volledig uit de cache, zonder pool
+    metrics_pool.shutdown_pool()
+    assert section_metrics(sections, workers=2)[0] == rough_metrics(sections[0]["content"])
+    assert metrics_pool._pool is None
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test de hiërarchische outline: samenvatting per sectie (gecachet op inhoud) -> outline
+"""
+import chunking
+import cli_manuscript_assistant
+from cli_manuscript_assistant import build_outline, section_hash
+from response_cache import ResponseCache
+
+SECTIONS = [{"title": f"Chapter {n}", "content": f"Chapter {n} text. Sarah walks to place {n}."} for n in range(1, 4)]
+
+def fake_model(prompts):
+    def fake_call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=None,
+                        use_cache=True, json_schema=None, kind=None):
+        prompts.append((kind, prompt))
+        return f"{kind} {len(prompts)}"
+    return fake_call_model
+
+def test_section_hash_ignores_whitespace():
+    """Alleen witruimte/regeleinden gewijzigd: zelfde fingerprint"""
+    assert section_hash("Sarah ran.\r\n\r\nTom  waited. ") == section_hash("Sarah ran.\n\nTom waited.")
+    assert section_hash("Sarah ran.") != section_hash("Sarah walked.")
+
+def test_outline_reduces_cached_summaries(tmp_path, monkeypatch):
+    """Eén samenvatting per sectie, daarna één outline call; een revisie vat alleen de gewijzigde sectie opnieuw samen"""
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", ResponseCache(tmp_path / "cache.sqlite3", enabled=True))
+    prompts = []
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_model(prompts))
+
+    outline = build_outline(SECTIONS, max_workers=2)
+    assert [kind for kind, _ in prompts] == ["summary"] * 3 + ["outline"]
+    assert outline == "outline 4"
+    assert "### Chapter 2\nsummary" in prompts[-1][1]
+
+    prompts.clear()
+    revised = [dict(sec) for sec in SECTIONS]
+    revised[0]["content"] += "\n\nA new scene."
+    revised[1]["content"] = "  " + revised[1]["content"] + "\n"
+    build_outline(revised, max_workers=2)
+    assert [kind for kind, _ in prompts] == ["summary", "outline"]
+    assert "Chapter 1 text" in prompts[0][1]
+
+def test_summaries_are_condensed_when_outline_prompt_is_too_long(monkeypatch):
+    """Passen de samenvattingen niet in één prompt, dan worden groepen eerst gecondenseerd"""
+    monkeypatch.setitem(chunking.TOKEN_BUDGETS, "outline", 12)
+    prompts = []
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_model(prompts))
+
+    build_outline(SECTIONS, max_workers=2)
+    condense = [p for _, p in prompts if p.startswith("Condense these consecutive section summaries")]
+    # 3 samenvattingen -> 2 groepen -> outline
+    assert len(condense) == 2
+    assert "### Chapter 1" in condense[0] and "### Chapter 2" in condense[0]
+    assert [kind for kind, _ in prompts][-1] == "outline"
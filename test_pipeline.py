@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test de stage scheduler (DAG) en de gedeelde analyse pipeline
+"""
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+import cli_manuscript_assistant
+from pipeline import PipelineError, Stage, arun_analysis, arun_stages, run_analysis, run_stages, topological_order
+
+def test_independent_stages_run_concurrently():
+    """Stages zonder onderlinge afhankelijkheid draaien tegelijk; events komen in de aanroepende thread"""
+    barrier = threading.Barrier(2, timeout=5)
+    events, threads = [], []
+
+    def independent(name):
+        def run(results, emit):
+            barrier.wait()
+            emit({"type": "text", "stage": name, "text": name})
+            return name
+        return run
+
+    stages = [
+        Stage("c", lambda results, emit: results["a"] + results["b"], ["a", "b"]),
+        Stage("a", independent("a")),
+        Stage("b", independent("b")),
+    ]
+
+    def on_event(event):
+        events.append(event)
+        threads.append(threading.current_thread())
+
+    results = run_stages(stages, on_event)
+    assert results["c"] == "ab"
+    assert set(threads) == {threading.current_thread()}
+    assert [e["stage"] for e in events if e["type"] == "stage"][-1] == "c"
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(PipelineError, match="unknown"):
+        topological_order([Stage("a", None, ["missing"])])
+    with pytest.raises(PipelineError, match="Cycle"):
+        topological_order([Stage("a", None, ["b"]), Stage("b", None, ["a"])])
+
+def test_failed_stage_stops_dependents():
+    """Een fout komt bij de caller terecht; stages die ervan afhangen starten niet"""
+    started = []
+
+    def fail(results, emit):
+        raise ValueError("boom")
+
+    stages = [Stage("a", fail), Stage("b", lambda results, emit: started.append("b"), ["a"])]
+    with pytest.raises(ValueError, match="boom"):
+        run_stages(stages)
+    assert started == []
+
+def test_async_stages_use_arun():
+    async def arun(results, emit):
+        await asyncio.sleep(0)
+        return results["a"] * 2
+
+    stages = [Stage("a", lambda results, emit: 21), Stage("b", None, ["a"], arun=arun)]
+    assert asyncio.run(arun_stages(stages)) == {"a": 21, "b": 42}
+
+def test_run_analysis_report(fake_ollama):
+    """Eén pipeline voor alle front ends: volledig rapport inclusief analysis_info"""
+    sections = [{"title": "Chapter 1", "content": "Sarah ran through the rain on 3 mei."},
+                {"title": "Chapter 2", "content": "Tom waited at the door."}]
+    stages_done = []
+    report = run_analysis(sections, "ollama", "llama3.1", rewrite=False,
+                          on_event=lambda e: e["type"] == "stage" and stages_done.append(e["stage"]))
+    assert set(stages_done) == {"outline", "sections", "timeline_extract", "issues", "plan", "timeline_feedback"}
+    assert stages_done.index("plan") > max(stages_done.index("outline"), stages_done.index("issues"))
+    assert report["timeline_extract"].startswith("* Chapter 1: ")
+    assert report["plan"].startswith("echo: ")
+    assert report["analysis_info"]["total_sections"] == 2
+    # 2 samenvattingen + outline + 2 rubrics + issues + plan + timeline
+    assert report["analysis_info"]["calls"]["calls"] == len(fake_ollama.calls) == 8
+
+SECTIONS = [{"title": f"Chapter {n}", "content": f"Sarah ran through chapter {n}."} for n in range(1, 5)]
+
+def test_concurrency_limit_covers_all_stages(fake_ollama, monkeypatch):
+    """Outline en secties lopen tegelijk maar delen max_workers: nooit meer calls tegelijk"""
+    lock, in_flight, peak = threading.Lock(), [0], [0]
+    original = cli_manuscript_assistant._call_provider
+
+    def counting(*args, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            time.sleep(0.02)
+            return original(*args, **kwargs)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(cli_manuscript_assistant, "_call_provider", counting)
+    run_analysis(SECTIONS, "ollama", "llama3.1", rewrite=True, max_workers=3)
+    assert peak[0] == 3
+
+def test_async_concurrency_limit_covers_all_stages(fake_ollama, monkeypatch):
+    import llm_clients
+    in_flight, peak = [0], [0]
+
+    async def counting(*args, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.02)
+            return "echo: ok"
+        finally:
+            in_flight[0] -= 1
+
+    async def run():
+        try:
+            return await arun_analysis(SECTIONS, "ollama", "llama3.1", rewrite=True, max_workers=3)
+        finally:
+            await llm_clients.aclose_all()
+
+    monkeypatch.setattr(cli_manuscript_assistant, "_acall_provider", counting)
+    asyncio.run(run())
+    assert peak[0] == 3
+
+def test_cli_stream_prints_each_part_once(fake_ollama, tmp_path, monkeypatch, capsys):
+    """--stream: gelijktijdig gegenereerde rapport-onderdelen lopen niet door elkaar"""
+    manuscript = tmp_path / "book.txt"
+    manuscript.write_text("Chapter 1\nSarah ran.\n\nChapter 2\nTom waited.\n", encoding="utf-8")
+    monkeypatch.setattr(cli_manuscript_assistant, "OUTPUT_DIR", tmp_path / "outputs")
+    (tmp_path / "outputs").mkdir()
+    monkeypatch.setattr(cli_manuscript_assistant, "HAS_ONEDRIVE", False)
+    monkeypatch.setattr(sys, "argv", ["cli", str(manuscript), "--stream", "--no-rewrite"])
+    cli_manuscript_assistant.main()
+
+    out = capsys.readouterr().out
+    for heading in ("Outline", "Top 10 Issues", "Improvement Plan", "Timeline Consistency (advice)"):
+        assert out.count(f"## {heading}\n") == 1
+        block = out.split(f"## {heading}\n", 1)[1].split("\n## ", 1)[0]
+        assert block.strip().startswith("echo: ") and block.count("echo: ") == 1
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test de rate limiter (token buckets, headers, retries met backoff)
+"""
+import time
+
+import cli_manuscript_assistant
+from rate_limiter import RateLimiter, TokenBucket, parse_duration, retry_after_seconds
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+def test_parse_duration():
+    assert parse_duration("1s") == 1
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("0.5") == 0.5
+    assert parse_duration("soon") is None
+
+def test_bucket_makes_callers_wait_when_empty():
+    """Een lege bucket geeft een wachttijd evenredig met het tekort"""
+    bucket = TokenBucket(per_minute=60)  # 1 per seconde
+    assert bucket.reserve(60) == 0
+    assert 1.9 < bucket.reserve(2) <= 2.0
+
+def test_retry_after_is_honoured_and_retries_counted():
+    """429 met Retry-After: opnieuw proberen na minstens die tijd"""
+    limiter = RateLimiter(rpm=1000, tpm=10**6, max_retries=3, backoff_base=0.001)
+    failures = [FakeStatusError(429, {"retry-after": "0.05"})]
+    def request():
+        if failures:
+            raise failures.pop()
+        return "ok"
+    info = {}
+    start = time.monotonic()
+    assert limiter.run(request, "gpt-4o-mini", 100, info) == "ok"
+    assert time.monotonic() - start >= 0.05
+    assert info["retries"] == 1 and info["queue_wait"] >= 0.05
+
+def test_non_retryable_errors_fail_fast():
+    limiter = RateLimiter(max_retries=5, backoff_base=0.001)
+    calls = []
+    def request():
+        calls.append(1)
+        raise FakeStatusError(401)
+    try:
+        limiter.run(request, "gpt-4o-mini", 10)
+    except FakeStatusError:
+        pass
+    assert len(calls) == 1
+
+def test_headers_adapt_limits():
+    limiter = RateLimiter(rpm=100, tpm=1000)
+    limiter.observe("gpt-4o", {"x-ratelimit-limit-requests": "3000", "x-ratelimit-limit-tokens": "90000"})
+    requests_bucket, tokens_bucket = limiter.buckets("gpt-4o")
+    assert (requests_bucket.capacity, tokens_bucket.capacity) == (3000, 90000)
+    assert retry_after_seconds({"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "3s"}) == 3
+
+def test_call_model_recovers_from_429(fake_openai, monkeypatch):
+    """call_model overleeft een rate limit van de (nep) OpenAI server"""
+    monkeypatch.setattr(cli_manuscript_assistant, "RATE_LIMITER",
+                        RateLimiter(max_retries=2, backoff_base=0.01))
+    fake_openai.failures = [(429, {"retry-after-ms": "20"})]
+    answer = cli_manuscript_assistant.call_model("Hello limiter", "openai", "gpt-4o-mini")
+    assert answer == "echo: Hello limiter"
+    assert len(fake_openai.calls) == 2
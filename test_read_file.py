@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Test read_file met paden, bytes en streams (uploads zonder tijdelijke bestanden)
+"""
+import io
+
+import pytest
+
+from cli_manuscript_assistant import read_file
+
+TEXT = "Chapter 1\r\nSarah ran.\rTom waited.\n\nChapter 2\nThé end ✓\n"
+
+def test_text_from_bytes_matches_path(tmp_path):
+    path = tmp_path / "book.md"
+    path.write_bytes(TEXT.encode("utf-8") + b"\xff")
+    expected = read_file(path)
+    assert expected == "Chapter 1\nSarah ran.\nTom waited.\n\nChapter 2\nThé end ✓\n"
+    assert read_file(path.read_bytes(), "book.md") == expected
+    assert read_file(bytearray(path.read_bytes())) == expected
+
+    stream = io.BytesIO(path.read_bytes())
+    stream.name = "book.txt"
+    assert read_file(stream) == expected
+
+def test_docx_from_stream(tmp_path):
+    docx = pytest.importorskip("docx")
+    doc = docx.Document()
+    for paragraph in ["Chapter 1", "Sarah ran through the rain.", "Chapter 2", "Tom waited."]:
+        doc.add_paragraph(paragraph)
+    path = tmp_path / "book.docx"
+    doc.save(str(path))
+
+    expected = read_file(path)
+    assert expected == "Chapter 1\nSarah ran through the rain.\nChapter 2\nTom waited."
+    assert read_file(io.BytesIO(path.read_bytes()), "book.docx") == expected
+    # Zonder naam herkend aan de zip header
+    assert read_file(path.read_bytes()) == expected
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test de persistente response cache (keys, LRU eviction, TTL, call_model integratie)
+"""
+import time
+
+import cli_manuscript_assistant
+from response_cache import ResponseCache
+
+def test_key_covers_all_inputs():
+    """Elke input die het antwoord bepaalt zit in de key"""
+    base = ResponseCache.make_key("openai", "gpt-4o-mini", 0.3, "system", "prompt", "1")
+    assert base == ResponseCache.make_key("openai", "gpt-4o-mini", 0.3, "system", "prompt", "1")
+    variants = [
+        ("ollama", "gpt-4o-mini", 0.3, "system", "prompt", "1"),
+        ("openai", "gpt-4o", 0.3, "system", "prompt", "1"),
+        ("openai", "gpt-4o-mini", 0.5, "system", "prompt", "1"),
+        ("openai", "gpt-4o-mini", 0.3, "other", "prompt", "1"),
+        ("openai", "gpt-4o-mini", 0.3, "system", "prompt!", "1"),
+        ("openai", "gpt-4o-mini", 0.3, "system", "prompt", "2"),
+    ]
+    assert len({ResponseCache.make_key(*v) for v in variants} | {base}) == len(variants) + 1
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    """Minst recent gebruikte entries verdwijnen als de cache te groot wordt"""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_bytes=250, enabled=True)
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 100)
+    assert cache.get("a") == "x" * 100      # a is nu recenter dan b
+    cache.put("c", "z" * 100)               # 300 bytes > 250: b moet weg
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 2)
+    cache.close()
+
+def test_ttl_expiry(tmp_path):
+    """Entries ouder dan de TTL tellen als miss"""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=0.05, enabled=True)
+    cache.put("k", "value")
+    assert cache.get("k") == "value"
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    cache.close()
+
+def test_call_model_served_from_cache(tmp_path, monkeypatch):
+    """Een identieke prompt gaat maar één keer naar de provider"""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", enabled=True)
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", cache)
+    calls = []
+    def fake_provider(prompt, provider, model, temperature, system, json_schema=None, info=None):
+        calls.append(prompt)
+        return f"answer {len(calls)}"
+    monkeypatch.setattr(cli_manuscript_assistant, "_call_provider", fake_provider)
+
+    first = cli_manuscript_assistant.call_model("same prompt", "openai", "gpt-4o-mini", 0.2)
+    second = cli_manuscript_assistant.call_model("same prompt", "openai", "gpt-4o-mini", 0.2)
+    uncached = cli_manuscript_assistant.call_model("same prompt", "openai", "gpt-4o-mini", 0.2, use_cache=False)
+    assert first == second == "answer 1"
+    assert uncached == "answer 2"
+    assert cache.stats()["hits"] == 1
+    cache.close()
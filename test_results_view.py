@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test zoeken, pagineren en grafiek rijen voor de resultaten weergave
+"""
+from results_view import page_of, run_key, search_sections, section_rows, section_search_text
+
+RESULTS = [
+    {"title": "Chapter 1", "metrics": {"words": 100, "sentences": 10, "dialog_word_share": 0.25},
+     "rubric": "Strong opening with Sarah", "rewrite": ""},
+    {"title": "Chapter 2: The Very Long Title Of The Storm", "metrics": {"words": 50, "sentences": 5},
+     "rubric": "Pacing drags", "rewrite": "Tom waited.", "advanced_analysis": {"genre_analysis": "Dragon lore"}},
+]
+
+def test_search_matches_titles_and_analysis_text():
+    texts = [section_search_text(r) for r in RESULTS]
+    assert search_sections(texts, "") == [0, 1]
+    assert search_sections(texts, "chapter") == [0, 1]
+    assert search_sections(texts, "SARAH") == [0]
+    assert search_sections(texts, "dragon tom") == [1]
+    assert search_sections(texts, "dragon sarah") == []
+
+def test_page_of_clamps_the_page():
+    indices = list(range(23))
+    assert page_of(indices, 1, 10) == (list(range(10)), 1, 3)
+    assert page_of(indices, 3, 10) == ([20, 21, 22], 3, 3)
+    assert page_of(indices, 9, 10)[1:] == (3, 3)
+    assert page_of([], 1, 10) == ([], 1, 1)
+
+def test_section_rows_and_run_key():
+    rows = section_rows(RESULTS)
+    assert rows[0] == {"title": "Chapter 1", "words": 100, "sentences": 10, "dialogue_pct": 25.0}
+    assert rows[1]["title"] == "Chapter 2: The Very Long ..." and rows[1]["dialogue_pct"] == 0
+    assert run_key({"analysis_info": {"run_id": "abc", "timestamp": "t"}}) == "abc"
+    assert run_key({"analysis_info": {"timestamp": "t"}}) == "t"
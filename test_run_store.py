@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test checkpoints en hervatten van analyse runs
+"""
+import json
+import sys
+
+import pytest
+
+import cli_manuscript_assistant
+from pipeline import resume_analysis, run_analysis
+from run_store import RunNotFound, RunStore, list_runs
+
+SECTIONS = [{"title": "Chapter 1", "content": "Sarah ran through the rain."},
+            {"title": "Chapter 2", "content": "Tom waited at the door."}]
+
+def flaky_provider(monkeypatch, fail_on):
+    """_call_provider dat alleen de eerste keer faalt op een prompt die met fail_on begint"""
+    calls, answered = [], []
+
+    def fake_provider(prompt, provider, model, temperature, system, json_schema=None, info=None):
+        calls.append(prompt)
+        if prompt.startswith(fail_on) and not any(c.startswith(fail_on) for c in calls[:-1]):
+            raise RuntimeError("connection reset")
+        answered.append(prompt)
+        return f"answer {len(calls)}"
+    monkeypatch.setattr(cli_manuscript_assistant, "_call_provider", fake_provider)
+    return calls, answered
+
+def test_failed_run_resumes_without_redoing_work(isolated_runs, monkeypatch):
+    """Na een fout in de plan stage doet hervatten alleen de plan call opnieuw"""
+    monkeypatch.setattr(cli_manuscript_assistant.RESPONSE_CACHE, "enabled", False)
+    calls, _ = flaky_provider(monkeypatch, "Create a phased")
+    with pytest.raises(RuntimeError):
+        run_analysis(SECTIONS, "ollama", "llama3.1", run_id="run-1", rewrite=False)
+
+    [run] = list_runs(isolated_runs)
+    assert (run["run_id"], run["status"], run["total_sections"]) == ("run-1", "failed", 2)
+    assert "connection reset" in run["error"]
+    store = RunStore.open(isolated_runs, "run-1")
+    assert {"outline", "sections", "issues", "timeline_extract"} <= set(store.stage_results())
+    assert "plan" not in store.stage_results()
+
+    before = len(calls)
+    report = resume_analysis("run-1")
+    assert len(calls) == before + 1 and calls[-1].startswith("Create a phased")
+    assert report["analysis_info"]["run_id"] == "run-1"
+    assert report["plan"] == f"answer {len(calls)}"
+    assert RunStore.open(isolated_runs, "run-1").manifest["status"] == "completed"
+    # Een afgeronde run geeft het bewaarde rapport terug zonder calls
+    assert resume_analysis("run-1")["plan"] == report["plan"]
+    assert len(calls) == before + 1
+
+def test_calls_inside_a_failed_stage_are_checkpointed(isolated_runs, monkeypatch):
+    """Ook binnen een mislukte stage worden afgeronde model calls niet opnieuw gedaan"""
+    monkeypatch.setattr(cli_manuscript_assistant.RESPONSE_CACHE, "enabled", False)
+    calls, answered = flaky_provider(monkeypatch, "Rewrite this section")
+    with pytest.raises(RuntimeError):
+        run_analysis(SECTIONS, "ollama", "llama3.1", run_id="run-2", max_workers=1)
+    assert "sections" not in RunStore.open(isolated_runs, "run-2").stage_results()
+    done_before, before = set(answered), len(calls)
+
+    report = resume_analysis("run-2", max_workers=1)
+    redone = calls[before:]
+    assert redone and not done_before & set(redone)
+    assert [s["title"] for s in report["sections"]] == ["Chapter 1", "Chapter 2"]
+
+def test_unknown_and_invalid_run_ids(isolated_runs):
+    with pytest.raises(RunNotFound):
+        resume_analysis("does-not-exist")
+    with pytest.raises(RunNotFound):
+        RunStore.open(isolated_runs, "../outputs")
+
+def test_cli_resume(fake_ollama, isolated_runs, tmp_path, monkeypatch, capsys):
+    """--resume RUN_ID maakt een run af zonder de manuscript bestanden opnieuw te lezen"""
+    monkeypatch.setattr(cli_manuscript_assistant, "OUTPUT_DIR", tmp_path / "outputs")
+    (tmp_path / "outputs").mkdir()
+    monkeypatch.setattr(cli_manuscript_assistant, "HAS_ONEDRIVE", False)
+    store = RunStore.create(isolated_runs, SECTIONS, "ollama", "llama3.1", {"rewrite": False}, "run-3")
+    store.save_stage("outline", "saved outline")
+
+    monkeypatch.setattr(sys, "argv", ["cli", "--resume", "run-3"])
+    cli_manuscript_assistant.main()
+    report = json.loads(next((tmp_path / "outputs").glob("results-*.json")).read_text(encoding="utf-8"))
+    assert report["outline"] == "saved outline"
+    assert [s["title"] for s in report["sections"]] == ["Chapter 1", "Chapter 2"]
+    # outline stage overgeslagen: 2 rubrics + issues + plan + timeline
+    assert len(fake_ollama.calls) == 5
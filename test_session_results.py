@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test dat een afgeronde analyse reruns (download klikken) overleeft en heropend kan worden
+"""
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from run_store import RunStore
+
+METRICS = {"words": 5, "sentences": 1, "avg_sentence_words": 5.0, "dialog_word_share": 0.0, "adverb_count": 0}
+
+@pytest.fixture
+def completed_run(isolated_runs):
+    store = RunStore.create(isolated_runs, [{"title": "Chapter 1", "content": "Sarah ran through the rain."}],
+                            "ollama", "llama3.1", {"rewrite": True})
+    store.finish({
+        "outline": "Stored outline", "issues": "Stored issues", "plan": "Stored plan",
+        "timeline_extract": "* Chapter 1: (geen)", "timeline_feedback": "Stored feedback",
+        "sections": [{"title": "Chapter 1", "metrics": METRICS, "rubric": "Stored rubric", "rewrite": "Stored rewrite",
+                      "content_hash": "abc", "reused": False}],
+        "analysis_info": {"run_id": store.run_id, "provider": "ollama", "model": "llama3.1",
+                          "timestamp": "20260101-120000", "total_sections": 1},
+    })
+    return store.run_id
+
+def rendered_text(at):
+    return "\n".join(element.value for element in [*at.markdown, *at.success] if isinstance(element.value, str))
+
+@pytest.mark.parametrize("script, open_label, done_text", [
+    ("app.py", "📂 Analyse openen", "Manuscript Analyse Voltooid"),
+    ("streamlit_app.py", "📂 Open analysis", "Analysis completed"),
+])
+def test_recent_analysis_survives_reruns(completed_run, script, open_label, done_text):
+    at = AppTest.from_file(script, default_timeout=60)
+    at.session_state["password_correct"] = True
+    at.run()
+    assert done_text not in rendered_text(at)
+
+    next(button for button in at.button if button.label == open_label).click().run()
+    assert not at.exception
+    assert at.session_state["active_run"] == {"run_id": completed_run}
+    assert done_text in rendered_text(at)
+
+    # Een rerun (zoals na een download klik) toont hetzelfde rapport zonder nieuwe analyse
+    at.run()
+    assert not at.exception
+    assert done_text in rendered_text(at)
+
+def test_sections_are_paginated_searchable_and_lazy(isolated_runs):
+    """Alleen de huidige pagina krijgt een toggle en alleen geopende secties worden gerenderd"""
+    sections = [{"title": f"Chapter {n}", "metrics": METRICS, "rubric": f"Rubric {n}" + (" storm" if n == 17 else ""),
+                 "rewrite": "", "content_hash": str(n), "reused": False} for n in range(1, 26)]
+    store = RunStore.create(isolated_runs, [], "ollama", "llama3.1", {})
+    store.finish({"outline": "", "issues": "", "plan": "", "timeline_extract": "", "timeline_feedback": "",
+                  "sections": sections, "analysis_info": {"run_id": store.run_id, "provider": "ollama",
+                                                          "model": "llama3.1", "timestamp": "20260101-120000"}})
+    at = AppTest.from_file("streamlit_app.py", default_timeout=60)
+    at.session_state["password_correct"] = True
+    at.session_state["active_run"] = {"run_id": store.run_id}
+    at.run()
+    toggles = [t for t in at.toggle if t.label.startswith("📝")]
+    assert [t.label.split(" (")[0] for t in toggles] == [f"📝 Chapter {n}" for n in range(1, 11)]
+    assert "Rubric 3" not in rendered_text(at)
+
+    toggles[2].set_value(True).run()
+    assert "Rubric 3" in rendered_text(at) and "Rubric 4" not in rendered_text(at)
+
+    next(t for t in at.text_input if t.label == "🔍 Search sections").set_value("storm").run()
+    assert [t.label.split(" (")[0] for t in at.toggle if t.label.startswith("📝")] == ["📝 Chapter 17"]
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Test de gedeelde manuscript buffer: offsets, niet-ASCII tekst en opruimen
+"""
+from multiprocessing import shared_memory
+
+import pytest
+
+from shared_text import SharedManuscript, read_texts
+
+TEXTS = ["Chapter 1\nMara ran.", "", "“Héllo,” zei Zoë. ‘Ja’ — 東京.", "Eldrin waited."]
+
+def test_offsets_round_trip():
+    with SharedManuscript(TEXTS) as shared:
+        assert [end - start for start, end in shared.spans] == [len(t.encode("utf-8")) for t in TEXTS]
+        assert read_texts(shared.name, shared.spans) == TEXTS
+        assert read_texts(shared.name, shared.spans[2:3]) == TEXTS[2:3]
+
+def test_close_unlinks_buffer():
+    shared = SharedManuscript(TEXTS)
+    name = shared.name
+    shared.close()
+    shared.close()  # tweede keer mag geen fout geven
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+def test_empty_input():
+    with SharedManuscript([]) as shared:
+        assert shared.spans == []
+        assert read_texts(shared.name, []) == []
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Test streaming model output (stream_model / stream_text)
+"""
+import cli_manuscript_assistant
+from cli_manuscript_assistant import stream_model, stream_text
+from response_cache import ResponseCache
+
+def test_stream_model_yields_fragments(fake_ollama):
+    """Ollama antwoorden komen als losse fragmenten binnen"""
+    chunks = list(stream_model("Hello streaming world", "ollama", "llama3.1"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "echo: Hello streaming world"
+
+def test_stream_text_throttles_updates():
+    """on_chunk ziet elk fragment, on_update wordt gedoseerd en eindigt met de volledige tekst"""
+    seen, updates = [], []
+    text = stream_text(iter(["a", "b", "c", " "]), on_update=updates.append,
+                       on_chunk=seen.append, min_interval=60)
+    assert text == "abc"
+    assert seen == ["a", "b", "c", " "]
+    assert updates == ["a", "abc"]
+
+def test_streamed_answer_is_cached(fake_ollama, tmp_path, monkeypatch):
+    """Na een gestreamde call levert call_model hetzelfde antwoord uit de cache"""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", enabled=True)
+    monkeypatch.setattr(cli_manuscript_assistant, "RESPONSE_CACHE", cache)
+    streamed = stream_text(stream_model("Cache me", "ollama", "llama3.1", 0.2))
+    assert cli_manuscript_assistant.call_model("Cache me", "ollama", "llama3.1", 0.2) == streamed
+    assert len(fake_ollama.calls) == 1
+    cache.close()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test de concurrent sectie-analyse (task runner + analyze_sections)
+"""
+import threading
+import time
+
+import cli_manuscript_assistant
+from task_runner import run_tasks
+
+def test_run_tasks_keeps_input_order_and_bounds_concurrency():
+    """Resultaten in input volgorde, nooit meer dan max_workers tegelijk"""
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    progress = []
+
+    def make_task(i):
+        def task():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01 * (5 - i % 5))
+            with lock:
+                active[0] -= 1
+            return i * 10
+        return task
+
+    results = run_tasks([make_task(i) for i in range(12)], max_workers=3,
+                        on_done=lambda i, r, done, total: progress.append((done, total)))
+    assert results == [i * 10 for i in range(12)]
+    assert peak[0] <= 3
+    assert [d for d, _ in progress] == list(range(1, 13))
+
+def test_run_tasks_propagates_errors():
+    """De eerste fout breekt de run af"""
+    def boom():
+        raise ValueError("model down")
+    try:
+        run_tasks([lambda: 1, boom, lambda: 3], max_workers=2)
+    except ValueError as e:
+        assert "model down" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+def test_analyze_sections_fans_out_calls(monkeypatch):
+    """Alle per-sectie calls gaan via call_model en landen bij de juiste sectie"""
+    def fake_call_model(prompt, provider="ollama", model="llama3.1", temperature=0.3, system=None, json_schema=None, kind=None):
+        return f"{temperature}:{prompt.splitlines()[0][:40]}"
+    monkeypatch.setattr(cli_manuscript_assistant, "call_model", fake_call_model)
+
+    sections = [{"title": "Chapter 1", "content": "Sarah ran. Sarah was afraid. Tom shouted."},
+                {"title": "Chapter 2", "content": "The storm broke over the hills."}]
+    seen = []
+    results = cli_manuscript_assistant.analyze_sections(
+        sections, "openai", "gpt-4o-mini", rewrite=True, enhanced=True, max_workers=4,
+        on_progress=lambda done, total, label: seen.append(label))
+
+    assert [r["title"] for r in results] == ["Chapter 1", "Chapter 2"]
+    assert results[0]["rubric"].startswith("0.3:Section: Chapter 1")
+    assert results[0]["rewrite"].startswith("0.5:")
+    assert set(results[1]["advanced_analysis"]) >= {"scene_structure", "emotional_depth", "genre_analysis"}
+    assert len(seen) == sum(2 + len(r.get("advanced_analysis", {})) for r in results)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+De metrics via TextContext moeten exact gelijk blijven aan de oude regex implementaties
+(op de dialoog velden na, zie test_dialogue.py)
+"""
+import random
+
+import pytest
+
+from benchmark_metrics import (LEGACY, comparable, legacy_enhanced_metrics, legacy_local_metrics, local_metrics,
+                               make_manuscript)
+from cli_manuscript_assistant import enhanced_metrics, rough_metrics
+from text_context import TextContext
+
+SAMPLES = [
+    "",
+    "   \n\n  ",
+    "Eldrin ran. Mara felt cold!   Was it over? \"Yes,\" he said quietly.",
+    "She was   thought to be wise. It was\n\nfelt by all. He wasn't there; was, was it? It seemed so",
+    "Don't say it's rock'n'roll. a'b'c'd 'quoted' word' 'x",
+    "Het was werkelijk WERKELIJK mooi. Vriendelijk, hopelijk. Lijk. Only lY and Ly and FLY.",
+    "“Curly quotes,” she whispered. ‘Single’ ones… done. Waſ Kelvin KNEW it. "
+    "WAS Knew. İnsan was İyi. ıt felt ſoft. ran_fast RAN ran2 seemed odd appeared",
+    "Chapter 1\n\n" + " ".join(["word"] * 120) + "\n\n" + " ".join(["talking"] * 120) + ' "and dialog"',
+    "Going going sings ed s ing ings walked walked walked walked walked walked had shadow came",
+    "Lady Sera was afraid. Lady  Sera smiled, happy and calm! lady sera? LADY SERA was tense. "
+    "Sera Eldrin met Eldrın. Eldrin, ELDRIN and eldrin were nervous... Mara. Mara Thorne said: Mara",
+    "Eldrin\nThorne looked Proud. Eldrin Thorne was worried; Thorne was not. Eldrin's sword. Eldrin_x Eldrin2",
+]
+
+def _random_text(rng):
+    pieces = ["was", "Was", "WAS", "felt", "seemed", "thought", "ran", "quietly", "werkelijk", "Eldrin",
+              "Mara", "don't", "it's", "'", "\"", "“", "”", ".", "!", "?", "...", " ", "  ", "\n",
+              "\n\n", ",", "Lady Sera", "Sera", "afraid", "Happy", "waſ", "\u212anew", "ſeemed", "Knew", "İ", "going", "sings", "dark", "_", "7", "\t"]
+    return "".join(rng.choice(pieces) + rng.choice(["", " ", " ", "\n"]) for _ in range(rng.randint(0, 60)))
+
+@pytest.mark.parametrize("name", sorted(LEGACY))
+def test_metrics_match_legacy_implementation(name):
+    old, new = LEGACY[name]
+    rng = random.Random(7)
+    for text in SAMPLES + [_random_text(rng) for _ in range(300)]:
+        assert comparable(new(text)) == comparable(old(text)), repr(text)
+        assert comparable(new(TextContext(text))) == comparable(old(text)), repr(text)
+
+def test_enhanced_metrics_match_on_manuscript():
+    text = make_manuscript(3000)
+    assert comparable(enhanced_metrics(text)) == comparable(legacy_enhanced_metrics(text))
+
+def test_local_metrics_match_on_manuscript():
+    # Dezelfde vergelijking als de benchmark: een lijst met resultaten per metric
+    text = make_manuscript(3000)
+    assert comparable(local_metrics(text)) == comparable(legacy_local_metrics(text))
+
+def test_context_is_built_once_and_shared():
+    ctx = TextContext("Mara ran. She felt cold.\n\nThe end.")
+    enhanced_metrics(ctx)
+    tokens = ctx.tokens
+    rough_metrics(ctx)
+    assert ctx.tokens is tokens
+    assert ctx.word_freq["ran"] == 1
+    assert ctx.paragraphs == ["Mara ran. She felt cold.", "The end."]
+    assert TextContext.of(ctx) is ctx
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Gedeelde tokenisatie voor de lokale metrics van Arc Crusade Manuscript Assistant
+Woorden, zinnen, alinea's en een woordfrequentie tabel worden één keer per tekst gemaakt;
+rough_metrics, de analyze_* functies en calculate_readability_score lezen daaruit in plaats
+van elk opnieuw met regexes over de hele tekst te gaan. Op de dialoog na (dialogue.py) zijn de
+uitkomsten exact gelijk aan de oude regex tellingen (zie test_text_context.py).
+"""
+import re
+from bisect import bisect_right
+from collections import Counter
+from functools import cached_property
+from itertools import accumulate, compress, count, repeat
+
+import dialogue
+
+_WORD_RUNS = re.compile(r"(\w+)")             # [tussenruimte, woord, tussenruimte, ...]
+_WORD = re.compile(r"\w+")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")  # witruimte na een zinseinde
+_TERMINATORS = re.compile(r"[.!?]+")
+_TERMINATOR = re.compile(r"[.!?]")
+
+def positions(items, predicate):
+    """Indices waarvoor predicate waar is (de lus draait in C)"""
+    return list(compress(count(), map(predicate, items)))
+
+class WordSet:
+    """Woorden die hoofdletterongevoelig als heel woord geteld worden
+
+    Gelijk aan re.findall(r'\\b(w1|w2|...)\\b', text, re.IGNORECASE): ASCII woorden worden
+    via lower() opgezocht, de (zeldzame) overige woorden gaan door de regex zelf, omdat
+    IGNORECASE daar andere regels heeft dan lower() (bijv. 'ſ' en het Kelvin teken).
+    """
+
+    def __init__(self, *words):
+        self.words = frozenset(words)
+        self.pattern = re.compile("|".join(sorted(self.words)), re.IGNORECASE)
+
+    def __contains__(self, token):
+        if token.isascii():
+            return token.lower() in self.words
+        return self.pattern.fullmatch(token) is not None
+
+class TextContext:
+    """Eén tekst, één keer getokeniseerd
+
+    Alle velden zijn lazy: rough_metrics alleen betaalt niet voor de alinea's of de
+    frequentie tabel. Analyses accepteren een str of een TextContext (TextContext.of).
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def of(cls, text):
+        return text if isinstance(text, cls) else cls(text)
+
+    # ====== WOORDEN ======
+    @cached_property
+    def _runs(self):
+        return _WORD_RUNS.split(self.text)
+
+    @cached_property
+    def tokens(self):
+        """Woorden (\\w+) in volgorde van de tekst"""
+        return self._runs[1::2]
+
+    @cached_property
+    def gaps(self):
+        """Wat tussen de woorden staat: gaps[i] voor tokens[i], gaps[-1] na het laatste woord"""
+        return self._runs[0::2]
+
+    @cached_property
+    def token_starts(self):
+        """Begin offset van elk woord in de tekst"""
+        return list(accumulate(map(len, self._runs)))[0:-1:2]
+
+    @cached_property
+    def split_words(self):
+        """text.split(): de woordtelling van de meeste analyses"""
+        return self.text.split()
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def token_counts(self):
+        """Hoe vaak elk woord (met hoofdletters) voorkomt"""
+        return Counter(self.tokens)
+
+    @cached_property
+    def word_freq(self):
+        """Woordfrequentie tabel op de lowercase tekst, in volgorde van eerste voorkomen"""
+        if self.text.isascii():
+            # lower() verandert dan niets aan de woordgrenzen: hergebruik de token telling
+            return self._folded_counts[0]
+        return Counter(_WORD.findall(self.lower))
+
+    @cached_property
+    def _folded_counts(self):
+        """(lowercase ASCII woord -> aantal, overige woorden -> aantal)"""
+        folded, other = Counter(), {}
+        for token, n in self.token_counts.items():
+            if token.isascii():
+                folded[token.lower()] += n
+            else:
+                other[token] = n
+        return folded, other
+
+    def count_words(self, words):
+        """Aantal keer dat een woord uit de WordSet als heel woord voorkomt"""
+        folded, other = self._folded_counts
+        return (sum(folded[word] for word in words.words)
+                + sum(n for token, n in other.items() if token in words))
+
+    def count_tokens(self, predicate):
+        """Aantal woorden waarvoor predicate(woord) waar is"""
+        return sum(n for token, n in self.token_counts.items() if predicate(token))
+
+    @cached_property
+    def contraction_words(self):
+        """Aantal woorden met \\w+(?:'\\w+)? (don't telt als één woord)"""
+        tokens = self.tokens
+        joined, last = 0, -1
+        # gaps[i] staat tussen tokens[i-1] en tokens[i]; een token dat al achter een
+        # apostrof hangt begint zelf geen nieuwe samentrekking
+        for i in positions(self.gaps, "'".__eq__):
+            if 0 < i < len(tokens) and i - 1 != last:
+                joined += 1
+                last = i
+        return len(tokens) - joined
+
+    # ====== DIALOOG ======
+    @cached_property
+    def dialogue_spans(self):
+        """(start, end) van elke dialoog (dialogue.dialogue_spans)"""
+        return dialogue.dialogue_spans(self.text)
+
+    @cached_property
+    def dialogue_words(self):
+        return dialogue.dialogue_words(self.text, self.dialogue_spans)
+
+    # ====== ZINNEN EN ALINEA'S ======
+    @cached_property
+    def sentence_chunks(self):
+        """Stukken tussen zinseinde + witruimte (niet leeg), zoals rough_metrics ze telt"""
+        return [s for s in _SENTENCE_BREAK.split(self.text) if s.strip()]
+
+    @cached_property
+    def sentences(self):
+        """Zinnen gesplitst op reeksen . ! ? (gestript, niet leeg)"""
+        return [s.strip() for s in _TERMINATORS.split(self.text) if s.strip()]
+
+    @cached_property
+    def terminator_offsets(self):
+        """Offset van elke . ! ?; zin k loopt tot en met terminator_offsets[k]"""
+        return [m.start() for m in _TERMINATOR.finditer(self.text)]
+
+    def sentence_id(self, token):
+        """Zin van tokens[token] bij splitsen op elke losse . ! ?
+
+        Alleen zinnen met een ID onder len(terminator_offsets) zijn afgesloten; het stuk na het
+        laatste leesteken telt niet als zin.
+        """
+        return bisect_right(self.terminator_offsets, self.token_starts[token])
+
+    def sentence_ids(self, tokens):
+        """sentence_id voor een lijst token indices (in één keer, de lus draait in C)"""
+        return list(map(bisect_right, repeat(self.terminator_offsets), map(self.token_starts.__getitem__, tokens)))
+
+    @cached_property
+    def sentence_lengths(self):
+        return [len(s.split()) for s in self.sentences]
+
+    @cached_property
+    def paragraphs(self):
+        return self.text.split("\n\n")